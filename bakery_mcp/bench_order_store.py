@@ -0,0 +1,102 @@
+"""
+Per-insert latency of the order storage engines at different order history sizes.
+
+Usage:
+    uv run bakery_mcp/bench_order_store.py
+    uv run bakery_mcp/bench_order_store.py --sizes 1000 100000 --csv-inserts 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+
+from tools.order_manager import Order, OrderLineItem, OrderManager
+from tools.order_storage import CSVOrderStorage, SQLiteOrderStorage, flatten_line_items
+
+
+def _sample_order(i: int):
+    order = Order(
+        order_id=str(uuid.uuid4()),
+        name=f"Customer {i}",
+        address="Thamel, Kathmandu",
+        user_id=f"user_{i % 5000}",
+        contact_number="9800000000",
+        date="2025-07-01",
+        time="16:00",
+        item_ordered="Tiramisu 8inch",
+        delivery_notes="N/A",
+        order_type="delivery",
+    )
+    line_items = [
+        OrderLineItem(item_name="Tiramisu", quantity=1, price=1950.0),
+        OrderLineItem(item_name="Brownie Cake", quantity=2, price=1350.0),
+    ]
+    return order, line_items
+
+
+def _prefill_csv(path: str, size: int) -> None:
+    rows = []
+    for i in range(size):
+        order, line_items = _sample_order(i)
+        rows.append(flatten_line_items(order.model_dump(), [item.model_dump() for item in line_items]))
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def _prefill_sqlite(storage: SQLiteOrderStorage, size: int, batch: int = 50_000) -> None:
+    for start in range(0, size, batch):
+        orders = []
+        for i in range(start, min(size, start + batch)):
+            order, line_items = _sample_order(i)
+            orders.append((order.model_dump(), [item.model_dump() for item in line_items]))
+        storage.insert_many(orders)
+
+
+def _time_inserts(manager: OrderManager, size: int, inserts: int):
+    latencies = []
+    for i in range(inserts):
+        order, line_items = _sample_order(size + i)
+        start = time.perf_counter()
+        manager.create_order(order, line_items)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(backend: str, size: int, latencies) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{backend:<8}{size:>12,}{len(latencies):>10}"
+        f"{statistics.mean(latencies):>14.3f}{statistics.median(latencies):>14.3f}{p95:>14.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--csv-inserts", type=int, default=5, help="Inserts timed per size on the CSV path")
+    parser.add_argument("--sqlite-inserts", type=int, default=500, help="Inserts timed per size on SQLite")
+    parser.add_argument("--skip-csv-above", type=int, default=None, help="Skip the CSV path above this size")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8}{'orders':>12}{'inserts':>10}{'mean ms':>14}{'p50 ms':>14}{'p95 ms':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.skip_csv_above is None or size <= args.skip_csv_above:
+                csv_path = os.path.join(tmp, "orders.csv")
+                _prefill_csv(csv_path, size)
+                manager = OrderManager(storage=CSVOrderStorage(csv_path))
+                _report("csv", size, _time_inserts(manager, size, args.csv_inserts))
+
+            storage = SQLiteOrderStorage(os.path.join(tmp, "orders.db"))
+            _prefill_sqlite(storage, size)
+            manager = OrderManager(storage=storage)
+            _report("sqlite", size, _time_inserts(manager, size, args.sqlite_inserts))
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Prompt build time and prompt size of the product / company inquiry prompts,
+before and after rendering the static prefix once per knowledge version.
+
+Token counts come from the Gemini count_tokens API when GEMINI_API_KEY is set,
+otherwise they are estimated at 4 characters per token.
+
+Usage:
+    uv run bakery_mcp/bench_prompt_build.py
+"""
+import argparse
+import os
+import timeit
+
+from tools.knowledge import BUSINESS_INFO, PRODUCT_CATALOG, get_faq, order_information_requirements
+from tools.product_manager import ProductManager, _company_query_suffix
+from tools.product_retrieval import get_product_retriever
+
+# Gemini 2.5 Flash only context-caches prompts of at least this many tokens
+MIN_CACHE_TOKENS = 1024
+
+QUERY = "How much is an 8 inch tiramisu and does it contain nuts?"
+
+
+class LegacyPromptBuilder:
+    """Prompt builders as they were before the static prefix was memoised"""
+
+    def _create_product_prompt(self, user_query: str) -> str:
+        """Create prompt for product and allergy related queries"""
+        base_prompt = f"""
+        You will be responsible to handling cake related enquires.  
+        You will not be comminicating with humans but with other agents.
+        The agent will ask you question about what all products do we have, detail about specific product, price, size, allergens, etc.
+
+       !!! IMPORTATANT NOTE: If there is a product not mentioned in the product catalog but you it is generally easy to make with ingredients we have, you can mention it.
+       In this case tell the agent that we can make it for you. We do make custom cakes. Also recommend similar cakes we have if they want readymade.
+
+        Respond to the query with the product details:
+
+AVAILABLE PRODUCTS:
+"""
+
+        # Add product information
+        for product in PRODUCT_CATALOG:
+            base_prompt += f"""
+- {product.name} ({product.category.value})
+  Sizes & Prices: {product.sizes}
+  Weights: {product.weights}
+  Description: {product.description}
+  Tags: {', '.join(product.tags)}
+  Allergens: {', '.join(product.allergens) if product.allergens else 'None'}
+  FAQ: {get_faq()}
+"""
+
+        base_prompt += f"""
+
+SIZE GUIDELINES:
+- 5inch cakes: Serve 4-6 people, perfect for small gatherings
+- 8inch cakes: Serve 8-12 people, ideal for medium gatherings
+- For larger groups: Consider multiple cakes or custom orders
+
+PRICING:
+- Budget-friendly: 1350-1850 NPR (5inch cakes)
+- Mid-range: 1950-3250 NPR (8inch cakes)  
+- Premium: 3250-3790 NPR (specialty cakes)
+
+USER QUERY: {user_query}
+
+
+"""
+        return base_prompt
+
+    def _create_company_prompt(self, user_query: str) -> str:
+        """Create prompt for company and business related queries"""
+        base_prompt = f"""
+You are an expert bakery business manager for {BUSINESS_INFO.name}, a beloved bakery established in {BUSINESS_INFO.established} in {BUSINESS_INFO.location}.
+
+BUSINESS INFORMATION:
+Name: {BUSINESS_INFO.name}
+Established: {BUSINESS_INFO.established}
+Tagline: {BUSINESS_INFO.tagline}
+Location: {BUSINESS_INFO.location}
+Address: {BUSINESS_INFO.address}
+Phone: {BUSINESS_INFO.phone}
+WhatsApp: {BUSINESS_INFO.whatsapp}
+Email: {BUSINESS_INFO.email}
+Maps Link: {BUSINESS_INFO.maps_link}
+Operating Hours: {BUSINESS_INFO.hours}
+###Delivery Options: pickup, delivery
+
+ABOUT US:
+{BUSINESS_INFO.about}
+
+FAQ INFORMATION:
+"""
+
+        # Add FAQ information
+        faq_data = get_faq()
+        if "faqs" in faq_data:
+            for faq in faq_data["faqs"]:
+                base_prompt += f"""
+Q: {faq['question']}
+A: {faq['answer']}
+"""
+
+        base_prompt += f"""
+
+ORDER REQUIREMENTS:
+"""
+
+        # Add order requirements
+        order_req = order_information_requirements()
+        if "fields" in order_req:
+            for field in order_req["fields"]:
+                base_prompt += f"""
+- {field['name']}: {field['description']} (Required: {field['required']})
+"""
+
+        base_prompt += f"""
+
+USER QUERY: {user_query}
+
+Please provide a helpful, informative response about business operations, ordering process, company information, or any business-related questions. Be conversational, professional, and always include relevant contact information when applicable.
+"""
+        return base_prompt
+
+
+def _token_counter():
+    if not os.environ.get("GEMINI_API_KEY"):
+        return lambda text: len(text) // 4, "estimated"
+    from tools.llm_client import get_gemini_client
+
+    client = get_gemini_client()
+
+    def count(text):
+        return client.models.count_tokens(model="gemini-2.5-flash", contents=text).total_tokens
+
+    return count, "count_tokens"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Skip client construction, prompt building does not need it
+    manager = ProductManager.__new__(ProductManager)
+    manager.retriever = get_product_retriever()
+    legacy = LegacyPromptBuilder()
+    count_tokens, token_source = _token_counter()
+
+    cases = [
+        ("product", "before", lambda: legacy._create_product_prompt(QUERY), None),
+        ("product", "after", lambda: manager._create_product_prompt(QUERY), manager._product_prompt_parts(QUERY)[1]),
+        ("company", "before", lambda: legacy._create_company_prompt(QUERY), None),
+        ("company", "after", lambda: manager._create_company_prompt(QUERY), _company_query_suffix(QUERY)),
+    ]
+
+    print(f"{len(PRODUCT_CATALOG)} products, {args.iterations} builds per case, tokens {token_source}")
+    print(f"{'prompt':<10}{'':<8}{'build us':>12}{'chars':>10}{'tokens':>10}{'sent w/ cache':>16}")
+    for kind, label, build, suffix in cases:
+        seconds = timeit.timeit(build, number=args.iterations)
+        prompt = build()
+        tokens = count_tokens(prompt)
+        # With the prefix in Gemini's context cache only the query suffix is sent per request
+        cacheable = suffix and tokens - count_tokens(suffix) >= MIN_CACHE_TOKENS
+        sent = count_tokens(suffix) if cacheable else tokens
+        print(
+            f"{kind:<10}{label:<8}{seconds / args.iterations * 1e6:>12.2f}"
+            f"{len(prompt):>10}{tokens:>10}{sent:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Build the product image index used by the match_product_image tool.
+
+Reads the bakery's recent posts through the Instagram MCP server
+(get_user_posts), labels each post with the product its caption names and
+stores perceptual hashes of its picture, plus CLIP embeddings with --clip.
+Posts whose caption names no product, or several, are left out.
+
+Usage:
+    uv run insta_mcp/mcp_server.py      # in another terminal
+    uv run bakery_mcp/build_image_index.py --username pumpernickelbakery --count 100
+    uv run bakery_mcp/build_image_index.py --clip
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+from tools.image_index import IMAGE_CLIP_MODEL, IMAGE_INDEX_PATH, image_entry
+from tools.instagram_posts import BAKERY_INSTAGRAM_USERNAME, fetch_bakery_posts, products_in_caption
+
+
+def _download(url: str) -> Image.Image:
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    image = Image.open(io.BytesIO(response.content))
+    image.load()
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", default=BAKERY_INSTAGRAM_USERNAME, help="The bakery's Instagram account")
+    parser.add_argument("--count", type=int, default=100, help="Recent posts to index")
+    parser.add_argument("--output", default=IMAGE_INDEX_PATH)
+    parser.add_argument("--clip", action="store_true", help=f"Also store {IMAGE_CLIP_MODEL} embeddings")
+    args = parser.parse_args()
+
+    posts = asyncio.run(fetch_bakery_posts(args.username, args.count))
+    labelled = []
+    for post in posts:
+        products = products_in_caption(post.get("caption") or "")
+        if len(products) == 1 and post.get("media_url"):
+            labelled.append((products[0], post))
+    print(f"{len(posts)} posts, {len(labelled)} show a single catalog product")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        images = list(pool.map(lambda item: _download(item[1]["media_url"]), labelled))
+    entries = [image_entry(image, product, post, with_clip=args.clip) for image, (product, post) in zip(images, labelled)]
+
+    index = {"built_at": time.time(), "username": args.username, "entries": entries}
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, args.output)
+
+    products = sorted({entry["product"] for entry in entries})
+    clip = sum(1 for entry in entries if "clip" in entry)
+    print(f"Indexed {len(entries)} images of {len(products)} products ({clip} with CLIP embeddings) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Build the product -> Instagram post link index served by the
+instagram_links_of_products tool.
+
+Reads the bakery's recent posts through the Instagram MCP server
+(get_user_posts) and files each post under every catalog product its caption
+or hashtags name. The bakery MCP picks up a new index file without a restart;
+run with --every to rebuild it periodically.
+
+Usage:
+    uv run insta_mcp/mcp_server.py      # in another terminal
+    uv run bakery_mcp/build_link_index.py --username pumpernickelbakery --count 100
+    uv run bakery_mcp/build_link_index.py --every 3600
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from tools.instagram_posts import BAKERY_INSTAGRAM_USERNAME, fetch_bakery_posts
+from tools.product_links import LINK_INDEX_MAX_POSTS, LINK_INDEX_PATH, build_link_index
+
+
+async def build(args) -> None:
+    posts = await fetch_bakery_posts(args.username, args.count)
+    index = build_link_index(posts, args.max_posts)
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, args.output)
+    linked = sum(1 for links in index["products"].values() if links)
+    print(f"{len(posts)} posts, links for {linked} of {len(index['products'])} products written to {args.output}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", default=BAKERY_INSTAGRAM_USERNAME, help="The bakery's Instagram account")
+    parser.add_argument("--count", type=int, default=100, help="Recent posts to read")
+    parser.add_argument("--max-posts", type=int, default=LINK_INDEX_MAX_POSTS, help="Links kept per product")
+    parser.add_argument("--output", default=LINK_INDEX_PATH)
+    parser.add_argument("--every", type=float, default=0, help="Rebuild every this many seconds")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            await build(args)
+        except Exception as e:
+            if not args.every:
+                raise
+            print(f"Rebuild failed, keeping the previous index: {e}")
+        if not args.every:
+            break
+        await asyncio.sleep(args.every)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
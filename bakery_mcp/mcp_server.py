@@ -1,12 +1,19 @@
+import asyncio
 import logging
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from tools.customer_order_parser import CustomerOrderParser
 
 from fastmcp import FastMCP
-from tools.order_manager import OrderManager
+from tools.order_manager import get_order_manager
 from tools.knowledge import PRODUCT_CATALOG
 from tools.product_manager import ProductManager
+from tools.llm_client import get_concurrency_stats, get_connection_stats
+from tools.product_retrieval import get_product_retriever
+from tools.intent_classifier import IntentClassifier
+from tools.image_index import ProductImageIndex
+from tools.product_links import ProductLinkIndex
+from tools.tracing import TracingMiddleware, setup_tracing
 
 
 
@@ -54,44 +61,56 @@ You have following tools to use:
 
 7. get_product_catalog: Get the product catalog.
 
+**Pre-screening:**
+8. quick_reply: Answers greetings, thanks and simple FAQs with a canned reply. Returns handled=False for anything else.
+
+**Customer Photos:**
+9. match_product_image: Finds the catalog product shown on a customer photo (e.g. a screenshot of one of our posts) without an LLM.
+10. instagram_links_of_products: Links to our Instagram posts of the given products, to share with the customer.
+
 **When to Use Which Tool:**
 - **Product Questions**: Use `handle_product_inquiry` for anything about cakes, flavors, prices, sizes, allergens
 - **Business Questions**: Use `handle_company_inquiry` for anything about the company, hours, location, ordering process
 - **Order Placement**: Use order management tools when customer is ready to place an order
 """
 
+setup_tracing("bakery_mcp")
 mcp = FastMCP(name="Pumpernickel Bakery", instructions=INSTRUCTIONS)
+mcp.add_middleware(TracingMiddleware())
 
 # Initialize ProductManager
 product_manager = ProductManager()
+customer_order_parser = CustomerOrderParser()
+intent_classifier = IntentClassifier(product_manager.fast_answers)
+product_image_index = ProductImageIndex()
+product_link_index = ProductLinkIndex()
+# Build the product embedding index at startup once the catalog is large enough to need it
+get_product_retriever().warm_up()
 
 @mcp.tool()
-def customer_inquiry_to_order_translator(customer_inquiry: str) -> Dict[str, Any]:
+async def customer_inquiry_to_order_translator(customer_inquiry: str) -> Dict[str, Any]:
     """
     Translate customer inquiry to order details.
     """
-    customer_order_parser = CustomerOrderParser()
-    order_details = customer_order_parser.parse_order(customer_inquiry)
+    order_details = await customer_order_parser.parse_order_async(customer_inquiry)
     return order_details
 
 
 @mcp.tool()
-def order_manager(order_details: Dict[str, Any]) -> Dict[str, Any]:
+async def order_manager(order_details: Dict[str, Any]) -> Dict[str, Any]:
     """
     Manage the order.
     """
-    order_manager = OrderManager()
-    order_id = order_manager.create_order_from_text(order_details)
+    order_id = await get_order_manager().create_order_from_text_async(order_details)
     return order_id
 
 
 @mcp.tool()
-def order_are_order_details_complete(customer_order_details: str) -> bool:
+async def order_are_order_details_complete(customer_order_details: str) -> bool:
     """
     Check if the order details are complete.
     """
-    order_manager = OrderManager()
-    return order_manager.are_order_details_complete(customer_order_details)
+    return await get_order_manager().are_order_details_complete_async(customer_order_details)
 
 
 @mcp.tool()
@@ -104,7 +123,7 @@ def get_product_catalog() -> Dict[str, Any]:
 
 
 @mcp.tool()
-def handle_product_inquiry(query: str) -> str:
+async def handle_product_inquiry(query: str) -> str:
     """
     Handle ALL product-related queries including:
     - Product information and descriptions
@@ -116,11 +135,11 @@ def handle_product_inquiry(query: str) -> str:
     
     Use this for any question about cakes, flavors, prices, sizes, allergens, etc.
     """
-    return product_manager.handle_product_inquiry(query)
+    return await product_manager.handle_product_inquiry_async(query)
 
 
 @mcp.tool()
-def handle_company_inquiry(query: str) -> str:
+async def handle_company_inquiry(query: str) -> str:
     """
     Handle ALL business and company-related queries including:
     - Business information and history
@@ -134,7 +153,70 @@ def handle_company_inquiry(query: str) -> str:
     
     Use this for any question about the company, hours, location, ordering process, etc.
     """
-    return product_manager.handle_company_inquiry(query)
+    return await product_manager.handle_company_inquiry_async(query)
+
+
+@mcp.tool()
+async def quick_reply(message: str) -> Dict[str, Any]:
+    """
+    Answer a customer message locally if it is a greeting, thanks, goodbye or simple FAQ.
+    Returns handled, intent, confidence and the reply; when handled is False the message
+    needs the full assistant.
+    """
+    # Embedding the message is CPU work, keep it off the event loop
+    result = await asyncio.to_thread(intent_classifier.quick_reply, message)
+    return result.to_dict()
+
+
+@mcp.tool()
+async def match_product_image(image_path: str) -> Dict[str, Any]:
+    """
+    Find the catalog product shown on a customer photo by comparing it with the images of our own posts.
+    Returns matched, and the product with the post it was matched to; when matched is False the photo
+    needs to be looked at.
+    """
+    if product_image_index.image_count() == 0:
+        return {
+            "matched": False,
+            "message": "The product image index is missing or empty, build it with build_image_index.py.",
+        }
+    try:
+        # Decoding and hashing the photo would block the event loop
+        match = await asyncio.to_thread(product_image_index.match, image_path)
+    except Exception as e:
+        return {"matched": False, "message": str(e)}
+    if match is None:
+        return {"matched": False, "message": "The photo does not match any of our posts."}
+    return {"matched": True, **match.to_dict()}
+
+
+@mcp.tool()
+def instagram_links_of_products(product_names: List[str]) -> Dict[str, Any]:
+    """
+    Get links to our Instagram posts of products, to share with a customer interested in them.
+    Returns the most recent post URLs and thumbnails per product; names that are not in the
+    product catalog are listed in unknown_products. A name several products fit (e.g. "cheesecake")
+    gets the links of all of them and is listed in ambiguous_products with those product names,
+    so ask the customer which one they mean.
+    """
+    return product_link_index.links(product_names)
+
+
+@mcp.tool()
+def get_performance_stats() -> Dict[str, Any]:
+    """
+    Get runtime performance counters of the bakery tools (for debugging, not for customer queries).
+    """
+    return {
+        "llm_connections": get_connection_stats(),
+        "llm_concurrency": get_concurrency_stats(),
+        "prompt_cache": product_manager.prompt_cache.get_stats(),
+        "fast_answers": product_manager.fast_answers.get_stats(),
+        "response_cache": product_manager.response_cache.get_stats(),
+        "intent_classifier": intent_classifier.get_stats(),
+        "product_image_index": product_image_index.get_stats(),
+        "product_link_index": product_link_index.get_stats(),
+    }
 
 
 if __name__ == "__main__":
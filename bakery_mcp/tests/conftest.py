@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bakery MCP imports its modules as `tools.*`, relative to bakery_mcp/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import pytest
+
+from tools.knowledge import check_allergen_info, get_catalog_index, get_product_by_name
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("Tiramisu", "Tiramisu"),
+        ("snickers", "Snickers Delight"),
+        ("tiramsu", "Tiramisu"),
+        ("pistacio", "Pistachio Cake"),
+        ("bluebery cheesecake", "Blueberry Cheesecake"),
+        ("triple choclate cake", "Triple Chocolate Cake"),
+    ],
+)
+def test_names_aliases_and_misspellings_resolve(query, expected):
+    assert get_product_by_name(query).name == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["cheesecake", "chocolate cheesecake", "pistachio cheesecake", "chocolate cake", "cake"],
+)
+def test_names_several_products_share_do_not_resolve(query):
+    assert get_product_by_name(query) is None
+
+
+def test_misspelling_needs_fuzzy():
+    assert get_product_by_name("tiramsu", fuzzy=False) is None
+
+
+def test_allergens_of_an_ambiguous_name_are_not_guessed():
+    assert "error" in check_allergen_info("chocolate cheesecake", "nuts")
+    assert check_allergen_info("pistacio", "pistachios")["specific_allergen"]["present"]
+
+
+def test_find_in_text_skips_shared_words():
+    found = get_catalog_index().find_in_text("do you have tiramsu, snikers or a cheesecake?")
+    assert [product.name for product in found] == ["Tiramisu", "Snickers Delight"]
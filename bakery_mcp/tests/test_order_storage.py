@@ -0,0 +1,133 @@
+import pandas as pd
+import pytest
+
+from tools.order_storage import (
+    CSVOrderStorage,
+    SQLiteOrderStorage,
+    create_order_storage,
+    flatten_line_items,
+    migrate_csv_to_sqlite,
+)
+
+ASHA = {"order_id": "o-1", "name": "Asha", "user_id": "u-1", "contact_number": "9841000000", "order_type": "pickup"}
+ASHA_ITEMS = [{"item_name": "Tiramisu", "quantity": 2, "price": 450.0}]
+BIBEK = {"order_id": "o-2", "name": "Bibek", "user_id": "u-2", "contact_number": "0980123456", "date": "2026-10-20"}
+BIBEK_ITEMS = [
+    {"item_name": "Snickers Cake", "quantity": 1, "price": 1200.0},
+    {"item_name": "Croissant", "quantity": 6, "price": 120.0},
+]
+
+
+def _row(row):
+    """A stored row without empty fields, with whole-number quantities as ints"""
+    if row is None:
+        return None
+    cleaned = {}
+    for key, value in row.items():
+        if value is None or pd.isna(value):
+            continue
+        if key.startswith("quantity_line_"):
+            value = int(value)
+        cleaned[key] = value
+    return cleaned
+
+
+def _expected(order, line_items):
+    return _row(flatten_line_items(order, line_items))
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "csv":
+        engine = CSVOrderStorage(str(tmp_path / "orders.csv"))
+    else:
+        engine = SQLiteOrderStorage(str(tmp_path / "orders.db"))
+    yield engine
+    engine.close()
+
+
+def test_insert_and_get(storage):
+    storage.insert(ASHA, ASHA_ITEMS)
+    storage.insert(BIBEK, BIBEK_ITEMS)
+
+    assert storage.count() == 2
+    assert _row(storage.get_by_id("o-1")) == _expected(ASHA, ASHA_ITEMS)
+    assert _row(storage.get_by_id("o-2")) == _expected(BIBEK, BIBEK_ITEMS)
+    assert storage.get_by_id("missing") is None
+    assert [_row(row) for row in storage.get_by_user("u-2")] == [_expected(BIBEK, BIBEK_ITEMS)]
+    assert storage.get_by_user("nobody") == []
+    assert [row["order_id"] for row in storage.get_all()] == ["o-1", "o-2"]
+
+
+def test_update_fields_and_line_items(storage):
+    storage.insert(ASHA, ASHA_ITEMS)
+    storage.insert(BIBEK, BIBEK_ITEMS)
+
+    assert storage.update("o-1", {"address": "Jhamsikhel", "order_type": "delivery"})
+    assert _row(storage.get_by_id("o-1")) == _expected(
+        {**ASHA, "address": "Jhamsikhel", "order_type": "delivery"}, ASHA_ITEMS
+    )
+
+    new_items = [{"item_name": "Brownie", "quantity": 3, "price": 150.0}]
+    assert storage.update("o-2", {}, new_items)
+    assert _row(storage.get_by_id("o-2")) == _expected(BIBEK, new_items)
+    assert not storage.update("missing", {"name": "Nobody"})
+
+
+def test_delete(storage):
+    storage.insert(ASHA, ASHA_ITEMS)
+    storage.insert(BIBEK, BIBEK_ITEMS)
+
+    assert storage.delete("o-1")
+    assert not storage.delete("o-1")
+    assert storage.get_by_id("o-1") is None
+    assert storage.count() == 1
+
+
+def test_csv_keeps_contact_numbers_as_text(tmp_path):
+    path = str(tmp_path / "orders.csv")
+    CSVOrderStorage(path).insert(BIBEK, BIBEK_ITEMS)
+
+    # A fresh engine reads the file back from disk
+    assert CSVOrderStorage(path).get_by_id("o-2")["contact_number"] == "0980123456"
+
+
+def _legacy_csv(path):
+    legacy = CSVOrderStorage(str(path))
+    legacy.insert(ASHA, ASHA_ITEMS)
+    legacy.insert(BIBEK, BIBEK_ITEMS)
+
+
+def test_migrate_csv_to_sqlite(tmp_path):
+    _legacy_csv(tmp_path / "orders.csv")
+    storage = SQLiteOrderStorage(str(tmp_path / "orders.db"))
+
+    assert migrate_csv_to_sqlite(str(tmp_path / "orders.csv"), storage) == 2
+    assert _row(storage.get_by_id("o-1")) == _expected(ASHA, ASHA_ITEMS)
+    assert _row(storage.get_by_id("o-2")) == _expected(BIBEK, BIBEK_ITEMS)
+    assert storage.get_by_id("o-1")["contact_number"] == "9841000000"
+    assert storage.get_by_id("o-2")["contact_number"] == "0980123456"
+
+    # Re-running skips the orders already migrated
+    assert migrate_csv_to_sqlite(str(tmp_path / "orders.csv"), storage) == 0
+    assert storage.count() == 2
+    storage.close()
+
+
+def test_migrate_missing_csv(tmp_path):
+    storage = SQLiteOrderStorage(str(tmp_path / "orders.db"))
+    assert migrate_csv_to_sqlite(str(tmp_path / "missing.csv"), storage) == 0
+    storage.close()
+
+
+def test_create_order_storage_migrates_legacy_csv(tmp_path):
+    _legacy_csv(tmp_path / "orders.csv")
+    storage = create_order_storage(
+        "sqlite", str(tmp_path / "orders.db"), legacy_csv_path=str(tmp_path / "orders.csv")
+    )
+    assert isinstance(storage, SQLiteOrderStorage)
+    assert storage.count() == 2
+    storage.close()
+
+    with pytest.raises(ValueError):
+        create_order_storage("parquet", str(tmp_path / "orders.parquet"))
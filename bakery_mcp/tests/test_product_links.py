@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from tools.product_links import ProductLinkIndex, build_link_index
+
+POSTS = [
+    {"post_url": "https://instagram.com/p/1", "caption": "Our Scarlet Cheesecake is back", "taken_at": "2026-10-01"},
+    {"post_url": "https://instagram.com/p/2", "caption": "Fresh #blueberrycheesecake", "taken_at": "2026-10-02"},
+    {"post_url": "https://instagram.com/p/3", "caption": "Tiramisu Tuesday", "taken_at": "2026-10-03"},
+    {"post_url": "https://instagram.com/p/4", "caption": "Pistachio Cake for the weekend", "taken_at": "2026-10-04"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "product_links.json"
+    path.write_text(json.dumps(build_link_index(POSTS)))
+    return ProductLinkIndex(str(path))
+
+
+def _urls(posts):
+    return [post["post_url"] for post in posts]
+
+
+def test_names_aliases_and_misspellings(index):
+    result = index.links(["Tiramisu", "tiramsu", "scarlet"])
+    assert _urls(result["links"]["Tiramisu"]) == ["https://instagram.com/p/3"]
+    assert _urls(result["links"]["Scarlet Cheesecake"]) == ["https://instagram.com/p/1"]
+    assert result["ambiguous_products"] == {}
+    assert result["unknown_products"] == []
+
+
+def test_shared_name_returns_every_product_it_fits(index):
+    result = index.links(["cheesecake"])
+    assert result["ambiguous_products"] == {
+        "cheesecake": ["Blueberry Cheesecake", "Strawberry Cheesecake", "Scarlet Cheesecake"]
+    }
+    assert _urls(result["links"]["Blueberry Cheesecake"]) == ["https://instagram.com/p/2"]
+    assert _urls(result["links"]["Scarlet Cheesecake"]) == ["https://instagram.com/p/1"]
+    assert result["links"]["Strawberry Cheesecake"] == []
+
+
+def test_names_no_product_fits_are_unknown(index):
+    result = index.links(["pistachio cheesecake", "croissant"])
+    assert result["links"] == {}
+    assert result["unknown_products"] == ["pistachio cheesecake", "croissant"]
@@ -0,0 +1,137 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from tools import prompt_cache
+from tools.prompt_cache import PromptPrefixCache
+
+PREFIX = "Static company and product information. "
+
+
+def _error(cls, code, message):
+    return cls(code, {"error": {"code": code, "message": message, "status": "ERROR"}})
+
+
+class FakeCaches:
+    def __init__(self, outcomes=(), delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    def create(self, model, config):
+        self.calls += 1
+        time.sleep(self.delay)
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(name=f"cachedContents/{self.calls}")
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    fake = FakeCaches()
+    monkeypatch.setattr(prompt_cache, "get_gemini_client", lambda: SimpleNamespace(caches=fake))
+    return fake
+
+
+@pytest.fixture
+def cache():
+    cache = PromptPrefixCache()
+    cache.enabled = True
+    return cache
+
+
+def test_cached_prefix_is_reused(caches, cache):
+    contents, config = cache.resolve(PREFIX, "question 1")
+    assert contents == "question 1"
+    assert config.cached_content == "cachedContents/1"
+
+    cache.resolve(PREFIX, "question 2")
+    assert caches.calls == 1
+    assert cache.get_stats()["cached_requests"] == 2
+
+
+def test_definitive_error_sends_prefix_inline_for_good(caches, cache):
+    caches.outcomes = [_error(errors.ClientError, 400, "Cached content is too small")]
+
+    assert cache.resolve(PREFIX, "question") == (PREFIX + "question", None)
+    assert cache.resolve(PREFIX, "question") == (PREFIX + "question", None)
+    assert caches.calls == 1
+    assert cache.get_stats()["uncacheable_prefixes"] == 1
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _error(errors.ClientError, 429, "Resource exhausted"),
+        _error(errors.ServerError, 503, "Service unavailable"),
+        TimeoutError("timed out"),
+    ],
+)
+def test_transient_error_is_retried_after_backoff(caches, cache, monkeypatch, error):
+    caches.outcomes = [error, error]
+    now = [1000.0]
+    monkeypatch.setattr(prompt_cache.time, "time", lambda: now[0])
+
+    assert cache.resolve(PREFIX, "q") == (PREFIX + "q", None)
+    # Inline, without a new upload, while backing off
+    now[0] += prompt_cache._RETRY_BACKOFF - 1
+    assert cache.resolve(PREFIX, "q") == (PREFIX + "q", None)
+    assert caches.calls == 1
+
+    # The backoff doubles after a second failure
+    now[0] += 2
+    cache.resolve(PREFIX, "q")
+    assert caches.calls == 2
+    now[0] += 2 * prompt_cache._RETRY_BACKOFF - 1
+    cache.resolve(PREFIX, "q")
+    assert caches.calls == 2
+
+    now[0] += 2
+    contents, config = cache.resolve(PREFIX, "q")
+    assert caches.calls == 3
+    assert contents == "q" and config.cached_content == "cachedContents/3"
+    stats = cache.get_stats()
+    assert stats["transient_errors"] == 2
+    assert stats["uncacheable_prefixes"] == 0
+
+
+def test_concurrent_misses_create_one_cache(caches, cache):
+    caches.delay = 0.2
+    results = []
+
+    def resolve():
+        results.append(cache.resolve(PREFIX, "question")[1].cached_content)
+
+    threads = [threading.Thread(target=resolve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert caches.calls == 1
+    assert results == ["cachedContents/1"] * 8
+    assert cache.get_stats()["deduplicated"] == 7
+
+
+@pytest.mark.parametrize(
+    "error, forgotten",
+    [
+        (_error(errors.ClientError, 403, "CachedContent not found (or permission denied)"), True),
+        (_error(errors.ClientError, 404, "Cached content not found"), True),
+        (_error(errors.ClientError, 400, "Cache content is expired"), True),
+        (_error(errors.ClientError, 429, "Resource exhausted"), False),
+        (_error(errors.ServerError, 503, "Service unavailable"), False),
+        (TimeoutError("timed out"), False),
+    ],
+)
+def test_only_invalid_cache_errors_forget_the_cache(caches, cache, error, forgotten):
+    cache.resolve(PREFIX, "q")
+
+    assert cache.forget_if_invalid(PREFIX, error) is forgotten
+    cache.resolve(PREFIX, "q")
+    assert caches.calls == (2 if forgotten else 1)
+    assert cache.get_stats()["invalidated"] == (1 if forgotten else 0)
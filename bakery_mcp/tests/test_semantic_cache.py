@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from tools import semantic_cache
+from tools.semantic_cache import SemanticCache, normalize_query
+
+# Queries with the same meaning share a direction; anything else gets its own
+MEANINGS = {
+    "how much is the tiramisu": 0,
+    "tiramisu price": 0,
+    "what does tiramisu cost": 0,
+    "5 inch tiramisu price": 0,
+    "8 inch tiramisu price": 0,
+    "do you deliver": 1,
+    "opening hours": 2,
+    "is the brownie eggless": 3,
+}
+
+
+def fake_embed_texts(texts):
+    rows = np.zeros((len(texts), 8), dtype=np.float32)
+    for i, text in enumerate(texts):
+        rows[i, MEANINGS.get(text, 7)] = 1.0
+    return rows
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(semantic_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "embed_texts", fake_embed_texts)
+
+
+def test_normalize_query():
+    assert normalize_query("  How much is the Tiramisu?? ") == "how much is the tiramisu"
+
+
+def test_exact_hit_without_embeddings(monkeypatch, clock):
+    monkeypatch.setattr(semantic_cache, "embed_texts", lambda texts: None)
+    cache = SemanticCache()
+    cache.store("product", "How much is the tiramisu?", "1450 NPR")
+
+    assert cache.lookup("product", "how much is the TIRAMISU")[0] == "1450 NPR"
+    assert cache.lookup("product", "tiramisu price")[0] is None
+    assert cache.lookup("company", "how much is the tiramisu")[0] is None
+
+
+def test_semantic_hit_requires_the_same_numbers(embeddings, clock):
+    cache = SemanticCache()
+    response, embedding = cache.lookup("product", "5 inch tiramisu price")
+    assert response is None
+    cache.store("product", "5 inch tiramisu price", "1450 NPR", embedding)
+    cache.store("product", "how much is the tiramisu", "1450 / 1950 NPR")
+
+    assert cache.lookup("product", "5 inch tiramisu price")[0] == "1450 NPR"
+    assert cache.lookup("product", "8 inch tiramisu price")[0] is None
+    assert cache.lookup("product", "what does tiramisu cost")[0] is None  # stored without an embedding
+    stats = cache.get_stats()
+    assert stats["exact_hits"] == 1
+    assert stats["misses"] == 3
+
+
+def test_entries_expire_after_the_ttl(embeddings, clock):
+    cache = SemanticCache(ttl_seconds=60)
+    _, embedding = cache.lookup("product", "how much is the tiramisu")
+    cache.store("product", "how much is the tiramisu", "1450 NPR", embedding)
+
+    clock.now += 59
+    assert cache.lookup("product", "how much is the tiramisu")[0] == "1450 NPR"
+    assert cache.lookup("product", "tiramisu price")[0] == "1450 NPR"
+
+    clock.now += 2
+    assert cache.lookup("product", "tiramisu price")[0] is None
+    assert cache.lookup("product", "how much is the tiramisu")[0] is None
+    stats = cache.get_stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(embeddings, clock):
+    cache = SemanticCache(max_entries=2)
+    for query, response in [("do you deliver", "Yes"), ("opening hours", "9 to 8")]:
+        _, embedding = cache.lookup("company", query)
+        cache.store("company", query, response, embedding)
+
+    # Reading "do you deliver" makes "opening hours" the least recently used
+    assert cache.lookup("company", "do you deliver")[0] == "Yes"
+    _, embedding = cache.lookup("company", "is the brownie eggless")
+    cache.store("company", "is the brownie eggless", "No", embedding)
+
+    assert cache.lookup("company", "opening hours")[0] is None
+    assert cache.lookup("company", "do you deliver")[0] == "Yes"
+    assert cache.lookup("company", "is the brownie eggless")[0] == "No"
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_knowledge_change_clears_the_cache(embeddings, clock, monkeypatch):
+    cache = SemanticCache()
+    cache.store("company", "opening hours", "9 to 8")
+    assert cache.lookup("company", "opening hours")[0] == "9 to 8"
+
+    monkeypatch.setattr(semantic_cache, "knowledge_version", lambda: "edited catalog")
+    assert cache.lookup("company", "opening hours")[0] is None
+    assert cache.get_stats()["invalidations"] == 1
@@ -1,17 +1,15 @@
-import os
-from google import genai
-from tools.knowledge import PRODUCT_CATALOG
-import dotenv
+import asyncio
 
-dotenv.load_dotenv()
+from tools.llm_client import agenerate_content, generate_content
+from tools.product_retrieval import get_product_retriever
 
 
 class CustomerOrderParser:
     def __init__(self):
-        self.gemini_client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+        self.retriever = get_product_retriever()
 
-    def parse_order(self, customer_inquiry: str):
-        product_texts = [f"{p.name}. {p.description}" for p in PRODUCT_CATALOG]
+    def _create_order_prompt(self, customer_inquiry: str) -> str:
+        product_texts = [f"{p.name}. {p.description}" for p in self.retriever.select(customer_inquiry)]
         prompt = f"""
             You are an intelligent bakery staff whose job is to translate customer inquiry to order details.
             The customer will ask for products and your job is to tell if the product is available.
@@ -36,13 +34,23 @@ class CustomerOrderParser:
             You need to validate if the customer query is making sense and than tell him that we do make such cake.
             Return order details as custom cake preparation and mention that it is doable.
         """
+        return prompt
+
+    def parse_order(self, customer_inquiry: str):
+        prompt = self._create_order_prompt(customer_inquiry)
+        response = generate_content(prompt)
+        order_details = response.candidates[0].content.parts[0].text
+
+        return {
+            "order_details": order_details
+        }
 
-        response = self.gemini_client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        )
+    async def parse_order_async(self, customer_inquiry: str):
+        """Non-blocking version of parse_order"""
+        prompt = await asyncio.to_thread(self._create_order_prompt, customer_inquiry)
+        response = await agenerate_content(prompt)
         order_details = response.candidates[0].content.parts[0].text
 
         return {
             "order_details": order_details
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from tools.knowledge import (
+    BUSINESS_INFO,
+    Product,
+    check_allergen_info,
+    get_catalog_index,
+    get_faq,
+)
+
+logger = logging.getLogger(__name__)
+
+# Longer queries are rarely a single structured question
+MAX_QUERY_WORDS = 16
+
+# Words that signal the query needs more than a lookup (recommendations, orders, comparisons...)
+COMPLEX_QUERY_WORDS = {
+    "and", "or", "vs", "versus", "compare", "recommend", "suggest", "best", "which",
+    "order", "buy", "book", "custom", "birthday", "party", "people", "guests", "serve",
+    "serves", "deliver", "delivery", "tomorrow", "today", "discount", "offer", "similar",
+}
+
+PRICE_WORDS = {"price", "prices", "cost", "costs", "rate", "rates", "much", "npr", "rs"}
+
+# Allergen asked about -> allergens in the catalog it covers
+ALLERGEN_GROUPS = {
+    "nut": ["walnuts", "almonds", "peanuts", "pistachios"],
+    "nuts": ["walnuts", "almonds", "peanuts", "pistachios"],
+    "walnut": ["walnuts"],
+    "walnuts": ["walnuts"],
+    "almond": ["almonds"],
+    "almonds": ["almonds"],
+    "peanut": ["peanuts"],
+    "peanuts": ["peanuts"],
+    "pistachio": ["pistachios"],
+    "pistachios": ["pistachios"],
+    "wheat": ["wheat"],
+    "gluten": ["wheat"],
+    "milk": ["milk"],
+    "dairy": ["milk"],
+    "lactose": ["milk"],
+    "egg": ["eggs"],
+    "eggs": ["eggs"],
+}
+
+SIZE_PATTERN = re.compile(r"\b(5|8)\s*(?:-|\s)?\s*(?:inch|inches|in|\")")
+SIZE_WORDS = {"small": "5inch", "smaller": "5inch", "large": "8inch", "big": "8inch", "bigger": "8inch"}
+
+# Company question topic -> (trigger words, FAQ question answering it)
+COMPANY_TOPICS = {
+    "hours": ({"hours", "hour", "open", "opening", "close", "closing", "timing", "timings"}, "What are your operating hours?"),
+    "location": ({"where", "location", "located", "address", "directions", "map", "maps"}, None),
+    "contact": ({"phone", "contact", "whatsapp", "email", "call", "number"}, None),
+    "delivery": ({"deliver", "delivery", "pickup", "shipping"}, "Do you deliver?"),
+    "payment": ({"pay", "payment", "payments", "esewa", "khalti", "stripe", "card", "cash"}, "What payment methods do you accept?"),
+    "custom": ({"custom", "customize", "customise", "personalised", "personalized"}, "Do you take custom orders?"),
+    "advance": ({"advance", "prior", "notice"}, "How far in advance should I order?"),
+    "dietary": ({"vegan", "sugar", "sugarfree", "eggless"}, "Do you offer sugar-free or vegan options?"),
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class FastAnswerer:
+    """
+    Answers high-confidence structured questions straight from the knowledge base.
+
+    A query is matched to a single intent (price, allergen, company topic) and
+    its slots (product, size, allergen). Anything ambiguous returns None so the
+    caller falls back to the LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            "product": {"hits": 0, "misses": 0},
+            "company": {"hits": 0, "misses": 0},
+        }
+
+    @staticmethod
+    def _find_products(query: str) -> List[Product]:
+        return get_catalog_index().find_in_text(query)
+
+    @staticmethod
+    def _find_size(query: str, tokens: List[str]) -> Optional[str]:
+        match = SIZE_PATTERN.search(query.lower())
+        if match:
+            return f"{match.group(1)}inch"
+        sizes = {SIZE_WORDS[t] for t in tokens if t in SIZE_WORDS}
+        return sizes.pop() if len(sizes) == 1 else None
+
+    def _record(self, kind: str, answer: Optional[str], record: bool) -> Optional[str]:
+        if record:
+            with self._lock:
+                self.stats[kind]["hits" if answer else "misses"] += 1
+        return answer
+
+    def answer_product(self, query: str, record: bool = True) -> Optional[str]:
+        """Answer a price or allergen question about one product, or None; record=False leaves the stats alone"""
+        return self._record("product", self._answer_product(query), record)
+
+    def answer_company(self, query: str, record: bool = True) -> Optional[str]:
+        """Answer a single-topic business question, or None; record=False leaves the stats alone"""
+        return self._record("company", self._answer_company(query), record)
+
+    def _answer_product(self, query: str) -> Optional[str]:
+        tokens = _tokens(query)
+        if not tokens or len(tokens) > MAX_QUERY_WORDS or COMPLEX_QUERY_WORDS.intersection(tokens):
+            return None
+
+        products = self._find_products(query)
+        if len(products) != 1:
+            return None
+        product = products[0]
+
+        asks_price = bool(PRICE_WORDS.intersection(tokens))
+        # "pistachio" in "pistachio cake" names the product, it does not ask about the allergen
+        name_tokens = set(_tokens(product.name))
+        allergen_words = [t for t in tokens if t in ALLERGEN_GROUPS and t not in name_tokens]
+        if asks_price == bool(allergen_words):
+            # Neither or both intents: not a single structured question
+            return None
+
+        if asks_price:
+            return self._price_answer(product, self._find_size(query, tokens))
+        if len(set(allergen_words)) != 1:
+            return None
+        return self._allergen_answer(product, allergen_words[0])
+
+    @staticmethod
+    def _price_answer(product: Product, size: Optional[str]) -> Optional[str]:
+        if not product.available:
+            return None
+        if size:
+            if size not in product.sizes:
+                return None
+            return (
+                f"{product.name} ({size}, {product.weights.get(size, '')}) costs {product.sizes[size]} NPR."
+            )
+        prices = ", ".join(
+            f"{size}: {price} NPR ({product.weights.get(size, '')})" for size, price in product.sizes.items()
+        )
+        return f"{product.name} prices - {prices}."
+
+    @staticmethod
+    def _allergen_answer(product: Product, allergen_word: str) -> Optional[str]:
+        info = check_allergen_info(product.name)
+        if "error" in info:
+            return None
+        allergens = [a.lower() for a in info["allergens"]]
+        present = [a for a in ALLERGEN_GROUPS[allergen_word] if a in allergens]
+        listed = ", ".join(info["allergens"]) if info["allergens"] else "none"
+        if present:
+            return f"{product.name} contains {', '.join(present)}. Its allergens are: {listed}."
+        return f"{product.name} does not contain {allergen_word}. Its allergens are: {listed}."
+
+    def _answer_company(self, query: str) -> Optional[str]:
+        tokens = _tokens(query)
+        if not tokens or len(tokens) > MAX_QUERY_WORDS:
+            return None
+        if {"and", "or", "tomorrow", "today", "tonight"}.intersection(tokens):
+            return None
+        if self._find_products(query):
+            # Questions about a specific product are not pure business questions
+            return None
+
+        topics = [topic for topic, (words, _) in COMPANY_TOPICS.items() if words.intersection(tokens)]
+        if len(topics) != 1:
+            return None
+        topic = topics[0]
+        _, faq_question = COMPANY_TOPICS[topic]
+
+        if topic == "location":
+            return (
+                f"{BUSINESS_INFO.name} is located at {BUSINESS_INFO.address}. "
+                f"Google Maps: {BUSINESS_INFO.maps_link}"
+            )
+        if topic == "contact":
+            return (
+                f"You can reach {BUSINESS_INFO.name} by phone at {BUSINESS_INFO.phone}, "
+                f"on WhatsApp at {BUSINESS_INFO.whatsapp} or by email at {BUSINESS_INFO.email}."
+            )
+
+        for faq in get_faq().get("faqs", []):
+            if faq["question"] == faq_question:
+                return faq["answer"]
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self.stats.items()}
+        for counts in stats.values():
+            total = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from tools.knowledge import Product, get_product_by_name
+
+logger = logging.getLogger(__name__)
+
+# Built by build_image_index.py from the bakery's own posts
+IMAGE_INDEX_PATH = os.environ.get("IMAGE_INDEX_PATH", "product_images.json")
+# Largest perceptual-hash distance (of 64 bits) still counted as the same picture
+IMAGE_MATCH_MAX_DISTANCE = int(os.environ.get("IMAGE_MATCH_MAX_DISTANCE", "10"))
+# Optional CLIP embeddings (sentence-transformers) for photos the hashes miss, e.g. screenshots
+IMAGE_CLIP_MODEL = os.environ.get("IMAGE_CLIP_MODEL", "clip-ViT-B-32")
+IMAGE_CLIP_MIN_SIMILARITY = float(os.environ.get("IMAGE_CLIP_MIN_SIMILARITY", "0.88"))
+
+HASH_SIZE = 8
+MATCH_IMAGE_SIDE = 512
+# Sides of the central crops also hashed for a customer photo, for screenshots with app chrome around the picture
+QUERY_CROPS = (0.8, 0.6)
+# Rows and columns of a screenshot this plain and this dark or light are taken as app chrome
+PICTURE_MIN_STD = 6.0
+CHROME_DARK, CHROME_LIGHT = 30, 225
+
+_clip_model = None
+_clip_model_lock = threading.Lock()
+_clip_model_failed = False
+
+
+def get_clip_model():
+    """The shared CLIP model, loaded on first use; None when sentence-transformers is unavailable"""
+    global _clip_model, _clip_model_failed
+    if _clip_model is None and not _clip_model_failed:
+        with _clip_model_lock:
+            if _clip_model is None and not _clip_model_failed:
+                try:
+                    from sentence_transformers import SentenceTransformer
+
+                    _clip_model = SentenceTransformer(IMAGE_CLIP_MODEL)
+                    logger.info(f"Loaded image model {IMAGE_CLIP_MODEL}")
+                except Exception as e:
+                    logger.warning(f"Image model unavailable, matching by perceptual hash only: {e}")
+                    _clip_model_failed = True
+    return _clip_model
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    k = np.arange(size)[:, None]
+    i = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * size))
+
+
+_DCT = _dct_matrix(HASH_SIZE * 4)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if bit else "0" for bit in bits.flatten()), 2)
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit perceptual hash: signs of the lowest DCT frequencies of a 32x32 grayscale image"""
+    side = HASH_SIZE * 4
+    pixels = np.asarray(image.convert("L").resize((side, side), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low > np.median(low.flatten()[1:]))
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale image is brighter than its right neighbour"""
+    pixels = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _normalized(image: Image.Image) -> Image.Image:
+    return ImageOps.exif_transpose(image).convert("RGB")
+
+
+def _longest_run(mask: np.ndarray) -> tuple:
+    """(start, end) of the longest run of True values"""
+    best, start = (0, len(mask)), None
+    best_length = 0
+    for i, value in enumerate(list(mask) + [False]):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            if i - start > best_length:
+                best, best_length = (start, i), i - start
+            start = None
+    return best
+
+
+def _picture_region(image: Image.Image) -> Image.Image:
+    """
+    The largest block of rows and columns that are not app chrome, i.e. the
+    photo inside a screenshot without the status bar, header and caption.
+    Chrome is plain white or black (light and dark mode), with at most some text.
+    """
+    pixels = np.asarray(image.convert("L"), dtype=np.float32)
+
+    def picture(lines: np.ndarray, axis: int) -> np.ndarray:
+        plain = lines.std(axis=axis) <= PICTURE_MIN_STD
+        mean = lines.mean(axis=axis)
+        return ~(plain & ((mean < CHROME_DARK) | (mean > CHROME_LIGHT)))
+
+    top, bottom = _longest_run(picture(pixels, 1))
+    left, right = _longest_run(picture(pixels[top:bottom], 0))
+    if (bottom - top) * (right - left) < 0.1 * pixels.size:
+        return image
+    return image.crop((left, top, right, bottom))
+
+
+def _center_crop(image: Image.Image, fraction: float) -> Image.Image:
+    width, height = image.size
+    left, top = int(width * (1 - fraction) / 2), int(height * (1 - fraction) / 2)
+    return image.crop((left, top, width - left, height - top))
+
+
+def image_entry(image: Image.Image, product: Product, post: Dict[str, Any], with_clip: bool = False) -> Dict[str, Any]:
+    """Index entry of one of the bakery's post images"""
+    image = _normalized(image)
+    entry = {
+        "product": product.name,
+        "media_id": post.get("media_id"),
+        "post_url": post.get("post_url"),
+        "phash": f"{phash(image):016x}",
+        "dhash": f"{dhash(image):016x}",
+    }
+    model = get_clip_model() if with_clip else None
+    if model is not None:
+        entry["clip"] = [round(float(value), 5) for value in model.encode(image, normalize_embeddings=True)]
+    return entry
+
+
+@dataclass
+class ImageMatch:
+    """The catalog product a customer photo shows"""
+
+    product: Product
+    method: str  # "phash" or "clip"
+    distance: Optional[int]
+    similarity: Optional[float]
+    post_url: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "product": self.product.to_dict(),
+            "method": self.method,
+            "distance": self.distance,
+            "similarity": self.similarity,
+            "post_url": self.post_url,
+        }
+
+
+class ProductImageIndex:
+    """
+    Maps a photo to the catalog product it shows, without an LLM call.
+
+    The index holds perceptual hashes (and optionally CLIP embeddings) of the
+    bakery's own post images, labelled with the product from the caption. A
+    photo matches the post whose hash is closest, within `max_distance` bits.
+    The photo, the picture inside it without app chrome, and central crops
+    are all tried, so a screenshot of a post still matches. If the index has
+    CLIP embeddings and sentence-transformers is installed, photos no hash
+    matches are compared by embedding. The index file is reloaded when it
+    changes on disk; products are looked up in the current catalog.
+    """
+
+    def __init__(
+        self,
+        path: str = IMAGE_INDEX_PATH,
+        max_distance: int = IMAGE_MATCH_MAX_DISTANCE,
+        clip_min_similarity: float = IMAGE_CLIP_MIN_SIMILARITY,
+    ):
+        self.path = path
+        self.max_distance = max_distance
+        self.clip_min_similarity = clip_min_similarity
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._phashes = np.zeros(0, dtype=np.uint64)
+        self._clip: Optional[np.ndarray] = None
+        self.stats = {"lookups": 0, "phash_matches": 0, "clip_matches": 0, "misses": 0, "lookup_seconds": 0.0}
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        entries: List[Dict[str, Any]] = []
+        if mtime is not None:
+            try:
+                with open(self.path) as f:
+                    entries = json.load(f)["entries"]
+            except Exception as e:
+                logger.warning(f"Could not load product image index from {self.path}: {e}")
+        self._entries = entries
+        self._phashes = np.array([int(entry["phash"], 16) for entry in entries], dtype=np.uint64)
+        clip = [entry["clip"] for entry in entries if "clip" in entry]
+        self._clip = np.asarray(clip, dtype=np.float32) if clip and len(clip) == len(entries) else None
+        self._mtime = mtime
+        logger.info(f"Loaded {len(entries)} product images from {self.path}")
+
+    def _nearest_by_hash(self, image: Image.Image):
+        if not len(self._phashes):
+            return None
+        candidates = [image, _picture_region(image)] + [_center_crop(image, fraction) for fraction in QUERY_CROPS]
+        best = None
+        for candidate in candidates:
+            xor = np.bitwise_xor(self._phashes, np.uint64(phash(candidate)))
+            distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            index = int(distances.argmin())
+            if best is None or distances[index] < best[1]:
+                best = (index, int(distances[index]))
+        return best
+
+    def match(self, image_path: str) -> Optional[ImageMatch]:
+        """The product shown on the photo at image_path, or None"""
+        started = time.perf_counter()
+        with Image.open(image_path) as opened:
+            opened.draft("RGB", (MATCH_IMAGE_SIDE, MATCH_IMAGE_SIDE))
+            image = _normalized(opened)
+        # Hashes are taken at 32x32, the full resolution only slows down the resampling
+        image.thumbnail((MATCH_IMAGE_SIDE, MATCH_IMAGE_SIDE))
+        with self._lock:
+            self._refresh()
+            entries, clip = self._entries, self._clip
+            nearest = self._nearest_by_hash(image)
+
+        result = None
+        if nearest and nearest[1] <= self.max_distance:
+            entry = entries[nearest[0]]
+            product = get_product_by_name(entry["product"], fuzzy=False)
+            if product is not None:
+                result = ImageMatch(product, "phash", nearest[1], None, entry.get("post_url"))
+        elif clip is not None and get_clip_model() is not None:
+            query = get_clip_model().encode(image, normalize_embeddings=True)
+            similarities = clip @ np.asarray(query, dtype=np.float32)
+            index = int(similarities.argmax())
+            product = get_product_by_name(entries[index]["product"], fuzzy=False)
+            if similarities[index] >= self.clip_min_similarity and product is not None:
+                similarity = round(float(similarities[index]), 3)
+                result = ImageMatch(product, "clip", None, similarity, entries[index].get("post_url"))
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["lookup_seconds"] += time.perf_counter() - started
+            if result is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats[f"{result.method}_matches"] += 1
+        return result
+
+    def image_count(self) -> int:
+        """Images in the index file; 0 when it is missing or empty"""
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            stats = dict(self.stats)
+            stats["images"] = len(self._entries)
+            stats["clip"] = self._clip is not None
+        lookup_seconds = stats.pop("lookup_seconds")
+        stats["avg_lookup_ms"] = round(1000 * lookup_seconds / stats["lookups"], 2) if stats["lookups"] else 0.0
+        matches = stats["phash_matches"] + stats["clip_matches"]
+        stats["match_rate"] = round(matches / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
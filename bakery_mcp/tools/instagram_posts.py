@@ -0,0 +1,42 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List
+
+from fastmcp import Client as MCPClient
+from fastmcp.client.transports import StreamableHttpTransport
+
+from tools.knowledge import Product, get_catalog_index
+
+logger = logging.getLogger(__name__)
+
+# The Instagram MCP server the bakery's own posts are read from
+INSTA_MCP_URL = os.environ.get("INSTA_MCP_URL", "http://localhost:4200/insta-mcp")
+BAKERY_INSTAGRAM_USERNAME = os.environ.get("BAKERY_INSTAGRAM_USERNAME", "")
+
+
+async def fetch_bakery_posts(username: str = BAKERY_INSTAGRAM_USERNAME, count: int = 50) -> List[Dict[str, Any]]:
+    """Recent posts of the bakery's account, from the Instagram MCP's get_user_posts tool"""
+    if not username:
+        raise ValueError("Set BAKERY_INSTAGRAM_USERNAME to the bakery's Instagram account")
+    async with MCPClient(StreamableHttpTransport(INSTA_MCP_URL)) as client:
+        result = await client.call_tool("get_user_posts", {"username": username, "count": count})
+    data = json.loads("".join(getattr(content, "text", "") for content in result))
+    if not data.get("success"):
+        raise RuntimeError(f"get_user_posts failed: {data.get('message')}")
+    return data["posts"]
+
+
+def products_in_caption(caption: str) -> List[Product]:
+    """
+    Products a post caption is about: those the catalog index finds in the
+    text, plus hashtags spelling out a full product name (#triplechocolatecake).
+    """
+    index = get_catalog_index()
+    found = {product.name: product for product in index.find_in_text(caption)}
+    for tag in re.findall(r"#(\w+)", caption.lower()):
+        for lower_name, product in index.by_lower_name.items():
+            if tag == lower_name.replace(" ", ""):
+                found.setdefault(product.name, product)
+    return list(found.values())
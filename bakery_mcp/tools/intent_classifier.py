@@ -0,0 +1,215 @@
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools.fast_answers import FastAnswerer
+from tools.knowledge import BUSINESS_INFO
+from tools.product_retrieval import embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity to an intent centroid, and lead over the runner-up
+INTENT_MIN_SIMILARITY = float(os.environ.get("INTENT_MIN_SIMILARITY", "0.6"))
+INTENT_MIN_MARGIN = float(os.environ.get("INTENT_MIN_MARGIN", "0.08"))
+# Messages longer than this always go to the agent chain
+QUICK_REPLY_MAX_WORDS = int(os.environ.get("QUICK_REPLY_MAX_WORDS", "20"))
+
+# Intents answered without the agent chain
+SMALL_TALK_INTENTS = ("greeting", "thanks", "goodbye")
+
+# Seed examples per intent; each intent's centroid is the mean of their embeddings
+INTENT_EXAMPLES = {
+    "greeting": [
+        "hi", "hello", "hey there", "good morning", "hello, anyone there?", "namaste",
+        "hi pumpernickel", "heyy", "good evening",
+    ],
+    "thanks": [
+        "thanks", "thank you so much", "thanks a lot", "great, thank you", "ok thanks",
+        "thank you for the help", "appreciate it", "perfect thanks",
+    ],
+    "goodbye": ["bye", "see you", "goodbye", "have a nice day", "talk to you later", "that's all, bye"],
+    "inquiry": [
+        "how much is the tiramisu", "what cakes do you have", "do you deliver to lalitpur",
+        "what are your opening hours", "does the brownie cake contain nuts", "where are you located",
+        "which cake is good for 10 people", "do you have eggless cakes",
+    ],
+    "order": [
+        "i want to order a cake", "can i get an 8 inch tiramisu for tomorrow",
+        "please book a mango mousse for saturday", "i'd like to place an order",
+        "my number is 98xxxxxxxx, deliver to thamel", "change my order to 5 inch",
+    ],
+    "escalation": [
+        "my cake arrived damaged", "this is unacceptable", "i want a refund",
+        "the order was late and nobody replied", "very disappointed with the service",
+        "i want to talk to a human",
+    ],
+}
+
+_PUNCTUATION = r"[\s!.,?😊🙏👋❤️🎂🍰:)]*"
+# Whole-message patterns that are unambiguous small talk
+SMALL_TALK_PATTERNS = {
+    "greeting": re.compile(
+        rf"^{_PUNCTUATION}(hi+|hello+|hey+|hiya|namaste|good\s+(morning|afternoon|evening))"
+        rf"(\s+(there|team|pumpernickel|guys|all))?{_PUNCTUATION}$",
+        re.IGNORECASE,
+    ),
+    "thanks": re.compile(
+        rf"^{_PUNCTUATION}((ok(ay)?|great|perfect|cool|nice|awesome)[\s,]+)?"
+        rf"(thanks?|thank\s*(you|u)|thx|ty|tysm|appreciate\s+it)(\s+(so|very)\s+much|\s+a\s+lot)?{_PUNCTUATION}$",
+        re.IGNORECASE,
+    ),
+    "goodbye": re.compile(
+        rf"^{_PUNCTUATION}(bye+|good\s*bye|see\s+(you|ya)|take\s+care|have\s+a\s+(nice|good|great)\s+day)"
+        rf"{_PUNCTUATION}$",
+        re.IGNORECASE,
+    ),
+}
+# Leading greeting stripped before looking for a structured question ("hi, how much is ...")
+GREETING_PREFIX = re.compile(
+    r"^\s*(hi+|hello+|hey+|namaste|good\s+(morning|afternoon|evening))\b[\s!.,]*", re.IGNORECASE
+)
+
+
+def _canned_replies() -> Dict[str, str]:
+    return {
+        "greeting": (
+            f"Hi! 👋 Welcome to {BUSINESS_INFO.name}. How can I help you today? "
+            "Ask me about our cakes and prices, or tell me what you would like to order."
+        ),
+        "thanks": "You're welcome! 😊 Let us know if there is anything else we can help you with.",
+        "goodbye": f"Thank you for reaching out to {BUSINESS_INFO.name}. Have a lovely day! 🍰",
+    }
+
+
+@dataclass
+class QuickReply:
+    intent: str
+    confidence: float
+    source: str
+    reply: Optional[str] = None
+
+    @property
+    def handled(self) -> bool:
+        return self.reply is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "handled": self.handled,
+            "intent": self.intent,
+            "confidence": round(self.confidence, 3),
+            "source": self.source,
+            "reply": self.reply,
+        }
+
+
+class IntentClassifier:
+    """
+    Answers trivial customer messages locally so they skip the agent chain.
+
+    Whole-message regexes catch unambiguous greetings, thanks and goodbyes.
+    Other short messages are embedded and matched to the nearest intent
+    centroid; small talk matched with enough similarity and margin gets a
+    canned reply, and price, allergen and business FAQ questions get a
+    templated answer from FastAnswerer. Everything else is reported as not
+    handled and should go to the chain. Without an embedding model only the
+    regexes and templated answers are used.
+    """
+
+    def __init__(
+        self,
+        fast_answers: Optional[FastAnswerer] = None,
+        min_similarity: float = INTENT_MIN_SIMILARITY,
+        min_margin: float = INTENT_MIN_MARGIN,
+    ):
+        self.fast_answers = fast_answers or FastAnswerer()
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self._intents: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._centroids_built = False
+        self.stats = {"messages": 0, "short_circuited": 0, "by_intent": {}, "by_source": {}}
+
+    def _build_centroids(self) -> Optional[np.ndarray]:
+        with self._lock:
+            if not self._centroids_built:
+                intents = list(INTENT_EXAMPLES)
+                examples = [text for intent in intents for text in INTENT_EXAMPLES[intent]]
+                embeddings = embed_texts(examples)
+                if embeddings is not None:
+                    centroids, start = [], 0
+                    for intent in intents:
+                        count = len(INTENT_EXAMPLES[intent])
+                        centroid = embeddings[start:start + count].mean(axis=0)
+                        centroids.append(centroid / np.linalg.norm(centroid))
+                        start += count
+                    self._intents, self._centroids = intents, np.stack(centroids).astype(np.float32)
+                self._centroids_built = True
+        return self._centroids
+
+    def nearest_intent(self, message: str) -> Optional[tuple]:
+        """(intent, similarity, margin over the runner-up), or None without embeddings"""
+        centroids = self._build_centroids()
+        if centroids is None:
+            return None
+        scores = centroids @ embed_texts([message])[0]
+        order = np.argsort(-scores)
+        best, second = int(order[0]), int(order[1])
+        return self._intents[best], float(scores[best]), float(scores[best] - scores[second])
+
+    def _classify(self, message: str) -> QuickReply:
+        text = message.strip()
+        if not text or len(text.split()) > QUICK_REPLY_MAX_WORDS:
+            return QuickReply("unknown", 0.0, "length")
+
+        canned = _canned_replies()
+        for intent, pattern in SMALL_TALK_PATTERNS.items():
+            if pattern.match(text):
+                return QuickReply(intent, 1.0, "rule", canned[intent])
+
+        question = GREETING_PREFIX.sub("", text)
+        # Counted in this classifier's stats, not in FastAnswerer's stats of the inquiry tools
+        answer = self.fast_answers.answer_product(question, record=False)
+        answer = answer or self.fast_answers.answer_company(question, record=False)
+        if answer:
+            return QuickReply("inquiry", 1.0, "faq", answer)
+
+        nearest = self.nearest_intent(text)
+        if nearest is None:
+            return QuickReply("unknown", 0.0, "none")
+        intent, similarity, margin = nearest
+        if intent in SMALL_TALK_INTENTS and similarity >= self.min_similarity and margin >= self.min_margin:
+            return QuickReply(intent, similarity, "embedding", canned[intent])
+        return QuickReply(intent, similarity, "embedding")
+
+    def quick_reply(self, message: str) -> QuickReply:
+        """Classify a customer message and return a local reply when it is safe to skip the chain"""
+        result = self._classify(message)
+        with self._lock:
+            self.stats["messages"] += 1
+            if result.handled:
+                self.stats["short_circuited"] += 1
+                by_intent = self.stats["by_intent"]
+                by_intent[result.intent] = by_intent.get(result.intent, 0) + 1
+                by_source = self.stats["by_source"]
+                by_source[result.source] = by_source.get(result.source, 0) + 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                **self.stats,
+                "by_intent": dict(self.stats["by_intent"]),
+                "by_source": dict(self.stats["by_source"]),
+            }
+        stats["sent_to_chain"] = stats["messages"] - stats["short_circuited"]
+        stats["chain_skip_rate"] = (
+            round(stats["short_circuited"] / stats["messages"], 3) if stats["messages"] else 0.0
+        )
+        stats["embeddings"] = self._centroids is not None
+        return stats
@@ -1,8 +1,14 @@
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, field
+import hashlib
+import json
 import logging
+import re
+import threading
 from typing import Dict, Any, List, Optional
 
+logger = logging.getLogger(__name__)
+
 
 # ===============================
 # Data Models and Enums
@@ -182,12 +188,13 @@ PRODUCT_CATALOG = [
 ]
 
 
-def get_product_by_name(name: str) -> Optional[Product]:
-    """Get product by name from the catalog"""
-    for product in PRODUCT_CATALOG:
-        if product.name.lower() == name.lower():
-            return product
-    return None
+def get_product_by_name(name: str, fuzzy: bool = True) -> Optional[Product]:
+    """Get product by name, alias or (optionally) a misspelling of either from the catalog"""
+    index = get_catalog_index()
+    product = index.by_name.get(name) or index.lookup(name)
+    if product is None and fuzzy:
+        product = index.fuzzy_lookup(name)
+    return product
 
 
 def order_information_requirements() -> Dict[str, Any]:
@@ -326,9 +333,9 @@ def check_allergen_info(product_name: str, allergen: str = "") -> Dict[str, Any]
             }
 
             if allergen:
-                allergen_present = allergen.lower() in [
-                    a.lower() for a in product.allergens
-                ]
+                allergen_present = (
+                    allergen.lower() in get_catalog_index().allergens_by_product[product.name]
+                )
                 result["specific_allergen"] = {
                     "allergen": allergen,
                     "present": allergen_present,
@@ -338,20 +345,258 @@ def check_allergen_info(product_name: str, allergen: str = "") -> Dict[str, Any]
             return result
         else:
             # Return allergen summary for all products
-            all_allergens = set()
-            product_allergens = {}
-
-            for product in PRODUCT_CATALOG:
-                all_allergens.update(product.allergens)
-                product_allergens[product.name] = product.allergens
-
+            index = get_catalog_index()
             return {
-                "all_allergens": sorted(list(all_allergens)),
-                "product_allergens": product_allergens,
-                "allergen_free_products": [
-                    p.name for p in PRODUCT_CATALOG if len(p.allergens) == 0
-                ],
+                "all_allergens": list(index.all_allergens),
+                "product_allergens": {p.name: p.allergens for p in index.products},
+                "allergen_free_products": list(index.allergen_free_products),
             }
     except Exception as e:
         logger.error(f"Error checking allergen info: {e}")
         return {"error": "Failed to retrieve allergen information"}
+
+
+_knowledge_generation = 0
+_knowledge_version_key = None
+_knowledge_version = None
+
+
+def knowledge_version() -> str:
+    """
+    Fingerprint of the product catalog, FAQ and business info.
+
+    Used to key anything derived from the knowledge base (rendered prompts,
+    indexes, cached answers). The check is O(1): the content hash is only
+    recomputed when products are added or removed, the catalog list, business
+    info or get_faq is replaced, or invalidate_knowledge() is called. Edit
+    products in place through set_product_catalog() or follow the edit with
+    invalidate_knowledge().
+    """
+    global _knowledge_version_key, _knowledge_version
+    key = (
+        _knowledge_generation,
+        id(PRODUCT_CATALOG),
+        len(PRODUCT_CATALOG),
+        id(BUSINESS_INFO),
+        id(get_faq),
+    )
+    if key != _knowledge_version_key:
+        payload = json.dumps(
+            {
+                "products": [product.to_dict() for product in PRODUCT_CATALOG],
+                "faq": get_faq(),
+                "business_info": asdict(BUSINESS_INFO),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        _knowledge_version = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        _knowledge_version_key = key
+    return _knowledge_version
+
+
+def invalidate_knowledge() -> None:
+    """Force everything derived from the knowledge base to be rebuilt"""
+    global _knowledge_generation
+    _knowledge_generation += 1
+
+
+def set_product_catalog(products: List[Product]) -> None:
+    """
+    Replace the catalog contents and rebuild the catalog index.
+
+    PRODUCT_CATALOG is updated in place so modules holding a reference to it
+    see the new products.
+    """
+    PRODUCT_CATALOG[:] = products
+    invalidate_knowledge()
+    get_catalog_index()
+
+
+# ===============================
+# Catalog Index
+# ===============================
+
+# Minimum trigram similarity (Dice coefficient) for a typo-tolerant match
+FUZZY_MATCH_THRESHOLD = 0.6
+# Lead of the best fuzzy match over the best alias of another product
+FUZZY_MATCH_MARGIN = 0.1
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"${text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class CatalogIndex:
+    """
+    Precomputed lookups over the product catalog.
+
+    Aliases are lowercase product names plus single words that point at
+    exactly one product: "snickers" is an alias of Snickers Delight, while
+    "chocolate" (in one name but three products' tags) is not. Aliases are
+    also indexed by character trigram for typo-tolerant lookup.
+    """
+
+    version: str
+    products: List[Product]
+    by_name: Dict[str, Product] = field(default_factory=dict)
+    by_lower_name: Dict[str, Product] = field(default_factory=dict)
+    by_alias: Dict[str, Product] = field(default_factory=dict)
+    by_category: Dict[str, List[Product]] = field(default_factory=dict)
+    by_tag: Dict[str, List[Product]] = field(default_factory=dict)
+    by_allergen: Dict[str, List[Product]] = field(default_factory=dict)
+    allergens_by_product: Dict[str, frozenset] = field(default_factory=dict)
+    all_allergens: tuple = ()
+    allergen_free_products: tuple = ()
+    # Words shared by several products; they never resolve to a single product
+    ambiguous_words: frozenset = frozenset()
+    # Words of each product's name and tags, and of all products
+    words_by_product: Dict[str, frozenset] = field(default_factory=dict)
+    vocabulary: frozenset = frozenset()
+    trigram_postings: Dict[str, List[str]] = field(default_factory=dict)
+    trigram_counts: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, products: List[Product], version: str) -> "CatalogIndex":
+        index = cls(version=version, products=list(products))
+        owners: Dict[str, set] = {}
+        for product in index.products:
+            words = frozenset(_words(product.name + " " + " ".join(product.tags)))
+            index.words_by_product[product.name] = words
+            for word in words:
+                owners.setdefault(word, set()).add(product.name)
+
+        for product in index.products:
+            lower_name = product.name.lower()
+            index.by_name[product.name] = product
+            index.by_lower_name[lower_name] = product
+            index.by_alias[lower_name] = product
+            for word in _words(product.name):
+                if len(owners[word]) == 1 and len(word) > 3:
+                    index.by_alias.setdefault(word, product)
+            index.by_category.setdefault(product.category.value, []).append(product)
+            for tag in product.tags:
+                index.by_tag.setdefault(tag.lower(), []).append(product)
+            allergens = frozenset(a.lower() for a in product.allergens)
+            index.allergens_by_product[product.name] = allergens
+            for allergen in allergens:
+                index.by_allergen.setdefault(allergen, []).append(product)
+
+        index.all_allergens = tuple(sorted({a for p in index.products for a in p.allergens}))
+        index.allergen_free_products = tuple(p.name for p in index.products if not p.allergens)
+        index.ambiguous_words = frozenset(w for w, names in owners.items() if len(names) > 1)
+        index.vocabulary = frozenset(owners)
+
+        for alias in index.by_alias:
+            grams = _trigrams(alias)
+            index.trigram_counts[alias] = len(grams)
+            for gram in grams:
+                index.trigram_postings.setdefault(gram, []).append(alias)
+        return index
+
+    def lookup(self, name: str) -> Optional[Product]:
+        """Exact lookup by case-insensitive name or alias"""
+        key = " ".join(_words(name))
+        return self.by_lower_name.get(key) or self.by_alias.get(key)
+
+    def fuzzy_lookup(
+        self,
+        name: str,
+        threshold: float = FUZZY_MATCH_THRESHOLD,
+        single_word_aliases: bool = False,
+    ) -> Optional[Product]:
+        """
+        Best alias match by trigram similarity, e.g. "tiramsu" -> Tiramisu.
+
+        None unless the match is unambiguous: the query needs a word that is
+        not shared by several products, no catalog word of the query may be
+        missing from the matched product ("pistachio cheesecake" is not
+        Pistachio Cake), and the match has to beat every other product's
+        best alias by FUZZY_MATCH_MARGIN.
+        """
+        words = _words(name)
+        if not words or all(word in self.ambiguous_words for word in words):
+            return None
+        key = " ".join(words)
+        grams = _trigrams(key)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for alias in self.trigram_postings.get(gram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+
+        # product name -> (best alias, score)
+        best: Dict[str, tuple] = {}
+        for alias, count in shared.items():
+            if single_word_aliases and " " in alias:
+                continue
+            score = 2 * count / (len(grams) + self.trigram_counts[alias])
+            product_name = self.by_alias[alias].name
+            if score > best.get(product_name, (None, 0.0))[1]:
+                best[product_name] = (alias, score)
+        ranked = sorted(best.values(), key=lambda match: match[1], reverse=True)
+        if not ranked or ranked[0][1] < threshold:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < FUZZY_MATCH_MARGIN:
+            return None
+        product = self.by_alias[ranked[0][0]]
+        product_words = self.words_by_product[product.name]
+        if any(word in self.vocabulary and word not in product_words for word in words):
+            return None
+        return product
+
+    def products_with_words(self, text: str) -> List[Product]:
+        """Products whose name and tags contain every word of the text, e.g. all cheesecakes for "cheesecake" """
+        words = set(_words(text))
+        if not words or not words <= self.vocabulary:
+            return []
+        return [product for product in self.products if words <= self.words_by_product[product.name]]
+
+    def find_in_text(self, text: str) -> List[Product]:
+        """
+        Products mentioned in free text, by full name, alias or misspelt alias.
+
+        Misspellings are only matched word by word against single-word aliases,
+        and words shared by several products ("cheesecake") are never fuzzy matched.
+        """
+        words = _words(text)
+        normalized = " ".join(words)
+        found: Dict[str, Product] = {}
+        for lower_name, product in self.by_lower_name.items():
+            if " " in lower_name and f" {lower_name} " in f" {normalized} ":
+                found[product.name] = product
+        for word in words:
+            product = self.by_alias.get(word)
+            if product is None and len(word) >= 5 and word not in self.ambiguous_words:
+                product = self.fuzzy_lookup(word, single_word_aliases=True)
+            if product is not None:
+                found[product.name] = product
+        return list(found.values())
+
+
+_catalog_index: Optional[CatalogIndex] = None
+_catalog_index_lock = threading.Lock()
+
+
+def get_catalog_index() -> CatalogIndex:
+    """
+    Get the catalog index for the current knowledge version.
+
+    A changed catalog is indexed into a new CatalogIndex that replaces the old
+    one in a single assignment, so readers never see a half-built index.
+    """
+    global _catalog_index
+    version = knowledge_version()
+    index = _catalog_index
+    if index is None or index.version != version:
+        with _catalog_index_lock:
+            index = _catalog_index
+            if index is None or index.version != version:
+                index = CatalogIndex.build(PRODUCT_CATALOG, version)
+                _catalog_index = index
+    return index
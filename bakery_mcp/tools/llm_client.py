@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import dotenv
+import httpx
+from google import genai
+from google.genai import types
+
+from tools.tracing import record_llm_response, span
+
+dotenv.load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Connection pool limits for the shared Gemini client
+GEMINI_MAX_CONNECTIONS = int(os.environ.get("GEMINI_MAX_CONNECTIONS", "10"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.environ.get("GEMINI_KEEPALIVE_EXPIRY", "300"))
+
+# Maximum number of Gemini calls in flight at once from the async tools
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8"))
+
+
+class ConnectionStats:
+    """
+    Counts requests, new TCP connections and TLS handshakes made by the shared client.
+
+    The counters are fed by httpcore trace events, so a request that goes out on
+    a pooled keep-alive connection shows up as a request without a connect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def _record(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._record(event_name)
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._record(event_name)
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def aon_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+            }
+
+
+connection_stats = ConnectionStats()
+
+_client: Optional[genai.Client] = None
+_client_lock = threading.Lock()
+
+_concurrency_limit = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+_in_flight = 0
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_gemini_client() -> genai.Client:
+    """
+    Get the process-wide Gemini client.
+
+    The client is created on first use, not at import, so the server starts
+    without GEMINI_API_KEY and only the tools calling Gemini fail. It keeps a
+    bounded pool of keep-alive connections, so repeated tool calls skip client
+    construction and TLS handshakes.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client(
+                    api_key=GEMINI_API_KEY,
+                    http_options=types.HttpOptions(
+                        client_args={
+                            "limits": _pool_limits(),
+                            "event_hooks": {"request": [connection_stats.on_request]},
+                        },
+                        async_client_args={
+                            "limits": _pool_limits(),
+                            "event_hooks": {"request": [connection_stats.aon_request]},
+                        },
+                    ),
+                )
+                logger.info(
+                    f"Created shared Gemini client (max_connections={GEMINI_MAX_CONNECTIONS}, "
+                    f"max_keepalive={GEMINI_MAX_KEEPALIVE_CONNECTIONS})"
+                )
+    return _client
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """Connection reuse counters of the shared Gemini client"""
+    return connection_stats.to_dict()
+
+
+async def agenerate_content(
+    contents: Any,
+    model: str = DEFAULT_MODEL,
+    config: Optional[types.GenerateContentConfig] = None,
+) -> types.GenerateContentResponse:
+    """
+    Call Gemini through the async API of the shared client.
+
+    At most GEMINI_MAX_CONCURRENCY calls run at once; the rest wait here
+    without blocking the event loop.
+    """
+    global _in_flight
+    async with _concurrency_limit:
+        _in_flight += 1
+        try:
+            with span("gemini generate_content", **{"gen_ai.request.model": model}) as current:
+                response = await get_gemini_client().aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+                record_llm_response(current, contents, response)
+                return response
+        finally:
+            _in_flight -= 1
+
+
+def generate_content(
+    contents: Any,
+    model: str = DEFAULT_MODEL,
+    config: Optional[types.GenerateContentConfig] = None,
+) -> types.GenerateContentResponse:
+    """Call Gemini through the blocking API of the shared client"""
+    with span("gemini generate_content", **{"gen_ai.request.model": model}) as current:
+        response = get_gemini_client().models.generate_content(model=model, contents=contents, config=config)
+        record_llm_response(current, contents, response)
+        return response
+
+
+def get_concurrency_stats() -> Dict[str, Any]:
+    """Async Gemini call concurrency limit and current usage"""
+    return {"limit": GEMINI_MAX_CONCURRENCY, "in_flight": _in_flight}
@@ -1,24 +1,18 @@
 import pandas as pd
 from pydantic import BaseModel
+import asyncio
 import uuid
 import json
 import os
+import threading
 import dotenv
 dotenv.load_dotenv()
 from typing import List
 from typing import Optional
 from tools.knowledge import order_information_requirements
-
-
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-
-import json
-import re
-
-
-
-from google import genai
-
+from tools.order_storage import OrderStorage, create_order_storage
+from tools.tracing import span
+from tools.llm_client import agenerate_content, generate_content
 
 
 class Order(BaseModel):
@@ -41,90 +35,53 @@ class OrderLineItem(BaseModel):
 
 
 class OrderManager:
-    def __init__(self):
-        self.storage = "orders.csv"
-        try:
-            self.df = pd.read_csv(self.storage)
-        except FileNotFoundError:
-            # Create empty DataFrame with order columns
-            self.df = pd.DataFrame()
+    def __init__(self, storage: Optional[OrderStorage] = None):
+        self._storage = storage
+        self._storage_lock = threading.Lock()
+
+    @property
+    def storage(self) -> OrderStorage:
+        """Storage engine, opened on first use"""
+        if self._storage is None:
+            with self._storage_lock:
+                if self._storage is None:
+                    self._storage = create_order_storage()
+        return self._storage
 
     def create_order(self, order: Order, order_line_items: List[OrderLineItem]):
-        """Create an order with line items stored in the same row with _line_{n} suffix"""
+        """Create an order with its line items"""
         if order.order_id is None:
             order.order_id = str(uuid.uuid4())
-        
-        # Start with the order data
-        row_data = order.model_dump()
-        
-        # Add line items with _line_{n} suffix
-        for i, item in enumerate(order_line_items, 1):
-            for key, value in item.model_dump().items():
-                row_data[f"{key}_line_{i}"] = value
-        
-        # Convert to DataFrame and append
-        new_row = pd.DataFrame([row_data])
-        if self.df.empty:
-            self.df = new_row
-        else:
-            self.df = pd.concat([self.df, new_row], ignore_index=True)
-        
-        self.df.to_csv(self.storage, index=False)
+
+        with span("order_storage insert", **{"order_storage.engine": type(self.storage).__name__}):
+            self.storage.insert(
+                order.model_dump(), [item.model_dump() for item in order_line_items]
+            )
         return order.order_id
 
     def get_order(self, user_id: str):
         """Get orders by user_id"""
-        return self.df[self.df["user_id"] == user_id].to_dict(orient="records")
+        return self.storage.get_by_user(user_id)
 
     def get_order_by_id(self, order_id: str):
         """Get a specific order by order_id"""
-        result = self.df[self.df["order_id"] == order_id]
-        if result.empty:
-            return None
-        return result.to_dict(orient="records")[0]
+        return self.storage.get_by_id(order_id)
 
     def get_all_orders(self):
         """Get all orders"""
-        return self.df.to_dict(orient="records")
+        return self.storage.get_all()
 
     def update_order(self, order_id: str, order: Order, order_line_items: List[OrderLineItem] = None):
         """Update an existing order"""
-        if order_id not in self.df["order_id"].values:
-            return False
-        
-        # Update order details
-        for key, value in order.model_dump().items():
-            if key in self.df.columns:
-                self.df.loc[self.df["order_id"] == order_id, key] = value
-        
-        # Update line items if provided
-        if order_line_items:
-            # Remove existing line item columns for this order
-            row_index = self.df[self.df["order_id"] == order_id].index[0]
-            line_columns = [col for col in self.df.columns if "_line_" in col]
-            for col in line_columns:
-                self.df.at[row_index, col] = None
-            
-            # Add new line items
-            for i, item in enumerate(order_line_items, 1):
-                for key, value in item.model_dump().items():
-                    col_name = f"{key}_line_{i}"
-                    if col_name not in self.df.columns:
-                        self.df[col_name] = None
-                    self.df.at[row_index, col_name] = value
-        
-        self.df.to_csv(self.storage, index=False)
-        return True
+        order_data = order.model_dump(exclude={"order_id"})
+        line_items = [item.model_dump() for item in order_line_items] if order_line_items else None
+        return self.storage.update(order_id, order_data, line_items)
 
     def delete_order(self, order_id: str):
         """Delete an order by order_id"""
-        initial_length = len(self.df)
-        self.df = self.df[self.df["order_id"] != order_id]
-        self.df.to_csv(self.storage, index=False)
-        return len(self.df) < initial_length
+        return self.storage.delete(order_id)
 
-    def create_order_from_text(self, user_order: str):
-        """Create an order from natural language text using LLM"""
+    def _create_order_from_text_prompt(self, user_order: str) -> str:
         prompt = f"""
         You are an expert order manager.
         You will be given a user order.
@@ -154,18 +111,10 @@ class OrderManager:
             "order_line_items": [{ {name: field.annotation for name, field in OrderLineItem.model_fields.items()}}]
         }}
         """
+        return prompt
 
-        # try:
-        # The client gets the API key from the environment variable `GEMINI_API_KEY`.
-
-        client = genai.Client(api_key=GEMINI_API_KEY)
-
-        data = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        )
-        data = data.candidates[0].content.parts[0].text
-
+    def _parse_order_response(self, data: str):
+        """Parse the LLM JSON response into an Order and its OrderLineItems"""
         json_response = json.loads(data)
 
         order_data = json_response["order"]
@@ -174,20 +123,31 @@ class OrderManager:
         # Create Order and OrderLineItem objects
         order = Order(**order_data)
         order_line_items = [OrderLineItem(**item) for item in order_line_items_data]
+        return order, order_line_items
+
+    def create_order_from_text(self, user_order: str):
+        """Create an order from natural language text using LLM"""
+        prompt = self._create_order_from_text_prompt(user_order)
+
+        data = generate_content(prompt)
+        data = data.candidates[0].content.parts[0].text
+        order, order_line_items = self._parse_order_response(data)
 
         # Create the order
         order_id = self.create_order(order, order_line_items)
         return order_id
 
-        # except Exception as e:
-        #     print(f"Error creating order from text: {e}")
-        #     return None
+    async def create_order_from_text_async(self, user_order: str):
+        """Non-blocking version of create_order_from_text"""
+        prompt = self._create_order_from_text_prompt(user_order)
+        data = await agenerate_content(prompt)
+        data = data.candidates[0].content.parts[0].text
+        order, order_line_items = self._parse_order_response(data)
 
-    
-    def are_order_details_complete(self, customer_order_details: str) -> bool:
-        """
-        Check if the order details are complete.
-        """
+        # Storage writes are blocking, keep them off the event loop
+        return await asyncio.to_thread(self.create_order, order, order_line_items)
+
+    def _are_order_details_complete_prompt(self, customer_order_details: str) -> str:
         prompt = f"""
         You are an expert order manager.
         Your job is to check the order details and check if the order details are complete.
@@ -202,15 +162,23 @@ class OrderManager:
 
         Return True or False.
         """
+        return prompt
 
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        data = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        )
+    def are_order_details_complete(self, customer_order_details: str) -> bool:
+        """
+        Check if the order details are complete.
+        """
+        prompt = self._are_order_details_complete_prompt(customer_order_details)
+        data = generate_content(prompt)
         data = data.candidates[0].content.parts[0].text
         return data
 
+    async def are_order_details_complete_async(self, customer_order_details: str) -> bool:
+        """Non-blocking version of are_order_details_complete"""
+        prompt = self._are_order_details_complete_prompt(customer_order_details)
+        data = await agenerate_content(prompt)
+        return data.candidates[0].content.parts[0].text
+
 
     def extract_line_items_from_order(self, order_data: dict):
         """Extract line items from a row that contains _line_{n} suffixed columns"""
@@ -272,4 +240,22 @@ class OrderManager:
         Convert kilograms to pounds.
         """
         return kilograms / 0.45359237
-    
+
+
+_order_manager: Optional[OrderManager] = None
+_order_manager_lock = threading.Lock()
+
+
+def get_order_manager() -> OrderManager:
+    """
+    Get the process-wide OrderManager shared by all MCP tools.
+
+    The manager and its storage engine are created on first use, so tools that
+    never touch storage (e.g. the completeness check) do not open it at all.
+    """
+    global _order_manager
+    if _order_manager is None:
+        with _order_manager_lock:
+            if _order_manager is None:
+                _order_manager = OrderManager()
+    return _order_manager
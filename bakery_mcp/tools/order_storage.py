@@ -0,0 +1,430 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+ORDER_COLUMNS = [
+    "order_id",
+    "name",
+    "address",
+    "user_id",
+    "contact_number",
+    "date",
+    "time",
+    "item_ordered",
+    "delivery_notes",
+    "order_type",
+]
+
+LINE_ITEM_COLUMNS = ["item_name", "quantity", "price"]
+
+# Order fields are text; without this pandas reads contact numbers as floats ("9841000000.0")
+CSV_DTYPES = {col: str for col in ORDER_COLUMNS}
+
+
+def flatten_line_items(order: Dict[str, Any], line_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flatten an order and its line items into a single row with _line_{n} suffixed columns"""
+    row_data = dict(order)
+    for i, item in enumerate(line_items, 1):
+        for key, value in item.items():
+            row_data[f"{key}_line_{i}"] = value
+    return row_data
+
+
+class OrderStorage(ABC):
+    """Storage engine behind OrderManager.
+
+    Orders are passed in as plain dicts and returned as flat rows with
+    _line_{n} suffixed line item columns, which is the shape OrderManager
+    has always exposed to its callers.
+    """
+
+    @abstractmethod
+    def insert(self, order: Dict[str, Any], line_items: List[Dict[str, Any]]) -> None:
+        """Insert a new order with its line items"""
+
+    @abstractmethod
+    def update(
+        self,
+        order_id: str,
+        order: Dict[str, Any],
+        line_items: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """Update an existing order. Line items are replaced when provided"""
+
+    @abstractmethod
+    def delete(self, order_id: str) -> bool:
+        """Delete an order by order_id"""
+
+    @abstractmethod
+    def get_by_id(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Get a specific order by order_id"""
+
+    @abstractmethod
+    def get_by_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get orders by user_id"""
+
+    @abstractmethod
+    def get_all(self) -> List[Dict[str, Any]]:
+        """Get all orders"""
+
+    def count(self) -> int:
+        """Number of stored orders"""
+        return len(self.get_all())
+
+    def close(self) -> None:
+        """Release any resources held by the engine"""
+
+
+class CSVOrderStorage(OrderStorage):
+    """Legacy storage: one CSV row per order, rewritten end to end on every write.
+
+    The DataFrame is kept in memory between calls and only re-read when the
+    file's inode, size or mtime no longer match what this process last saw,
+    i.e. when another process has rewritten it.
+    """
+
+    def __init__(self, path: str = "orders.csv"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self.df = pd.DataFrame()
+        self._refresh_if_stale()
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _refresh_if_stale(self) -> None:
+        signature = self._current_signature()
+        if signature == self._file_signature:
+            return
+        try:
+            self.df = pd.read_csv(self.path, dtype=CSV_DTYPES)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            # Create empty DataFrame with order columns
+            self.df = pd.DataFrame()
+        self._file_signature = signature
+
+    def _save(self) -> None:
+        self.df.to_csv(self.path, index=False)
+        self._file_signature = self._current_signature()
+
+    def insert(self, order: Dict[str, Any], line_items: List[Dict[str, Any]]) -> None:
+        new_row = pd.DataFrame([flatten_line_items(order, line_items)])
+        with self._lock:
+            self._refresh_if_stale()
+            if self.df.empty:
+                self.df = new_row
+            else:
+                self.df = pd.concat([self.df, new_row], ignore_index=True)
+            self._save()
+
+    def update(
+        self,
+        order_id: str,
+        order: Dict[str, Any],
+        line_items: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        with self._lock:
+            self._refresh_if_stale()
+            if self.df.empty or order_id not in self.df["order_id"].values:
+                return False
+
+            # Update order details
+            for key, value in order.items():
+                if key in ORDER_COLUMNS and key not in self.df.columns:
+                    self.df[key] = None
+                if key in self.df.columns:
+                    self.df.loc[self.df["order_id"] == order_id, key] = value
+
+            # Update line items if provided
+            if line_items:
+                # Remove existing line item columns for this order
+                row_index = self.df[self.df["order_id"] == order_id].index[0]
+                line_columns = [col for col in self.df.columns if "_line_" in col]
+                for col in line_columns:
+                    self.df.at[row_index, col] = None
+
+                # Add new line items
+                for i, item in enumerate(line_items, 1):
+                    for key, value in item.items():
+                        col_name = f"{key}_line_{i}"
+                        if col_name not in self.df.columns:
+                            self.df[col_name] = None
+                        self.df.at[row_index, col_name] = value
+
+            self._save()
+            return True
+
+    def delete(self, order_id: str) -> bool:
+        with self._lock:
+            self._refresh_if_stale()
+            if self.df.empty:
+                return False
+            initial_length = len(self.df)
+            self.df = self.df[self.df["order_id"] != order_id]
+            self._save()
+            return len(self.df) < initial_length
+
+    def _snapshot(self) -> pd.DataFrame:
+        with self._lock:
+            self._refresh_if_stale()
+            return self.df
+
+    def get_by_id(self, order_id: str) -> Optional[Dict[str, Any]]:
+        df = self._snapshot()
+        if df.empty:
+            return None
+        result = df[df["order_id"] == order_id]
+        if result.empty:
+            return None
+        return result.to_dict(orient="records")[0]
+
+    def get_by_user(self, user_id: str) -> List[Dict[str, Any]]:
+        df = self._snapshot()
+        if df.empty:
+            return []
+        return df[df["user_id"] == user_id].to_dict(orient="records")
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        return self._snapshot().to_dict(orient="records")
+
+    def count(self) -> int:
+        return len(self._snapshot())
+
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    {", ".join(f"{col} TEXT" for col in ORDER_COLUMNS if col != "order_id")},
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id);
+CREATE TABLE IF NOT EXISTS order_line_items (
+    order_id TEXT NOT NULL REFERENCES orders (order_id) ON DELETE CASCADE,
+    line_number INTEGER NOT NULL,
+    item_name TEXT,
+    quantity INTEGER,
+    price REAL,
+    PRIMARY KEY (order_id, line_number)
+);
+CREATE INDEX IF NOT EXISTS idx_order_line_items_order_id ON order_line_items (order_id);
+"""
+
+
+class SQLiteOrderStorage(OrderStorage):
+    """Normalized orders / order_line_items tables in a WAL-mode SQLite database.
+
+    Inserts append rows instead of rewriting the store, lookups by order_id
+    and user_id go through indexes, and writes are serialized by SQLite so
+    concurrent tool calls cannot clobber each other.
+    """
+
+    def __init__(self, path: str = "orders.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    def _insert_line_items(self, order_id: str, line_items: List[Dict[str, Any]]) -> None:
+        self.conn.executemany(
+            "INSERT INTO order_line_items (order_id, line_number, item_name, quantity, price) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (order_id, i, item.get("item_name"), item.get("quantity"), item.get("price"))
+                for i, item in enumerate(line_items, 1)
+            ],
+        )
+
+    def insert(self, order: Dict[str, Any], line_items: List[Dict[str, Any]]) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}, created_at) "
+                f"VALUES ({', '.join('?' for _ in ORDER_COLUMNS)}, ?)",
+                [order.get(col) for col in ORDER_COLUMNS] + [time.time()],
+            )
+            self._insert_line_items(order["order_id"], line_items)
+
+    def insert_many(self, orders: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> None:
+        """Bulk insert (order, line_items) pairs in a single transaction"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}, created_at) "
+                f"VALUES ({', '.join('?' for _ in ORDER_COLUMNS)}, ?)",
+                [[order.get(col) for col in ORDER_COLUMNS] + [now] for order, _ in orders],
+            )
+            for order, line_items in orders:
+                self._insert_line_items(order["order_id"], line_items)
+
+    def update(
+        self,
+        order_id: str,
+        order: Dict[str, Any],
+        line_items: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        columns = [col for col in ORDER_COLUMNS if col in order and col != "order_id"]
+        with self._lock, self.conn:
+            exists = self.conn.execute(
+                "SELECT 1 FROM orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+            if not exists:
+                return False
+            if columns:
+                self.conn.execute(
+                    f"UPDATE orders SET {', '.join(f'{col} = ?' for col in columns)} WHERE order_id = ?",
+                    [order[col] for col in columns] + [order_id],
+                )
+            if line_items:
+                self.conn.execute("DELETE FROM order_line_items WHERE order_id = ?", (order_id,))
+                self._insert_line_items(order_id, line_items)
+        return True
+
+    def delete(self, order_id: str) -> bool:
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
+        return cursor.rowcount > 0
+
+    def _rows_with_line_items(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            orders = self.conn.execute(
+                f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders {where} ORDER BY rowid",
+                params,
+            ).fetchall()
+            if not orders:
+                return []
+            order_ids = [row["order_id"] for row in orders]
+            line_items: Dict[str, List[Dict[str, Any]]] = {}
+            # Stay well under SQLite's bound parameter limit
+            for start in range(0, len(order_ids), 500):
+                chunk = order_ids[start:start + 500]
+                for item in self.conn.execute(
+                    f"SELECT order_id, {', '.join(LINE_ITEM_COLUMNS)} FROM order_line_items "
+                    f"WHERE order_id IN ({', '.join('?' for _ in chunk)}) ORDER BY order_id, line_number",
+                    chunk,
+                ):
+                    line_items.setdefault(item["order_id"], []).append(
+                        {col: item[col] for col in LINE_ITEM_COLUMNS}
+                    )
+        return [
+            flatten_line_items(dict(row), line_items.get(row["order_id"], []))
+            for row in orders
+        ]
+
+    def get_by_id(self, order_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._rows_with_line_items("WHERE order_id = ?", (order_id,))
+        return rows[0] if rows else None
+
+    def get_by_user(self, user_id: str) -> List[Dict[str, Any]]:
+        return self._rows_with_line_items("WHERE user_id = ?", (user_id,))
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        return self._rows_with_line_items()
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def order_ids(self) -> set:
+        """All stored order ids"""
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT order_id FROM orders")}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+def _split_csv_row(row: Dict[str, Any]):
+    """Split a legacy CSV row into order fields and its _line_{n} line items"""
+    order = {}
+    items: Dict[int, Dict[str, Any]] = {}
+    for key, value in row.items():
+        if pd.isna(value):
+            value = None
+        if "_line_" in key:
+            field, _, line_num = key.rpartition("_line_")
+            try:
+                items.setdefault(int(line_num), {})[field] = value
+            except ValueError:
+                continue
+        elif key in ORDER_COLUMNS:
+            order[key] = None if value is None else str(value)
+
+    line_items = []
+    for line_num in sorted(items):
+        item = items[line_num]
+        if all(value is None for value in item.values()):
+            continue
+        if item.get("quantity") is not None:
+            item["quantity"] = int(item["quantity"])
+        if item.get("price") is not None:
+            item["price"] = float(item["price"])
+        line_items.append(item)
+    return order, line_items
+
+
+def migrate_csv_to_sqlite(csv_path: str, storage: SQLiteOrderStorage) -> int:
+    """
+    One-shot migration of the legacy _line_{n} suffixed orders.csv into SQLite.
+
+    Orders already present in the database are skipped, so re-running the
+    migration is harmless. Returns the number of migrated orders.
+    """
+    try:
+        df = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return 0
+
+    existing = storage.order_ids()
+    orders = []
+    for row in df.to_dict(orient="records"):
+        order, line_items = _split_csv_row(row)
+        if not order.get("order_id") or order["order_id"] in existing:
+            continue
+        existing.add(order["order_id"])
+        orders.append((order, line_items))
+
+    if orders:
+        storage.insert_many(orders)
+    logger.info(f"Migrated {len(orders)} orders from {csv_path} to {storage.path}")
+    return len(orders)
+
+
+def create_order_storage(
+    backend: Optional[str] = None,
+    path: Optional[str] = None,
+    legacy_csv_path: str = "orders.csv",
+) -> OrderStorage:
+    """
+    Create the configured order storage engine.
+
+    The backend is read from ORDER_STORAGE_BACKEND ("sqlite" or "csv") when not
+    given. A fresh SQLite store imports the legacy orders.csv on first use.
+    """
+    backend = (backend or os.environ.get("ORDER_STORAGE_BACKEND", "sqlite")).lower()
+    if backend == "csv":
+        return CSVOrderStorage(path or legacy_csv_path)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown order storage backend: {backend}")
+
+    storage = SQLiteOrderStorage(path or os.environ.get("ORDER_STORAGE_PATH", "orders.db"))
+    if storage.count() == 0 and os.path.exists(legacy_csv_path):
+        migrate_csv_to_sqlite(legacy_csv_path, storage)
+    return storage
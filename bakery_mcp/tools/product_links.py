@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.instagram_posts import products_in_caption
+from tools.knowledge import PRODUCT_CATALOG, Product, get_catalog_index, get_product_by_name
+
+logger = logging.getLogger(__name__)
+
+# Built by build_link_index.py from the bakery's own posts
+LINK_INDEX_PATH = os.environ.get("LINK_INDEX_PATH", "product_links.json")
+# Most recent posts kept per product
+LINK_INDEX_MAX_POSTS = int(os.environ.get("LINK_INDEX_MAX_POSTS", "5"))
+
+
+def build_link_index(posts: List[Dict[str, Any]], max_posts: int = LINK_INDEX_MAX_POSTS) -> Dict[str, Any]:
+    """Product name -> its most recent posts, from posts as returned by get_user_posts"""
+    products: Dict[str, List[Dict[str, Any]]] = {product.name: [] for product in PRODUCT_CATALOG}
+    for post in sorted(posts, key=lambda post: post.get("taken_at") or "", reverse=True):
+        if not post.get("post_url"):
+            continue
+        link = {
+            "post_url": post["post_url"],
+            "thumbnail_url": post.get("media_url"),
+            "caption": (post.get("caption") or "")[:200],
+            "taken_at": post.get("taken_at"),
+        }
+        for product in products_in_caption(post.get("caption") or ""):
+            product_links = products.setdefault(product.name, [])
+            if len(product_links) < max_posts:
+                product_links.append(link)
+    return {"built_at": time.time(), "posts": len(posts), "products": products}
+
+
+class ProductLinkIndex:
+    """
+    Instagram post links per catalog product, served from memory.
+
+    The index is built offline (build_link_index.py) so a lookup during a
+    conversation never calls the Instagram API. The file is reloaded when
+    its mtime changes, so a periodic rebuild is picked up without a restart.
+    """
+
+    def __init__(self, path: str = LINK_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._built_at: Optional[float] = None
+        self._links: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats = {"lookups": 0, "found": 0, "not_found": 0, "ambiguous": 0, "reloads": 0}
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        links, built_at = {}, None
+        if mtime is not None:
+            try:
+                with open(self.path) as f:
+                    index = json.load(f)
+                links, built_at = index["products"], index.get("built_at")
+                self.stats["reloads"] += 1
+                logger.info(f"Loaded Instagram links of {sum(1 for posts in links.values() if posts)} products")
+            except Exception as e:
+                logger.warning(f"Could not load product link index from {self.path}: {e}")
+        self._links, self._built_at, self._mtime = links, built_at, mtime
+
+    def _resolve(self, name: str) -> Tuple[List[Product], bool]:
+        """
+        (products, ambiguous) a requested name stands for: the one product of a
+        name, alias or misspelling, every product a shared name fits
+        ("cheesecake", ambiguous), or else the products it mentions
+        """
+        product = get_product_by_name(name)
+        if product is not None:
+            return [product], False
+        index = get_catalog_index()
+        products = index.products_with_words(name)
+        if products:
+            return products, len(products) > 1
+        products = products_in_caption(name)
+        # "pistachio cheesecake" mentions Pistachio Cake, but is not one
+        covered = set().union(*(index.words_by_product[product.name] for product in products))
+        if any(word in index.vocabulary and word not in covered for word in re.findall(r"[a-z0-9]+", name.lower())):
+            return [], False
+        return products, False
+
+    def links(self, product_names: List[str]) -> Dict[str, Any]:
+        """
+        Post links per requested product. Names not in the catalog are listed
+        separately, and names several products fit are listed with those products.
+        """
+        with self._lock:
+            self._refresh()
+            found: Dict[str, List[Dict[str, Any]]] = {}
+            ambiguous: Dict[str, List[str]] = {}
+            unknown = []
+            for name in product_names:
+                products, is_ambiguous = self._resolve(name)
+                if not products:
+                    unknown.append(name)
+                if is_ambiguous:
+                    ambiguous[name] = [product.name for product in products]
+                for product in products:
+                    found[product.name] = self._links.get(product.name, [])
+            self.stats["lookups"] += len(product_names)
+            self.stats["ambiguous"] += len(ambiguous)
+            self.stats["found"] += sum(1 for posts in found.values() if posts)
+            self.stats["not_found"] += len(unknown) + sum(1 for posts in found.values() if not posts)
+            built_at = self._built_at
+        return {
+            "links": found,
+            "ambiguous_products": ambiguous,
+            "unknown_products": unknown,
+            "index_built_at": built_at,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            stats = dict(self.stats)
+            stats["products_with_links"] = sum(1 for posts in self._links.values() if posts)
+            stats["index_age_seconds"] = round(time.time() - self._built_at) if self._built_at else None
+        return stats
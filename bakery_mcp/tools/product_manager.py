@@ -1,73 +1,53 @@
-from google import genai
-import os
+import asyncio
+import functools
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from tools.knowledge import (
     PRODUCT_CATALOG, 
     BUSINESS_INFO, 
+    Product,
     get_faq, 
+    get_product_by_name,
+    knowledge_version,
     order_information_requirements,
 )
+from tools.fast_answers import FastAnswerer
+from tools.llm_client import agenerate_content, generate_content
+from tools.product_retrieval import get_product_retriever
+from tools.prompt_cache import PromptPrefixCache
+from tools.semantic_cache import SemanticCache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+PRODUCT_INQUIRY_ERROR = "I apologize, but I'm having trouble processing your product inquiry right now. Please contact us directly at our phone number or WhatsApp for immediate assistance."
+COMPANY_INQUIRY_ERROR = "I apologize, but I'm having trouble processing your business inquiry right now. Please contact us directly at our phone number or WhatsApp for immediate assistance."
 
-class ProductManager:
-    def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
-        self._prepare_knowledge_base()
-    
-    def _prepare_knowledge_base(self):
-        """Prepare comprehensive knowledge base for Gemini"""
-        self.knowledge_base = {
-            "business_info": {
-                "name": BUSINESS_INFO.name,
-                "established": BUSINESS_INFO.established,
-                "tagline": BUSINESS_INFO.tagline,
-                "location": BUSINESS_INFO.location,
-                "address": BUSINESS_INFO.address,
-                "phone": BUSINESS_INFO.phone,
-                "whatsapp": BUSINESS_INFO.whatsapp,
-                "email": BUSINESS_INFO.email,
-                "maps_link": BUSINESS_INFO.maps_link,
-                "hours": BUSINESS_INFO.hours,
-                "about": BUSINESS_INFO.about
-            },
-            "products": [product.to_dict() for product in PRODUCT_CATALOG],
-            "faq": get_faq(),
-            "order_requirements": order_information_requirements(),
-            "size_guidelines": {
-                "5inch": "Serves 4-6 people, perfect for small gatherings",
-                "8inch": "Serves 8-12 people, ideal for medium gatherings",
-                "serving_estimates": {
-                    "small_gathering": "4-6 people: 5inch cake",
-                    "medium_gathering": "8-12 people: 8inch cake", 
-                    "large_gathering": "12+ people: Multiple 8inch cakes or custom orders"
-                }
-            },
-            "pricing_info": {
-                "currency": "NPR (Nepalese Rupees)",
-                "price_ranges": {
-                    "budget_friendly": "1350-1850 NPR (5inch)",
-                    "mid_range": "1950-3250 NPR (8inch)",
-                    "premium": "3250-3790 NPR (specialty cakes)"
-                }
-            }
-        }
 
-    def get_product_by_name(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get product details by name"""
-        for product in PRODUCT_CATALOG:
-            if product.name.lower() == name.lower():
-                return product.to_dict()
-        return None
+def _render_products(products: List[Product]) -> str:
+    return "".join(
+        f"""
+- {product.name} ({product.category.value})
+  Sizes & Prices: {product.sizes}
+  Weights: {product.weights}
+  Description: {product.description}
+  Tags: {', '.join(product.tags)}
+  Allergens: {', '.join(product.allergens) if product.allergens else 'None'}
+"""
+        for product in products
+    )
 
-    def _create_product_prompt(self, user_query: str) -> str:
-        """Create prompt for product and allergy related queries"""
-        base_prompt = f"""
+
+@functools.lru_cache(maxsize=8)
+def _render_product_prompt_prefix(version: str, include_catalog: bool = True) -> str:
+    """
+    Render the static product prompt. `version` is the knowledge version it was rendered for.
+
+    Without `include_catalog` the product list is left out; the products
+    relevant to each query are then sent after the prefix instead.
+    """
+    base_prompt = f"""
         You will be responsible to handling cake related enquires.  
         You will not be comminicating with humans but with other agents.
         The agent will ask you question about what all products do we have, detail about specific product, price, size, allergens, etc.
@@ -76,23 +56,13 @@ class ProductManager:
        In this case tell the agent that we can make it for you. We do make custom cakes. Also recommend similar cakes we have if they want readymade.
 
         Respond to the query with the product details:
-
-AVAILABLE PRODUCTS:
 """
-        
+    if include_catalog:
         # Add product information
-        for product in PRODUCT_CATALOG:
-            base_prompt += f"""
-- {product.name} ({product.category.value})
-  Sizes & Prices: {product.sizes}
-  Weights: {product.weights}
-  Description: {product.description}
-  Tags: {', '.join(product.tags)}
-  Allergens: {', '.join(product.allergens) if product.allergens else 'None'}
-  FAQ: {get_faq()}
-"""
-        
-        base_prompt += f"""
+        base_prompt += "\nAVAILABLE PRODUCTS:\n" + _render_products(PRODUCT_CATALOG)
+
+    base_prompt += f"""
+FAQ: {get_faq()}
 
 SIZE GUIDELINES:
 - 5inch cakes: Serve 4-6 people, perfect for small gatherings
@@ -103,16 +73,25 @@ PRICING:
 - Budget-friendly: 1350-1850 NPR (5inch cakes)
 - Mid-range: 1950-3250 NPR (8inch cakes)  
 - Premium: 3250-3790 NPR (specialty cakes)
+"""
+    return base_prompt
 
+
+def _product_query_suffix(user_query: str, products: Optional[List[Product]] = None) -> str:
+    relevant_products = ""
+    if products is not None:
+        relevant_products = "\nRELEVANT PRODUCTS:\n" + _render_products(products)
+    return f"""{relevant_products}
 USER QUERY: {user_query}
 
 
 """
-        return base_prompt
 
-    def _create_company_prompt(self, user_query: str) -> str:
-        """Create prompt for company and business related queries"""
-        base_prompt = f"""
+
+@functools.lru_cache(maxsize=4)
+def _render_company_prompt_prefix(version: str) -> str:
+    """Render the static company prompt. `version` is the knowledge version it was rendered for."""
+    base_prompt = f"""
 You are an expert bakery business manager for {BUSINESS_INFO.name}, a beloved bakery established in {BUSINESS_INFO.established} in {BUSINESS_INFO.location}.
 
 BUSINESS INFORMATION:
@@ -133,36 +112,137 @@ ABOUT US:
 
 FAQ INFORMATION:
 """
-        
-        # Add FAQ information
-        faq_data = get_faq()
-        if "faqs" in faq_data:
-            for faq in faq_data["faqs"]:
-                base_prompt += f"""
+    # Add FAQ information
+    faq_data = get_faq()
+    if "faqs" in faq_data:
+        for faq in faq_data["faqs"]:
+            base_prompt += f"""
 Q: {faq['question']}
 A: {faq['answer']}
 """
-        
-        base_prompt += f"""
+
+    base_prompt += f"""
 
 ORDER REQUIREMENTS:
 """
-        
-        # Add order requirements
-        order_req = order_information_requirements()
-        if "fields" in order_req:
-            for field in order_req["fields"]:
-                base_prompt += f"""
+    # Add order requirements
+    order_req = order_information_requirements()
+    if "fields" in order_req:
+        for field in order_req["fields"]:
+            base_prompt += f"""
 - {field['name']}: {field['description']} (Required: {field['required']})
 """
-        
-        base_prompt += f"""
 
-USER QUERY: {user_query}
+    base_prompt += """
 
 Please provide a helpful, informative response about business operations, ordering process, company information, or any business-related questions. Be conversational, professional, and always include relevant contact information when applicable.
 """
-        return base_prompt
+    return base_prompt
+
+
+def _company_query_suffix(user_query: str) -> str:
+    return f"""
+USER QUERY: {user_query}
+"""
+
+
+class ProductManager:
+    def __init__(self):
+        self.prompt_cache = PromptPrefixCache()
+        self.retriever = get_product_retriever()
+        self.fast_answers = FastAnswerer()
+        self.response_cache = SemanticCache()
+        self._prepare_knowledge_base()
+    
+    def _prepare_knowledge_base(self):
+        """Prepare comprehensive knowledge base for Gemini"""
+        self.knowledge_base = {
+            "business_info": {
+                "name": BUSINESS_INFO.name,
+                "established": BUSINESS_INFO.established,
+                "tagline": BUSINESS_INFO.tagline,
+                "location": BUSINESS_INFO.location,
+                "address": BUSINESS_INFO.address,
+                "phone": BUSINESS_INFO.phone,
+                "whatsapp": BUSINESS_INFO.whatsapp,
+                "email": BUSINESS_INFO.email,
+                "maps_link": BUSINESS_INFO.maps_link,
+                "hours": BUSINESS_INFO.hours,
+                "about": BUSINESS_INFO.about
+            },
+            "products": [product.to_dict() for product in PRODUCT_CATALOG],
+            "faq": get_faq(),
+            "order_requirements": order_information_requirements(),
+            "size_guidelines": {
+                "5inch": "Serves 4-6 people, perfect for small gatherings",
+                "8inch": "Serves 8-12 people, ideal for medium gatherings",
+                "serving_estimates": {
+                    "small_gathering": "4-6 people: 5inch cake",
+                    "medium_gathering": "8-12 people: 8inch cake", 
+                    "large_gathering": "12+ people: Multiple 8inch cakes or custom orders"
+                }
+            },
+            "pricing_info": {
+                "currency": "NPR (Nepalese Rupees)",
+                "price_ranges": {
+                    "budget_friendly": "1350-1850 NPR (5inch)",
+                    "mid_range": "1950-3250 NPR (8inch)",
+                    "premium": "3250-3790 NPR (specialty cakes)"
+                }
+            }
+        }
+
+    def get_product_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get product details by name, alias or a close misspelling"""
+        product = get_product_by_name(name)
+        return product.to_dict() if product else None
+
+    def _product_prompt_parts(self, user_query: str) -> Tuple[str, str]:
+        """
+        Split the product prompt into its static prefix and per-query suffix.
+
+        Small catalogs are part of the prefix; larger ones are narrowed down to
+        the products relevant to the query, which go into the suffix.
+        """
+        if not self.retriever.active:
+            return _render_product_prompt_prefix(knowledge_version()), _product_query_suffix(user_query)
+        products = self.retriever.select(user_query)
+        return (
+            _render_product_prompt_prefix(knowledge_version(), include_catalog=False),
+            _product_query_suffix(user_query, products),
+        )
+
+    def _company_prompt_prefix(self) -> str:
+        """Static part of the company prompt, rendered once per knowledge version"""
+        return _render_company_prompt_prefix(knowledge_version())
+
+    def _create_product_prompt(self, user_query: str) -> str:
+        """Create prompt for product and allergy related queries"""
+        return "".join(self._product_prompt_parts(user_query))
+
+    def _create_company_prompt(self, user_query: str) -> str:
+        """Create prompt for company and business related queries"""
+        return self._company_prompt_prefix() + _company_query_suffix(user_query)
+
+    def _generate(self, prefix: str, suffix: str) -> str:
+        contents, config = self.prompt_cache.resolve(prefix, suffix)
+        try:
+            response = generate_content(contents, config=config)
+        except Exception as e:
+            if config is not None:
+                self.prompt_cache.forget_if_invalid(prefix, e)
+            raise
+        return response.candidates[0].content.parts[0].text
+
+    async def _agenerate(self, prefix: str, suffix: str) -> str:
+        contents, config = await self.prompt_cache.aresolve(prefix, suffix)
+        try:
+            response = await agenerate_content(contents, config=config)
+        except Exception as e:
+            if config is not None:
+                self.prompt_cache.forget_if_invalid(prefix, e)
+            raise
+        return response.candidates[0].content.parts[0].text
 
     def handle_product_inquiry(self, query: str) -> str:
         """
@@ -172,18 +252,19 @@ Please provide a helpful, informative response about business operations, orderi
 
         Respond to the query with the product details:
         """
+        answer = self.fast_answers.answer_product(query)
+        if answer:
+            return answer
+        cached, embedding = self.response_cache.lookup("product", query)
+        if cached:
+            return cached
         try:
-            prompt = self._create_product_prompt(query)
-            
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-            )
-            
-            return response.candidates[0].content.parts[0].text
+            answer = self._generate(*self._product_prompt_parts(query))
+            self.response_cache.store("product", query, answer, embedding)
+            return answer
         except Exception as e:
             logger.error(f"Error handling product inquiry: {e}")
-            return "I apologize, but I'm having trouble processing your product inquiry right now. Please contact us directly at our phone number or WhatsApp for immediate assistance."
+            return PRODUCT_INQUIRY_ERROR
 
     def handle_company_inquiry(self, query: str) -> str:
         """
@@ -197,15 +278,49 @@ Please provide a helpful, informative response about business operations, orderi
         - Payment methods
         - Custom order information
         """
+        answer = self.fast_answers.answer_company(query)
+        if answer:
+            return answer
+        cached, embedding = self.response_cache.lookup("company", query)
+        if cached:
+            return cached
+        try:
+            answer = self._generate(self._company_prompt_prefix(), _company_query_suffix(query))
+            self.response_cache.store("company", query, answer, embedding)
+            return answer
+        except Exception as e:
+            logger.error(f"Error handling company inquiry: {e}")
+            return COMPANY_INQUIRY_ERROR
+
+    async def handle_product_inquiry_async(self, query: str) -> str:
+        """Non-blocking version of handle_product_inquiry"""
+        answer = self.fast_answers.answer_product(query)
+        if answer:
+            return answer
+        cached, embedding = await asyncio.to_thread(self.response_cache.lookup, "product", query)
+        if cached:
+            return cached
+        try:
+            prefix, suffix = await asyncio.to_thread(self._product_prompt_parts, query)
+            answer = await self._agenerate(prefix, suffix)
+            self.response_cache.store("product", query, answer, embedding)
+            return answer
+        except Exception as e:
+            logger.error(f"Error handling product inquiry: {e}")
+            return PRODUCT_INQUIRY_ERROR
+
+    async def handle_company_inquiry_async(self, query: str) -> str:
+        """Non-blocking version of handle_company_inquiry"""
+        answer = self.fast_answers.answer_company(query)
+        if answer:
+            return answer
+        cached, embedding = await asyncio.to_thread(self.response_cache.lookup, "company", query)
+        if cached:
+            return cached
         try:
-            prompt = self._create_company_prompt(query)
-            
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-            )
-            
-            return response.candidates[0].content.parts[0].text
+            answer = await self._agenerate(self._company_prompt_prefix(), _company_query_suffix(query))
+            self.response_cache.store("company", query, answer, embedding)
+            return answer
         except Exception as e:
             logger.error(f"Error handling company inquiry: {e}")
-            return "I apologize, but I'm having trouble processing your business inquiry right now. Please contact us directly at our phone number or WhatsApp for immediate assistance."
\ No newline at end of file
+            return COMPANY_INQUIRY_ERROR
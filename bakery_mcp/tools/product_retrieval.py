@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from tools.knowledge import PRODUCT_CATALOG, Product, knowledge_version
+
+logger = logging.getLogger(__name__)
+
+# Local sentence-transformers model used for product retrieval
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Catalogs smaller than this are pasted into prompts whole
+RETRIEVAL_MIN_CATALOG_SIZE = int(os.environ.get("RETRIEVAL_MIN_CATALOG_SIZE", "50"))
+# Number of products selected per query once retrieval is active
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "8"))
+
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+_embedding_model_failed = False
+
+
+def get_embedding_model():
+    """
+    Get the shared sentence-transformers model, loading it on first use.
+
+    Returns None when sentence-transformers (or the model) is unavailable, in
+    which case callers fall back to their non-embedding behaviour.
+    """
+    global _embedding_model, _embedding_model_failed
+    if _embedding_model is None and not _embedding_model_failed:
+        with _embedding_model_lock:
+            if _embedding_model is None and not _embedding_model_failed:
+                try:
+                    from sentence_transformers import SentenceTransformer
+
+                    _embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+                    logger.info(f"Loaded embedding model {EMBEDDING_MODEL}")
+                except Exception as e:
+                    logger.warning(f"Embedding model unavailable, falling back: {e}")
+                    _embedding_model_failed = True
+    return _embedding_model
+
+
+def embed_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """Embed texts into a contiguous float32 matrix of unit-length rows"""
+    model = get_embedding_model()
+    if model is None:
+        return None
+    embeddings = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def product_document(product: Product) -> str:
+    """Text embedded for a product"""
+    return f"{product.name}. {product.description} Tags: {', '.join(product.tags)}"
+
+
+class ProductRetriever:
+    """
+    Selects the products relevant to a query by cosine similarity.
+
+    Product embeddings are stored as one contiguous, L2-normalised matrix, so
+    scoring every product against a query is a single matrix-vector product.
+    The index is rebuilt when the knowledge version changes.
+    """
+
+    def __init__(self, min_catalog_size: int = RETRIEVAL_MIN_CATALOG_SIZE, top_k: int = RETRIEVAL_TOP_K):
+        self.min_catalog_size = min_catalog_size
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        # (knowledge version, products, embedding matrix), replaced as a whole on rebuild
+        self._index: Optional[Tuple[str, List[Product], np.ndarray]] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether the catalog is large enough to retrieve instead of sending it whole"""
+        return len(PRODUCT_CATALOG) >= self.min_catalog_size
+
+    def _current_index(self) -> Optional[Tuple[str, List[Product], np.ndarray]]:
+        """The index of the current catalog, (re)built if needed; None if embeddings are unavailable"""
+        version = knowledge_version()
+        with self._lock:
+            if self._index is not None and self._index[0] == version:
+                return self._index
+            products = list(PRODUCT_CATALOG)
+            matrix = embed_texts([product_document(p) for p in products])
+            if matrix is None:
+                return None
+            self._index = (version, products, matrix)
+            logger.info(f"Built product retrieval index with {len(products)} products")
+            return self._index
+
+    def build(self) -> bool:
+        """(Re)build the embedding matrix for the current catalog. Returns False if embeddings are unavailable"""
+        return self._current_index() is not None
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Product]:
+        """Top-k products for a query, most similar first"""
+        index = self._current_index()
+        if index is None:
+            return list(PRODUCT_CATALOG)
+        # Products and matrix of the same build, even if a rebuild swaps the index meanwhile
+        _, products, matrix = index
+        k = min(k or self.top_k, len(products))
+        query_vector = embed_texts([query])[0]
+        scores = matrix @ query_vector
+        if k < len(products):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(products))
+        top = top[np.argsort(-scores[top])]
+        return [products[i] for i in top]
+
+    def select(self, query: str) -> List[Product]:
+        """Products to put in a prompt for this query: the whole catalog while it is small"""
+        if not self.active:
+            return list(PRODUCT_CATALOG)
+        return self.search(query)
+
+    def warm_up(self) -> None:
+        """Build the index up front when retrieval will be used"""
+        if self.active:
+            self.build()
+
+
+_retriever: Optional[ProductRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_product_retriever() -> ProductRetriever:
+    """Get the process-wide product retriever"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = ProductRetriever()
+    return _retriever
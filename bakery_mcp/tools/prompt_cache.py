@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from google.genai import errors, types
+
+from tools.llm_client import DEFAULT_MODEL, get_gemini_client
+
+logger = logging.getLogger(__name__)
+
+# Explicit Gemini context caching of static prompt prefixes
+GEMINI_PROMPT_CACHE_ENABLED = os.environ.get("GEMINI_PROMPT_CACHE_ENABLED", "true").lower() == "true"
+GEMINI_PROMPT_CACHE_TTL = int(os.environ.get("GEMINI_PROMPT_CACHE_TTL", "3600"))
+
+# Recreate provider caches this long before they expire
+_REFRESH_MARGIN = 60
+# After a transient error (rate limit, server error, timeout) cache creation is retried
+# after this many seconds, doubling per consecutive failure up to the maximum
+_RETRY_BACKOFF = 30
+_RETRY_BACKOFF_MAX = 900
+# Provider errors meaning the prefix can never be cached (content too small, model unsupported)
+_DEFINITIVE_ERROR_CODES = (400, 404)
+
+
+def _is_definitive(error: Exception) -> bool:
+    return isinstance(error, errors.ClientError) and error.code in _DEFINITIVE_ERROR_CODES
+
+
+def _is_invalid_cache(error: Exception) -> bool:
+    """Whether a generate_content error means the referenced cache is gone (expired, deleted, not found)"""
+    if not isinstance(error, errors.ClientError):
+        return False
+    # Gemini answers "CachedContent not found (or permission denied)" with 403 or 404
+    return error.code in (403, 404) or (error.code == 400 and "cache" in str(error.message or "").lower())
+
+
+class PromptPrefixCache:
+    """
+    Keeps static prompt prefixes in Gemini's context cache.
+
+    A prefix is uploaded once per content hash and later requests only send the
+    per-query suffix, referencing the cached prefix by name. Concurrent misses
+    of the same prefix wait for the one upload in flight. Prefixes the
+    provider refuses to cache (e.g. below the minimum token count) are sent
+    inline, where Gemini's implicit prefix caching still applies because the
+    static text always comes first; after a transient error the prefix is
+    sent inline until the upload is retried with exponential backoff.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, ttl_seconds: int = GEMINI_PROMPT_CACHE_TTL):
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.enabled = GEMINI_PROMPT_CACHE_ENABLED
+        self._lock = threading.Lock()
+        # prefix hash -> (cache name, expires at)
+        self._caches: Dict[str, Tuple[str, float]] = {}
+        self._uncacheable = set()
+        # prefix hash -> (consecutive transient failures, retry at)
+        self._retries: Dict[str, Tuple[int, float]] = {}
+        # prefix hash -> cache name (or None) of the upload in flight
+        self._in_flight: Dict[str, Future] = {}
+        self.stats = {
+            "cached_requests": 0,
+            "inline_requests": 0,
+            "caches_created": 0,
+            "deduplicated": 0,
+            "transient_errors": 0,
+            "invalidated": 0,
+        }
+
+    @staticmethod
+    def _key(prefix: str) -> str:
+        return hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """Name of the live cache of a prefix; caller holds the lock"""
+        entry = self._caches.get(key)
+        if entry and entry[1] - _REFRESH_MARGIN > time.time():
+            return entry[0]
+        return None
+
+    def _claim(self, key: str) -> Tuple[Optional[str], Optional[Future], bool]:
+        """
+        (cache name, future, owner) of a prefix: the live cache name, or the
+        upload to wait for, or a new future when the caller has to upload.
+        All None when the prefix is to be sent inline.
+        """
+        with self._lock:
+            if key in self._uncacheable or self._retries.get(key, (0, 0.0))[1] > time.time():
+                return None, None, False
+            name = self._lookup(key)
+            if name:
+                return name, None, False
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["deduplicated"] += 1
+                return None, future, False
+            future = self._in_flight[key] = Future()
+            return None, future, True
+
+    def _create_config(self, prefix: str, key: str) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            contents=[prefix],
+            ttl=f"{self.ttl_seconds}s",
+            display_name=f"bakery-prefix-{key[:12]}",
+        )
+
+    def _remember(self, key: str, future: Future, name: Optional[str], error: Optional[Exception] = None) -> None:
+        with self._lock:
+            if name:
+                self._caches[key] = (name, time.time() + self.ttl_seconds)
+                self._retries.pop(key, None)
+                self.stats["caches_created"] += 1
+            elif _is_definitive(error):
+                logger.info(f"Sending prompt prefix inline, the provider cannot cache it: {error}")
+                self._uncacheable.add(key)
+            else:
+                failures = self._retries.get(key, (0, 0.0))[0] + 1
+                backoff = min(_RETRY_BACKOFF * 2 ** (failures - 1), _RETRY_BACKOFF_MAX)
+                self._retries[key] = (failures, time.time() + backoff)
+                self.stats["transient_errors"] += 1
+                logger.warning(f"Could not create context cache, sending prompt prefix inline for {backoff}s: {error}")
+            self._in_flight.pop(key, None)
+        future.set_result(name)
+
+    def _request(self, prefix: str, suffix: str, name: Optional[str]):
+        with self._lock:
+            if name:
+                self.stats["cached_requests"] += 1
+                return suffix, types.GenerateContentConfig(cached_content=name)
+            self.stats["inline_requests"] += 1
+            return prefix + suffix, None
+
+    def resolve(self, prefix: str, suffix: str) -> Tuple[Any, Optional[types.GenerateContentConfig]]:
+        """Return (contents, config) for generate_content, using the cached prefix when possible"""
+        if not self.enabled:
+            return self._request(prefix, suffix, None)
+
+        key = self._key(prefix)
+        name, future, owner = self._claim(key)
+        if owner:
+            error = None
+            try:
+                cache = get_gemini_client().caches.create(
+                    model=self.model, config=self._create_config(prefix, key)
+                )
+                name = cache.name
+            except Exception as e:
+                error = e
+            finally:
+                # Also on cancellation, so requests waiting for this upload are released
+                self._remember(key, future, name, error)
+        elif future is not None:
+            name = future.result()
+        return self._request(prefix, suffix, name)
+
+    async def aresolve(self, prefix: str, suffix: str) -> Tuple[Any, Optional[types.GenerateContentConfig]]:
+        """Non-blocking version of resolve"""
+        if not self.enabled:
+            return self._request(prefix, suffix, None)
+
+        key = self._key(prefix)
+        name, future, owner = self._claim(key)
+        if owner:
+            error = None
+            try:
+                cache = await get_gemini_client().aio.caches.create(
+                    model=self.model, config=self._create_config(prefix, key)
+                )
+                name = cache.name
+            except Exception as e:
+                error = e
+            finally:
+                # Also on cancellation, so requests waiting for this upload are released
+                self._remember(key, future, name, error)
+        elif future is not None:
+            name = await asyncio.wrap_future(future)
+        return self._request(prefix, suffix, name)
+
+    def forget(self, prefix: str) -> None:
+        """Drop the cache entry of a prefix, e.g. after the provider rejected it"""
+        with self._lock:
+            self._caches.pop(self._key(prefix), None)
+
+    def forget_if_invalid(self, prefix: str, error: Exception) -> bool:
+        """
+        Drop the cache entry of a prefix if a request using it failed because the
+        cache is gone. Rate limits, server errors and timeouts keep the entry.
+        """
+        if not _is_invalid_cache(error):
+            return False
+        with self._lock:
+            if self._caches.pop(self._key(prefix), None) is not None:
+                self.stats["invalidated"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "active_caches": len(self._caches),
+                "uncacheable_prefixes": len(self._uncacheable),
+                "backing_off_prefixes": sum(1 for _, retry_at in self._retries.values() if retry_at > time.time()),
+                "enabled": self.enabled,
+            }
@@ -0,0 +1,192 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from tools.knowledge import knowledge_version
+from tools.product_retrieval import embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity between normalised queries to reuse a cached answer
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = int(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.findall(r"[a-z0-9]+", query.lower()))
+
+
+def _group(kind: str, normalized: str) -> Tuple[str, Tuple[str, ...]]:
+    # Only queries mentioning the same numbers may share an answer:
+    # "5 inch tiramisu price" and "8 inch tiramisu price" embed almost identically
+    return kind, tuple(re.findall(r"[0-9]+", normalized))
+
+
+@dataclass
+class CacheEntry:
+    group: Tuple[str, Tuple[str, ...]]
+    query: str
+    embedding: Optional[np.ndarray]
+    response: str
+    created_at: float
+
+
+class SemanticCache:
+    """
+    Caches inquiry responses by query meaning.
+
+    Queries are normalised and embedded; a new query reuses a cached response
+    of the same kind when the cosine similarity is at least `threshold` and
+    both mention the same numbers (sizes, quantities).
+    Entries expire after `ttl_seconds`, the least recently used entry is
+    evicted beyond `max_entries`, and everything is dropped when the
+    knowledge version (catalog, FAQ, business info) changes. Without an
+    embedding model only identical normalised queries hit.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: int = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._version = None
+        # (kind, numbers) -> (keys, embedding matrix), rebuilt after inserts and evictions
+        self._matrices: Dict[Tuple[str, Tuple[str, ...]], Tuple[list, Optional[np.ndarray]]] = {}
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "lookup_seconds": 0.0,
+            "hit_similarity_sum": 0.0,
+        }
+
+    def _check_version(self) -> None:
+        version = knowledge_version()
+        if version != self._version:
+            if self._entries:
+                logger.info("Knowledge base changed, clearing semantic cache")
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._matrices.clear()
+            self._version = version
+
+    def _matrix(self, group) -> Tuple[list, Optional[np.ndarray]]:
+        if group not in self._matrices:
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry.group == group and entry.embedding is not None
+            ]
+            matrix = (
+                np.ascontiguousarray(np.stack([self._entries[key].embedding for key in keys]))
+                if keys else None
+            )
+            self._matrices[group] = (keys, matrix)
+        return self._matrices[group]
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._matrices.pop(entry.group, None)
+
+    def _hit(self, key, similarity: float, exact: bool) -> Optional[str]:
+        entry = self._entries[key]
+        if time.time() - entry.created_at > self.ttl_seconds:
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["exact_hits" if exact else "semantic_hits"] += 1
+        self.stats["hit_similarity_sum"] += similarity
+        return entry.response
+
+    def lookup(self, kind: str, query: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Find a cached response for the query.
+
+        Returns (response or None, query embedding); pass the embedding back to
+        `store` so a miss does not embed the query twice.
+        """
+        start = time.perf_counter()
+        normalized = normalize_query(query)
+        embedding = None
+        response = None
+        with self._lock:
+            self._check_version()
+            if (kind, normalized) in self._entries:
+                response = self._hit((kind, normalized), 1.0, exact=True)
+
+        if response is None:
+            embeddings = embed_texts([normalized])
+            embedding = embeddings[0] if embeddings is not None else None
+
+        with self._lock:
+            if response is None and embedding is not None:
+                keys, matrix = self._matrix(_group(kind, normalized))
+                if matrix is not None:
+                    scores = matrix @ embedding
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold and keys[best] in self._entries:
+                        response = self._hit(keys[best], float(scores[best]), exact=False)
+            if response is None:
+                self.stats["misses"] += 1
+            self.stats["lookup_seconds"] += time.perf_counter() - start
+        return response, embedding
+
+    def store(self, kind: str, query: str, response: str, embedding: Optional[np.ndarray] = None) -> None:
+        """Cache a response for the query"""
+        normalized = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            key = (kind, normalized)
+            self._remove(key)
+            group = _group(kind, normalized)
+            self._entries[key] = CacheEntry(group, normalized, embedding, response, time.time())
+            self._matrices.pop(group, None)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        lookups = hits + stats["misses"]
+        return {
+            "entries": entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "exact_hits": stats["exact_hits"],
+            "semantic_hits": stats["semantic_hits"],
+            "misses": stats["misses"],
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "avg_lookup_ms": round(stats["lookup_seconds"] / lookups * 1000, 3) if lookups else 0.0,
+            "avg_hit_similarity": round(stats["hit_similarity_sum"] / hits, 4) if hits else None,
+            "evictions": stats["evictions"],
+            "expirations": stats["expirations"],
+            "invalidations": stats["invalidations"],
+        }
@@ -0,0 +1,22 @@
+import os
+import sys
+from typing import Any
+
+# One tracing module for all services, in common/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from common.tracing import TracingMiddleware, payload_size, setup_tracing, span  # noqa: E402,F401
+
+
+def record_llm_response(current, contents: Any, response: Any) -> None:
+    """Token counts and payload sizes of a generate_content call"""
+    current.set_attribute("llm.request.bytes", payload_size(contents))
+    text = getattr(response, "text", None) or ""
+    current.set_attribute("llm.response.bytes", payload_size(text))
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        current.set_attributes({
+            "gen_ai.usage.input_tokens": usage.prompt_token_count or 0,
+            "gen_ai.usage.output_tokens": usage.candidates_token_count or 0,
+            "gen_ai.usage.cached_tokens": usage.cached_content_token_count or 0,
+        })
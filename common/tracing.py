@@ -0,0 +1,125 @@
+"""
+OpenTelemetry tracing shared by the bakery MCP, the Instagram MCP and the agents.
+
+The MCP servers export their own spans (setup_tracing); the agents' spans are
+exported by fast-agent, from the otel section of fastagent.config.yaml.
+"""
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from fastmcp import Client as MCPClient
+from fastmcp.client.transports import SSETransport, StreamableHttpTransport
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
+
+logger = logging.getLogger(__name__)
+
+# Where finished spans go: "none", "console" (stderr) or "file" (TRACE_FILE, one JSON span per line)
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+except ImportError:  # opentelemetry comes with fast-agent; without it nothing is traced
+    trace = None
+
+
+class _NoSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+
+def setup_tracing(service_name: str) -> bool:
+    """Export spans of this process as configured by TRACE_EXPORTER; returns whether spans are exported"""
+    if trace is None or TRACE_EXPORTER not in ("console", "file"):
+        return False
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    out = open(TRACE_FILE, "a", buffering=1) if TRACE_EXPORTER == "file" else sys.stderr
+    exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Exporting {service_name} spans to {TRACE_FILE if TRACE_EXPORTER == 'file' else 'the console'}")
+    return True
+
+
+def payload_size(value: Any) -> int:
+    """Size in bytes of a value as it would be serialized"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return len(value.encode())
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """A span of the current trace (kind "internal", "server" or "client"); exceptions are recorded on it"""
+    if trace is None:
+        yield _NoSpan()
+        return
+    span_kind = {"server": trace.SpanKind.SERVER, "client": trace.SpanKind.CLIENT}.get(kind, trace.SpanKind.INTERNAL)
+    with trace.get_tracer(__name__).start_as_current_span(name, kind=span_kind, attributes=attributes) as current:
+        yield current
+
+
+class TracingMiddleware(Middleware):
+    """
+    One span per MCP tool call, with request and response sizes.
+
+    The caller's trace continues from the W3C `traceparent` header of the
+    HTTP request, so spans of the tool join the trace of whoever called it.
+    """
+
+    async def on_call_tool(self, context, call_next):
+        if trace is None:
+            return await call_next(context)
+        token = otel_context.attach(propagate.extract(get_http_headers(include_all=True)))
+        try:
+            name = context.message.name
+            with span(
+                f"tool {name}",
+                kind="server",
+                **{"mcp.tool.name": name, "mcp.request.bytes": payload_size(context.message.arguments or {})},
+            ) as current:
+                result = await call_next(context)
+                current.set_attribute(
+                    "mcp.response.bytes", sum(payload_size(getattr(item, "text", "") or "") for item in result)
+                )
+                return result
+        finally:
+            otel_context.detach(token)
+
+
+async def call_mcp_tool(url: str, tool: str, arguments: Dict[str, Any]) -> str:
+    """
+    Call a tool of an MCP server and return its text.
+
+    The current trace context is sent along in a `traceparent` header, over
+    SSE for URLs ending in /sse and streamable HTTP otherwise.
+    """
+    with span(
+        f"call {tool}",
+        kind="client",
+        **{"mcp.tool.name": tool, "mcp.server.url": url, "mcp.request.bytes": payload_size(arguments)},
+    ) as current:
+        headers: Dict[str, str] = {}
+        if trace is not None:
+            propagate.inject(headers)
+        transport_cls = SSETransport if url.rstrip("/").endswith("/sse") else StreamableHttpTransport
+        async with MCPClient(transport_cls(url, headers=headers)) as client:
+            result = await client.call_tool(tool, arguments)
+        text = "\n".join(getattr(content, "text", "") for content in result)
+        current.set_attribute("mcp.response.bytes", payload_size(text))
+        return text
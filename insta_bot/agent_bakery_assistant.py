@@ -1,11 +1,24 @@
 import asyncio
+import sys
 
 from mcp_agent.core.fastagent import FastAgent
 
+from intent_routing import CLASSIFY_AND_ROUTE_INSTRUCTION, RoutedAssistant, serve
+
 # Create the application
 fast = FastAgent("Bakery Assistant")
 
+DEFAULT_MESSAGE = "Hi, do you have eggless cakes?"
+
 
+# The agents are shared by all customer conversations, which are answered concurrently,
+# so none keeps history: each message carries its own conversation context
+@fast.agent(
+    name="classify_and_route",
+    instruction=CLASSIFY_AND_ROUTE_INSTRUCTION,
+    model="azure.gpt-4.1-nano",
+    use_history=False,
+)
 @fast.agent(
     name="task_delegation_manager",
     instruction=(
@@ -26,6 +39,7 @@ fast = FastAgent("Bakery Assistant")
         """
     ),
     model="azure.gpt-4.1-nano",
+    use_history=False,
 )
 @fast.agent(
     name="research_manager",
@@ -43,6 +57,7 @@ fast = FastAgent("Bakery Assistant")
     ),
     model="azure.gpt-4.1-nano",
     servers=["bakery_mcp"],
+    use_history=False,
 )
 @fast.agent(
     name="order_manager",
@@ -62,6 +77,7 @@ fast = FastAgent("Bakery Assistant")
     ),
     model="azure.gpt-4.1-nano",
     servers=["bakery_mcp"],
+    use_history=False,
 )
 @fast.agent(
     name="customer_communication_manager",
@@ -76,6 +92,7 @@ fast = FastAgent("Bakery Assistant")
         """
     ),
     model="azure.gpt-4.1-nano",
+    use_history=False,
 )
 @fast.agent(
     name="escalation_handler",
@@ -91,6 +108,7 @@ fast = FastAgent("Bakery Assistant")
     ),
     model="azure.gpt-4.1-nano",
     human_input=True,
+    use_history=False,
 )
 @fast.router(
     name="task_router_manager",
@@ -109,8 +127,10 @@ fast = FastAgent("Bakery Assistant")
     model="azure.gpt-4.1-nano",
     use_history=False,
 )
+# The previous two-step classification (free-text intent, then a router LLM call),
+# kept for comparison in bench_routing.py
 @fast.chain(
-    name="agent_bakery_assistant",
+    name="bakery_assistant_chain",
     instruction=(
         """
         You are an upbeat and friendly customer service manager at Pumpernickel Bakery.
@@ -122,7 +142,6 @@ fast = FastAgent("Bakery Assistant")
         "task_router_manager",
         "customer_communication_manager",
     ],
-    default=True,
 )
 # @fast.agent(
 #     name="agent_bakery_assistant",
@@ -171,7 +190,15 @@ fast = FastAgent("Bakery Assistant")
 # )
 async def main():
     async with fast.run() as agent:
-        await agent.interactive("agent_bakery_assistant")
+        assistant = RoutedAssistant(agent)
+        if "--serve-assistant" in sys.argv:
+            await serve(assistant, fast.args.transport, fast.args.host, fast.args.port)
+            return
+        while True:
+            message = input("\nCustomer message (q: quit): ").strip()
+            if message.lower() in ("q", "quit", "exit"):
+                break
+            print(await assistant.answer(message or DEFAULT_MESSAGE))
 
 
 if __name__ == "__main__":
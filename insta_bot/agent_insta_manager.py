@@ -2,9 +2,13 @@ import asyncio
 
 from mcp_agent.core.fastagent import FastAgent
 
+from reply_sender import REPLY_FORMAT_INSTRUCTION, parse_reply, send_reply
+
 # Create the application
 fast = FastAgent("Instagram Sales Assistant")
 
+DEFAULT_INSTRUCTION = "Handle the next unread chat."
+
 
 @fast.agent(
     name="insta_dm_manager",
@@ -14,31 +18,31 @@ fast = FastAgent("Instagram Sales Assistant")
         You handle and relay all direct messages from Instagram users to the Agent Bakery Assistant for coming up with response.
         You only act on Instagram DMs and forward messages/responses.
         Get chats that are unread.
-        read messages of one of the chat. get the full message history (chronological order)
-        Package and forward this full message list to the Bakery Manager Assistant Agent
+        For one of the chats, get the conversation context using the get_conversation_context tool with the thread id and username.
+        Forward the context text exactly as returned to the Bakery Manager Assistant Agent. Do not fetch or forward the full message history
         Wait for the Bakery Manager Assistant Agent to return a reply.
-        After the Bakery Manager Assistant returns the reply, send the reply message and the username to the message sender agent.
+        Do not send the reply yourself, it is sent for you.
         """
+        + REPLY_FORMAT_INSTRUCTION
     ),
     model="azure.gpt-4.1-nano",
     servers=["agent_bakery_assistant", "insta_mcp"],
 )
-@fast.agent(
-    name="message_sender",
-    instruction="""
-            Your only task is to send a message to the given username.
-            From the information you receive, extract the username (recipient) and
-            the message (text to send).
-            Send the exact message to the specified username without modifying it.
-            Use the send_message tool from insta_mcp to send the message to the user.
-            """,
-    model="azure.gpt-4.1-nano",
-    servers=["insta_mcp"],
-)
-@fast.chain(name="insta_message_chain", sequence=["insta_dm_manager", "message_sender"])
 async def main():
     async with fast.run() as agent:
-        await agent.interactive("insta_message_chain")
+        while True:
+            instruction = input(f"\nInstruction (enter: '{DEFAULT_INSTRUCTION}', q: quit): ").strip()
+            if instruction.lower() in ("q", "quit", "exit"):
+                break
+            response = await agent.insta_dm_manager.send(instruction or DEFAULT_INSTRUCTION)
+            # The reply is sent as given, without another LLM call to extract it
+            reply = parse_reply(response)
+            if reply is None:
+                print("No reply to send.")
+                continue
+            result = await send_reply(reply)
+            status = "Sent to" if result.get("success") else "Not sent to"
+            print(f"{status} {reply.thread_id or reply.username}: {result.get('message')}")
 
 
 if __name__ == "__main__":
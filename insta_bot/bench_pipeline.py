@@ -0,0 +1,474 @@
+"""
+Replays recorded bakery conversations through the DM-to-reply pipeline and
+reports how long customers wait for a reply.
+
+Instagram (insta_mcp / instagrapi), the agent LLMs and Gemini are replaced by
+local stand-ins that answer with the responses recorded in the corpus (or a
+placeholder) after an injected latency per stage kind. Everything in between
+is the real code: the quick-reply intent classifier, ProductManager and
+CustomerOrderParser of bakery_mcp, RoutedAssistant, parse_reply and, for the
+listener entry, the DM listener's scheduler and dispatcher.
+
+Entry points:
+  manager   The insta_dm_manager agent lists chats, gets the conversation
+            context, asks the bakery assistant and answers with the reply
+            JSON, which reply_sender sends. Messages are handled one at a time.
+  listener  The DM listener: conversations start --arrival-interval seconds
+            apart, each customer answers --think-time seconds after a reply,
+            and the scheduler answers up to --concurrency threads at once.
+
+Latency kinds (seconds, --latency kind=value): llm (one agent LLM turn),
+gemini (one generate_content call), insta (one Instagram API call),
+mcp (one MCP hop between processes). --latency-scale multiplies them all,
+--jitter varies each delay by up to that fraction.
+
+Usage:
+    cd insta_bot
+    uv run bench_pipeline.py
+    uv run bench_pipeline.py --entry listener --concurrency 4 --latency llm=0.8 gemini=1.5 --jitter 0.3
+    uv run bench_pipeline.py --latency-scale 0.05 --json results.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.extend([os.path.join(ROOT, "insta_mcp"), os.path.join(ROOT, "bakery_mcp")])
+# Gemini is replaced by a stand-in, so nothing may go to its context cache
+os.environ["GEMINI_PROMPT_CACHE_ENABLED"] = "false"
+os.environ.setdefault("GEMINI_API_KEY", "replay")
+
+from dm_listener import AssistantDispatcher, NewMessagesEvent  # noqa: E402
+from intent_routing import CLASSIFY_AND_ROUTE_INSTRUCTION, INTENT_AGENTS, RoutedAssistant  # noqa: E402
+from reply_sender import parse_reply  # noqa: E402
+from scheduler import ThreadScheduler  # noqa: E402
+from tools import llm_client  # noqa: E402
+from tools.customer_order_parser import CustomerOrderParser  # noqa: E402
+from tools.intent_classifier import IntentClassifier  # noqa: E402
+from tools.product_manager import ProductManager  # noqa: E402
+
+DEFAULT_LATENCIES = {"llm": 0.9, "gemini": 1.4, "insta": 0.35, "mcp": 0.02}
+# Tokens of an agent's instruction and tool definitions, sent with every LLM turn
+AGENT_SYSTEM_TOKENS = 350
+PLACEHOLDER_REPLY = "Thanks for reaching out to Pumpernickel Bakery! Here is what we found for you. 😊"
+PLACEHOLDER_FINDINGS = "Relevant bakery information for the customer's message, from the bakery tools."
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(int(round(p / 100 * len(ordered))) - 1, 0))]
+
+
+class LatencyModel:
+    def __init__(self, latencies: Dict[str, float], scale: float = 1.0, jitter: float = 0.0, seed: int = 7):
+        self.latencies = latencies
+        self.scale = scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, kind: str) -> float:
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(self.latencies[kind] * self.scale * factor, 0.0)
+
+    async def sleep(self, kind: str) -> None:
+        await asyncio.sleep(self.delay(kind))
+
+    def sleep_sync(self, kind: str) -> None:
+        time.sleep(self.delay(kind))
+
+
+@dataclass
+class ReplyRecord:
+    """One answered turn: the customer messages it replies to and what answering cost"""
+
+    thread_id: str
+    turns: List[Dict[str, Any]]
+    received_at: List[float]
+    started_at: float = field(default_factory=time.time)
+    sent_at: Optional[float] = None
+    quick_reply: bool = False
+    stages: Dict[str, float] = field(default_factory=dict)
+    agent_llm_calls: int = 0
+    gemini_calls: int = 0
+    tokens: int = 0
+    # (stage, seconds spent in nested stages) of the stages currently open
+    _open: List[list] = field(default_factory=list)
+
+
+class Recorder:
+    """Collects per-reply stage times, LLM calls and tokens"""
+
+    def __init__(self):
+        self.current: contextvars.ContextVar[Optional[ReplyRecord]] = contextvars.ContextVar("reply", default=None)
+        self.records: List[ReplyRecord] = []
+        self._lock = threading.Lock()
+
+    def begin(self, thread_id: str, turns: List[Dict[str, Any]], received_at: List[float]) -> ReplyRecord:
+        record = ReplyRecord(thread_id, turns, received_at)
+        self.current.set(record)
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def turn(self) -> Dict[str, Any]:
+        """Recorded data of the customer message being answered (the last one when merged)"""
+        record = self.current.get()
+        return record.turns[-1] if record else {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a stage, excluding the time spent in stages nested in it"""
+        record = self.current.get()
+        if record is None:
+            yield
+            return
+        frame = [name, 0.0]
+        record._open.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            record._open.pop()
+            record.stages[name] = record.stages.get(name, 0.0) + elapsed - frame[1]
+            if record._open:
+                record._open[-1][1] += elapsed
+
+    def llm_call(self, prompt: str, response: str, gemini: bool = False) -> None:
+        record = self.current.get()
+        if record is None:
+            return
+        if gemini:
+            record.gemini_calls += 1
+            record.tokens += estimate_tokens(prompt) + estimate_tokens(response)
+        else:
+            record.agent_llm_calls += 1
+            record.tokens += AGENT_SYSTEM_TOKENS + estimate_tokens(prompt) + estimate_tokens(response)
+
+    def sent(self) -> None:
+        record = self.current.get()
+        if record is not None:
+            record.sent_at = time.time()
+
+
+def _gemini_response(text: str):
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))])
+
+
+class ReplayGemini:
+    """Stand-in for genai.Client: answers with the recorded Gemini response"""
+
+    def __init__(self, recorder: Recorder, latency: LatencyModel):
+        self.recorder = recorder
+        self.latency = latency
+        self.models = SimpleNamespace(generate_content=self._generate)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._agenerate))
+
+    def _answer(self, contents) -> Any:
+        text = self.recorder.turn().get("gemini") or PLACEHOLDER_FINDINGS
+        self.recorder.llm_call(str(contents), text, gemini=True)
+        return _gemini_response(text)
+
+    def _generate(self, model: str, contents, config=None):
+        with self.recorder.stage("gemini"):
+            self.latency.sleep_sync("gemini")
+            return self._answer(contents)
+
+    async def _agenerate(self, model: str, contents, config=None):
+        with self.recorder.stage("gemini"):
+            await self.latency.sleep("gemini")
+            return self._answer(contents)
+
+
+class ReplayAgent:
+    """Stand-in for a fast-agent agent: one LLM turn per call, answered from the recording"""
+
+    def __init__(self, name: str, recorder: Recorder, latency: LatencyModel):
+        self.name = name
+        self.recorder = recorder
+        self.latency = latency
+
+    def respond(self, turn: Dict[str, Any], prompt: str) -> str:
+        return turn.get("reply") or PLACEHOLDER_REPLY
+
+    async def llm_turn(self, prompt: str, response: Optional[str] = None) -> str:
+        with self.recorder.stage(f"llm:{self.name}"):
+            await self.latency.sleep("llm")
+            if response is None:
+                response = self.respond(self.recorder.turn(), prompt)
+        self.recorder.llm_call(prompt, response)
+        return response
+
+    async def send(self, message: str) -> str:
+        return await self.llm_turn(message)
+
+    async def structured(self, messages, model):
+        text = await self.llm_turn(messages[-1].all_text())
+        return model.model_validate_json(text), None
+
+
+class ReplayClassifier(ReplayAgent):
+    def respond(self, turn: Dict[str, Any], prompt: str) -> str:
+        intent = turn.get("intent") if turn.get("intent") in INTENT_AGENTS else "inquiry"
+        return json.dumps({"intent": intent, "confidence": 0.9, "key_details": turn.get("key_details", "")})
+
+    async def llm_turn(self, prompt: str, response: Optional[str] = None) -> str:
+        return await super().llm_turn(CLASSIFY_AND_ROUTE_INSTRUCTION + prompt, response)
+
+
+class ReplayToolAgent(ReplayAgent):
+    """A handler agent: one LLM turn to pick a bakery_mcp tool, the tool call, one turn to report"""
+
+    def __init__(self, name: str, recorder: Recorder, latency: LatencyModel, tool):
+        super().__init__(name, recorder, latency)
+        self.tool = tool
+
+    def respond(self, turn: Dict[str, Any], prompt: str) -> str:
+        return turn.get("findings") or PLACEHOLDER_FINDINGS
+
+    async def send(self, message: str) -> str:
+        await self.llm_turn(message, response=f"call tool: {self.turn_text()}")
+        with self.recorder.stage("bakery_mcp"):
+            await self.latency.sleep("mcp")
+            result = str(await self.tool(self.turn_text()))
+        return await self.llm_turn(result)
+
+    def turn_text(self) -> str:
+        return self.recorder.turn().get("customer", "")
+
+
+def build_assistant(recorder: Recorder, latency: LatencyModel, product_manager: ProductManager) -> RoutedAssistant:
+    order_parser = CustomerOrderParser()
+    agents = {
+        "classify_and_route": ReplayClassifier("classify_and_route", recorder, latency),
+        "research_manager": ReplayToolAgent(
+            "research_manager", recorder, latency, product_manager.handle_product_inquiry_async
+        ),
+        "order_manager": ReplayToolAgent("order_manager", recorder, latency, order_parser.parse_order_async),
+        "escalation_handler": ReplayAgent("escalation_handler", recorder, latency),
+        "customer_communication_manager": ReplayAgent("customer_communication_manager", recorder, latency),
+    }
+    return RoutedAssistant(agents)
+
+
+def _conversation_context(conversation: Dict[str, Any], turn: Dict[str, Any]) -> str:
+    return f"Instagram conversation with @{conversation['username']}.\n\nNew messages from the customer:\n{turn['customer']}"
+
+
+async def run_manager(corpus, rounds: int, recorder: Recorder, latency: LatencyModel, assistant: RoutedAssistant):
+    """insta_dm_manager entry: one customer message at a time, as in agent_insta_manager.main"""
+    manager = ReplayAgent("insta_dm_manager", recorder, latency)
+    # Conversations take turns, as unread chats would come in
+    queue = []
+    for _ in range(rounds):
+        for i in range(max(len(c["turns"]) for c in corpus)):
+            queue.extend((c, c["turns"][i]) for c in corpus if i < len(c["turns"]))
+    for conversation, turn in queue:
+        now = time.time()
+        recorder.begin(conversation["thread_id"], [turn], [now])
+        # fast-agent's tool loop: one LLM turn per tool call, then the final answer
+        await manager.llm_turn("Handle the next unread chat.", response="call tool: list_chats")
+        with recorder.stage("insta_mcp"):
+            await latency.sleep("mcp")
+            await latency.sleep("insta")
+        await manager.llm_turn(json.dumps([conversation["thread_id"]]), response="call tool: get_conversation_context")
+        with recorder.stage("insta_mcp"):
+            await latency.sleep("mcp")
+            await latency.sleep("insta")
+        context = _conversation_context(conversation, turn)
+        await manager.llm_turn(context, response="call tool: agent_bakery_assistant_send")
+        with recorder.stage("mcp"):
+            await latency.sleep("mcp")
+        answer = await assistant.answer(context)
+        reply_json = json.dumps({"thread_id": conversation["thread_id"], "username": conversation["username"], "text": answer})
+        reply = parse_reply(await manager.llm_turn(answer, response=f"Reply ready.\n{reply_json}"))
+        with recorder.stage("insta_mcp"):
+            await latency.sleep("mcp")
+            await latency.sleep("insta")
+        if reply:
+            recorder.sent()
+
+
+class ReplayInstagramClient:
+    """Stand-in for the instagrapi client the dispatcher sends replies with"""
+
+    def __init__(self, recorder: Recorder, latency: LatencyModel):
+        self.recorder = recorder
+        self.latency = latency
+
+    def direct_answer(self, thread_id: int, text: str):
+        with self.recorder.stage("insta_mcp"):
+            self.latency.sleep_sync("insta")
+        self.recorder.sent()
+
+
+def run_listener(corpus, rounds: int, recorder: Recorder, latency: LatencyModel, assistant: RoutedAssistant,
+                 classifier: IntentClassifier, concurrency: int, arrival_interval: float, think_time: float):
+    """DM listener entry: customers reply after each answer, threads are answered in parallel"""
+
+    def quick_reply(text: str) -> Optional[str]:
+        with recorder.stage("quick_reply"):
+            latency.sleep_sync("mcp")
+            reply = classifier.quick_reply(text).reply
+        if reply:
+            recorder.current.get().quick_reply = True
+        return reply
+
+    dispatcher = AssistantDispatcher(
+        ReplayInstagramClient(recorder, latency),
+        reply_fn=lambda prompt: asyncio.run(assistant.answer(prompt)),
+        quick_reply_fn=quick_reply,
+    )
+    conversations = {c["thread_id"]: c for c in corpus}
+    remaining = {thread_id: [t for _ in range(rounds) for t in c["turns"]] for thread_id, c in conversations.items()}
+    total = sum(len(turns) for turns in remaining.values())
+    answered = []
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def send_next(thread_id: str) -> None:
+        with lock:
+            if not remaining[thread_id]:
+                return
+            turn = remaining[thread_id].pop(0)
+        now = time.time()
+        message = {"id": f"{thread_id}-{now}", "timestamp": now, "text": turn["customer"], "turn": turn}
+        scheduler.put(NewMessagesEvent(thread_id, conversations[thread_id]["username"], None, [message], now))
+
+    def handle(event: NewMessagesEvent) -> None:
+        recorder.begin(event.thread_id, [m["turn"] for m in event.messages], [m["timestamp"] for m in event.messages])
+        try:
+            dispatcher.handle(event)
+        finally:
+            with lock:
+                answered.extend(event.messages)
+                if len(answered) >= total:
+                    done.set()
+            threading.Timer(latency.scale * think_time, send_next, args=(event.thread_id,)).start()
+
+    scheduler = ThreadScheduler(handle, max_concurrency=concurrency)
+    scheduler.start()
+    for i, thread_id in enumerate(conversations):
+        threading.Timer(latency.scale * arrival_interval * i, send_next, args=(thread_id,)).start()
+    done.wait()
+    scheduler.stop()
+    return {"dispatcher": dispatcher.get_stats(), "scheduler": scheduler.get_stats()}
+
+
+def summarize(recorder: Recorder) -> Dict[str, Any]:
+    records = [r for r in recorder.records if r.sent_at is not None]
+    messages = sum(len(r.received_at) for r in records)
+    end_to_end = [r.sent_at - received for r in records for received in r.received_at]
+    stages: Dict[str, float] = {}
+    for record in records:
+        stages["queue"] = stages.get("queue", 0.0) + record.started_at - min(record.received_at)
+        for name, seconds in record.stages.items():
+            stages[name] = stages.get(name, 0.0) + seconds
+    return {
+        "messages": messages,
+        "replies": len(records),
+        "quick_replies": sum(r.quick_reply for r in records),
+        "end_to_end_seconds": {
+            "p50": round(percentile(end_to_end, 50), 3),
+            "p95": round(percentile(end_to_end, 95), 3),
+            "p99": round(percentile(end_to_end, 99), 3),
+            "max": round(max(end_to_end), 3),
+            "mean": round(statistics.mean(end_to_end), 3),
+        },
+        "stage_seconds_per_reply": {
+            name: round(seconds / len(records), 3) for name, seconds in sorted(stages.items(), key=lambda s: -s[1])
+        },
+        "agent_llm_calls_per_message": round(sum(r.agent_llm_calls for r in records) / messages, 2),
+        "gemini_calls_per_message": round(sum(r.gemini_calls for r in records) / messages, 2),
+        "tokens_per_message": round(sum(r.tokens for r in records) / messages, 1),
+    }
+
+
+def _print_summary(entry: str, summary: Dict[str, Any]) -> None:
+    e2e = summary["end_to_end_seconds"]
+    print(f"entry: {entry}, messages: {summary['messages']}, replies: {summary['replies']}, "
+          f"quick replies: {summary['quick_replies']}")
+    print(f"\nend-to-end latency (s)  p50 {e2e['p50']:.2f}  p95 {e2e['p95']:.2f}  p99 {e2e['p99']:.2f}  "
+          f"max {e2e['max']:.2f}  mean {e2e['mean']:.2f}")
+    total = sum(summary["stage_seconds_per_reply"].values()) or 1
+    print(f"\n{'stage':<40}{'s / reply':>12}{'share':>10}")
+    for name, seconds in summary["stage_seconds_per_reply"].items():
+        print(f"{name:<40}{seconds:>12.3f}{seconds / total:>10.1%}")
+    print(f"\nagent LLM calls / message: {summary['agent_llm_calls_per_message']}")
+    print(f"Gemini calls / message:    {summary['gemini_calls_per_message']}")
+    print(f"tokens / message:          {summary['tokens_per_message']} (estimated)")
+
+
+def _parse_latencies(values: List[str]) -> Dict[str, float]:
+    latencies = dict(DEFAULT_LATENCIES)
+    for value in values:
+        kind, _, seconds = value.partition("=")
+        if kind not in latencies:
+            raise SystemExit(f"Unknown latency kind {kind!r}, expected one of {', '.join(latencies)}")
+        latencies[kind] = float(seconds)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "recorded_conversations.json"))
+    parser.add_argument("--entry", choices=["manager", "listener"], default="manager")
+    parser.add_argument("--rounds", type=int, default=1, help="Times each conversation is replayed")
+    parser.add_argument("--latency", nargs="*", default=[], metavar="KIND=SECONDS")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=4, help="Scheduler workers (listener entry)")
+    parser.add_argument("--arrival-interval", type=float, default=1.0, help="Seconds between conversation starts")
+    parser.add_argument("--think-time", type=float, default=3.0, help="Seconds a customer takes to answer a reply")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    recorder = Recorder()
+    latency = LatencyModel(_parse_latencies(args.latency), args.latency_scale, args.jitter, args.seed)
+    # Installed before anything asks for the shared client
+    llm_client._client = ReplayGemini(recorder, latency)
+    product_manager = ProductManager()
+    assistant = build_assistant(recorder, latency, product_manager)
+
+    extra: Dict[str, Any] = {}
+    if args.entry == "manager":
+        asyncio.run(run_manager(corpus, args.rounds, recorder, latency, assistant))
+    else:
+        classifier = IntentClassifier(product_manager.fast_answers)
+        extra = run_listener(
+            corpus, args.rounds, recorder, latency, assistant, classifier,
+            args.concurrency, args.arrival_interval, args.think_time,
+        )
+
+    summary = summarize(recorder)
+    summary["routing"] = assistant.get_stats()
+    summary.update(extra)
+    summary["latencies"] = {kind: seconds * args.latency_scale for kind, seconds in latency.latencies.items()}
+    _print_summary(args.entry, summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Latency and LLM calls per message of the bakery assistant, the previous chain
+(free-text delegation, then a router LLM call) against the single structured
+classify-and-route call, on a recorded message set.
+
+Both paths answer every message; the order alternates per message so neither
+path always runs with a warm connection, and every agent's history is cleared
+before each run so neither path sees the other's turns. Escalation messages are skipped by
+default because the escalation handler asks for human input.
+
+Usage:
+    cd insta_bot
+    uv run bench_routing.py
+    uv run bench_routing.py --recorded recorded_messages.json --rounds 2 --include-escalations
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from agent_bakery_assistant import fast
+from intent_routing import INTENT_AGENTS, RoutedAssistant
+
+# Agents with an LLM attached, whose usage is summed per message
+LLM_AGENTS = [
+    "classify_and_route",
+    "task_delegation_manager",
+    "task_router_manager",
+    "research_manager",
+    "order_manager",
+    "customer_communication_manager",
+    "escalation_handler",
+]
+
+
+def _usage(agent) -> tuple:
+    turns = tokens = 0
+    for name in LLM_AGENTS:
+        accumulator = agent[name].usage_accumulator
+        if accumulator:
+            turns += accumulator.turn_count
+            tokens += accumulator.cumulative_billing_tokens
+    return turns, tokens
+
+
+def _reset_history(agent) -> None:
+    """Clear every agent's history, so each run starts from the same prompt whatever ran before"""
+    for name in LLM_AGENTS:
+        llm = agent[name]._llm
+        if llm is not None:
+            llm.history.clear()
+
+
+async def _timed(agent, answer, message: str) -> dict:
+    _reset_history(agent)
+    turns, tokens = _usage(agent)
+    start = time.perf_counter()
+    await answer(message)
+    seconds = time.perf_counter() - start
+    turns_after, tokens_after = _usage(agent)
+    return {"seconds": seconds, "llm_calls": turns_after - turns, "tokens": tokens_after - tokens}
+
+
+def _report(name: str, results) -> None:
+    latencies = sorted(r["seconds"] for r in results)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<10}{len(results):>10}{statistics.mean(latencies):>12.2f}{statistics.median(latencies):>12.2f}"
+        f"{p95:>12.2f}{statistics.mean(r['llm_calls'] for r in results):>12.1f}"
+        f"{statistics.mean(r['tokens'] for r in results):>12.0f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recorded", default="recorded_messages.json", help="JSON list of {message, intent}")
+    parser.add_argument("--rounds", type=int, default=1, help="Times the message set is answered")
+    parser.add_argument("--include-escalations", action="store_true")
+    args, _ = parser.parse_known_args()
+
+    with open(args.recorded) as f:
+        recorded = json.load(f)
+    if not args.include_escalations:
+        recorded = [r for r in recorded if r.get("intent") != "escalation"]
+
+    async with fast.run() as agent:
+        routed = RoutedAssistant(agent)
+        paths = {"chain": agent.bakery_assistant_chain.send, "routed": routed.answer}
+        results = {name: [] for name in paths}
+        routed_correctly = 0
+        for round_number in range(args.rounds):
+            for i, record in enumerate(recorded):
+                order = list(paths) if (i + round_number) % 2 == 0 else list(reversed(paths))
+                for name in order:
+                    results[name].append(await _timed(agent, paths[name], record["message"]))
+                if record.get("intent"):
+                    decision = await routed.classify(record["message"])
+                    routed_correctly += decision.intent == record["intent"]
+
+    print(f"{'path':<10}{'messages':>10}{'mean s':>12}{'p50 s':>12}{'p95 s':>12}{'LLM calls':>12}{'tokens':>12}")
+    for name, path_results in results.items():
+        _report(name, path_results)
+    labelled = sum(1 for r in recorded if r.get("intent")) * args.rounds
+    if labelled:
+        print(f"\nroute decisions matching the recorded intent: {routed_correctly}/{labelled}")
+    print(f"routed: {routed.get_stats()}")
+    print(f"handlers: {INTENT_AGENTS}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
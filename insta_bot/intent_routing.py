@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Literal, Optional
+
+from mcp_agent.core.prompt import Prompt
+from pydantic import BaseModel, Field
+
+from tracing import TracingMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Name of the bakery assistant tool, the same as fast-agent's server exposed for the chain
+ASSISTANT_TOOL_NAME = "agent_bakery_assistant_send"
+# Below this confidence the handler is told the intent is uncertain
+ROUTE_MIN_CONFIDENCE = float(os.environ.get("ROUTE_MIN_CONFIDENCE", "0.5"))
+
+# Deterministic dispatch: intent -> agent that handles it
+INTENT_AGENTS = {
+    "inquiry": "research_manager",
+    "order": "order_manager",
+    "escalation": "escalation_handler",
+}
+# Used when the classification cannot be parsed
+FALLBACK_INTENT = "inquiry"
+
+CLASSIFY_AND_ROUTE_INSTRUCTION = """
+You are a Task Delegation Manager at Pumpernickel Bakery.
+Classify the customer's message into exactly one intent:
+- inquiry : The customer is seeking information about products, services, hours, or the bakery itself.
+- order : The customer wants to place or modify an order.
+- escalation : The customer expresses dissatisfaction, frustration, or is requesting further help due to a poor experience or unresolved issue.
+
+Return:
+- intent: one of inquiry, order, escalation.
+- confidence: how sure you are, from 0 to 1.
+- key_details: a short summary of every detail the team needs to handle the task (products, sizes, dates, times, phone numbers, addresses, complaints).
+"""
+
+
+class RouteDecision(BaseModel):
+    """Structured output of the classify-and-route call"""
+
+    intent: Literal["inquiry", "order", "escalation"]
+    confidence: float = Field(ge=0.0, le=1.0)
+    key_details: str = ""
+
+
+def handler_message(message: str, decision: RouteDecision) -> str:
+    """Message passed to the agent the decision routes to"""
+    uncertain = " (uncertain)" if decision.confidence < ROUTE_MIN_CONFIDENCE else ""
+    return (
+        f"Customer intent: {decision.intent}{uncertain}\n"
+        f"Key details: {decision.key_details or 'none'}\n\n"
+        f"Customer message:\n{message}"
+    )
+
+
+def writer_message(message: str, findings: str) -> str:
+    """Message passed to the agent writing the reply: the customer's conversation and the handler's findings"""
+    return f"Customer conversation:\n{message}\n\nInformation for the reply:\n{findings}"
+
+
+class RoutedAssistant:
+    """
+    The bakery assistant with classification and routing in one LLM call.
+
+    The old chain classified a message in free text (task_delegation_manager)
+    and had a router LLM read that text again to pick the handler. Here the
+    `classify_and_route` agent returns a RouteDecision, the handler is looked
+    up in INTENT_AGENTS and the customer_communication_manager writes the
+    reply: three LLM calls per message instead of four (plus tool calls).
+
+    The agents keep no history, as they are shared by all conversations:
+    `message` is the conversation context of one customer thread, and it is
+    passed to the handler and the writer explicitly.
+    """
+
+    def __init__(self, agents, classifier: str = "classify_and_route", writer: str = "customer_communication_manager"):
+        self.agents = agents
+        self.classifier = classifier
+        self.writer = writer
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "messages": 0,
+            "fallbacks": 0,
+            "by_intent": {},
+            "classify_seconds": 0.0,
+            "handle_seconds": 0.0,
+            "write_seconds": 0.0,
+        }
+
+    async def classify(self, message: str) -> RouteDecision:
+        decision, _ = await self.agents[self.classifier].structured([Prompt.user(message)], RouteDecision)
+        if decision is None:
+            logger.warning("Could not parse the route decision, using the fallback intent")
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            decision = RouteDecision(intent=FALLBACK_INTENT, confidence=0.0, key_details="")
+        return decision
+
+    async def answer(self, message: str) -> str:
+        started = time.perf_counter()
+        decision = await self.classify(message)
+        classified = time.perf_counter()
+        handler = INTENT_AGENTS[decision.intent]
+        logger.info(f"Routing to {handler} (intent {decision.intent}, confidence {decision.confidence:.2f})")
+        findings = await self.agents[handler].send(handler_message(message, decision))
+        handled = time.perf_counter()
+        reply = await self.agents[self.writer].send(writer_message(message, findings))
+        written = time.perf_counter()
+
+        with self._lock:
+            self.stats["messages"] += 1
+            by_intent = self.stats["by_intent"]
+            by_intent[decision.intent] = by_intent.get(decision.intent, 0) + 1
+            self.stats["classify_seconds"] += classified - started
+            self.stats["handle_seconds"] += handled - classified
+            self.stats["write_seconds"] += written - handled
+        return reply
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self.stats, "by_intent": dict(self.stats["by_intent"])}
+        count = stats["messages"] or 1
+        for stage in ("classify", "handle", "write"):
+            stats[f"avg_{stage}_seconds"] = round(stats.pop(f"{stage}_seconds") / count, 3)
+        return stats
+
+
+async def serve(assistant: RoutedAssistant, transport: str = "sse", host: str = "0.0.0.0", port: int = 4400) -> None:
+    """Expose the routed assistant as an MCP server with the chain's tool name"""
+    from fastmcp import FastMCP
+
+    mcp = FastMCP(name="agent_bakery_assistant")
+    mcp.add_middleware(TracingMiddleware())
+
+    @mcp.tool(name=ASSISTANT_TOOL_NAME)
+    async def send_message(message: str) -> str:
+        """Send a customer message to the bakery assistant and get the reply to send back"""
+        return await assistant.answer(message)
+
+    @mcp.tool()
+    def get_routing_stats() -> Dict[str, Any]:
+        """Messages per intent and average time per stage of the bakery assistant"""
+        return assistant.get_stats()
+
+    if transport == "sse":
+        await mcp.run_async(transport="sse", host=host, port=port, path="/sse")
+    else:
+        await mcp.run_async(transport="streamable-http", host=host, port=port)
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ValidationError, model_validator
+
+from tracing import call_mcp_tool
+
+logger = logging.getLogger(__name__)
+
+INSTA_MCP_URL = os.environ.get("INSTA_MCP_URL", "http://localhost:4200/insta-mcp")
+
+REPLY_FORMAT_INSTRUCTION = """
+End your answer with the reply to send, as a JSON object on its own line:
+{"thread_id": "<thread id of the chat>", "username": "<customer username>", "text": "<exact reply from the Bakery Assistant>"}
+"""
+
+
+class OutgoingReply(BaseModel):
+    """A reply to send: the text and the thread (or, failing that, the username) to send it to"""
+
+    text: str
+    thread_id: Optional[str] = None
+    username: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_recipient(self):
+        if not self.text.strip():
+            raise ValueError("Reply text is empty")
+        if not self.thread_id and not self.username:
+            raise ValueError("Reply needs a thread_id or username")
+        return self
+
+
+def parse_reply(response: str) -> Optional[OutgoingReply]:
+    """The last JSON reply object in an agent response, or None"""
+    decoder = json.JSONDecoder()
+    for match in reversed(list(re.finditer(r"\{", response))):
+        try:
+            data, _ = decoder.raw_decode(response, match.start())
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(data, dict) or "text" not in data:
+            continue
+        try:
+            return OutgoingReply(
+                text=data.get("text") or "",
+                thread_id=str(data["thread_id"]) if data.get("thread_id") else None,
+                username=data.get("username") or None,
+            )
+        except ValidationError as e:
+            logger.warning(f"Invalid reply in agent response: {e}")
+            return None
+    return None
+
+
+async def send_reply(reply: OutgoingReply) -> Dict[str, Any]:
+    """
+    Send a reply through insta_mcp without an LLM in between.
+
+    Replies go to the thread when its id is known, which needs no username lookup.
+    Tool output that is not insta_mcp's JSON result cannot confirm the send, so
+    it is reported as a failure and the thread is not taken as answered.
+    """
+    if reply.thread_id:
+        tool, arguments = "send_thread_message", {"thread_id": reply.thread_id, "message": reply.text}
+    else:
+        tool, arguments = "send_message", {"username": reply.username, "message": reply.text}
+    text = await call_mcp_tool(INSTA_MCP_URL, tool, arguments)
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        result = None
+    if not isinstance(result, dict) or "success" not in result:
+        logger.warning(f"Unconfirmed send to {reply.thread_id or reply.username}, {tool} returned: {text[:200]}")
+        return {"success": False, "confirmed": False, "message": f"Unexpected {tool} output: {text[:200]}"}
+    return result
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# One tracing module for all services, in common/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.tracing import TracingMiddleware, call_mcp_tool, payload_size, setup_tracing, span  # noqa: E402,F401
@@ -0,0 +1,210 @@
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from message_store import MessageStore
+
+logger = logging.getLogger(__name__)
+
+# Messages read from the store per conversation
+CONTEXT_HISTORY_MESSAGES = int(os.environ.get("CONTEXT_HISTORY_MESSAGES", "60"))
+# Turns before the customer's new messages that are kept verbatim
+CONTEXT_RECENT_TURNS = int(os.environ.get("CONTEXT_RECENT_TURNS", "4"))
+# Total (estimated) token budget of the context passed to the bakery assistant
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "600"))
+# Share of the budget the rolling summary may use
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_MAX_TOKENS", "200"))
+# Characters kept per turn in the rolling summary
+SUMMARY_LINE_CHARS = 160
+
+ITEM_PLACEHOLDERS = {
+    "media": "[photo or video]",
+    "voice_media": "[voice message]",
+    "clip": "[shared reel]",
+    "media_share": "[shared post]",
+    "xma_media_share": "[shared post]",
+    "story_share": "[shared story]",
+    "reel_share": "[reply to a story]",
+    "link": "[link]",
+    "like": "[like]",
+    "animated_media": "[sticker]",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English chat text)"""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class Turn:
+    speaker: str
+    lines: List[str]
+    timestamp: float
+
+    def render(self) -> str:
+        return f"{self.speaker}: " + "\n".join(self.lines)
+
+    def condensed(self) -> str:
+        text = " ".join(self.lines)
+        if self.speaker == "Bakery":
+            # Replies open with the answer; customers put details (sizes, dates, phone numbers) anywhere
+            text = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[: SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+        return f"- {self.speaker}: {text}"
+
+
+@dataclass
+class ConversationContext:
+    thread_id: str
+    text: str
+    tokens: int
+    full_history_tokens: int
+    summarized_turns: int
+    recent_turns: int
+    new_messages: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.full_history_tokens - self.tokens, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "thread_id": self.thread_id,
+            "context": self.text,
+            "tokens": self.tokens,
+            "full_history_tokens": self.full_history_tokens,
+            "tokens_saved": self.tokens_saved,
+            "summarized_turns": self.summarized_turns,
+            "recent_turns": self.recent_turns,
+            "new_messages": self.new_messages,
+        }
+
+
+def _message_line(message) -> Optional[str]:
+    if message.text:
+        return message.text.strip()
+    return ITEM_PLACEHOLDERS.get(message.item_type or "", f"[{message.item_type}]" if message.item_type else None)
+
+
+def _turns(messages) -> List[Turn]:
+    """Chronological turns, consecutive messages of one side merged"""
+    turns: List[Turn] = []
+    for message in sorted(messages, key=lambda m: m.timestamp):
+        line = _message_line(message)
+        if not line:
+            continue
+        speaker = "Bakery" if message.is_sent_by_viewer else "Customer"
+        if turns and turns[-1].speaker == speaker:
+            turns[-1].lines.append(line)
+            turns[-1].timestamp = message.timestamp.timestamp()
+        else:
+            turns.append(Turn(speaker, [line], message.timestamp.timestamp()))
+    return turns
+
+
+class ContextBuilder:
+    """
+    Builds a compact conversation context for the bakery assistant.
+
+    The context is the customer's messages since the bakery's last reply, the
+    `recent_turns` turns before them verbatim and a rolling summary of
+    everything older. The summary is stored per thread and only extended with
+    turns that aged out of the recent window since the last build. When the
+    context exceeds `token_budget`, recent turns are dropped first, then the
+    oldest summary lines; the new messages are always kept.
+    """
+
+    def __init__(
+        self,
+        store: MessageStore,
+        recent_turns: int = CONTEXT_RECENT_TURNS,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        summary_max_tokens: int = CONTEXT_SUMMARY_MAX_TOKENS,
+        history_messages: int = CONTEXT_HISTORY_MESSAGES,
+    ):
+        self.store = store
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.history_messages = history_messages
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "tokens": 0, "full_history_tokens": 0}
+        # thread_id -> tokens saved across builds
+        self.saved_by_thread: Dict[str, int] = {}
+
+    def _summary_lines(self, thread_id: str, older: List[Turn]) -> List[str]:
+        summary, summarized_until = self.store.summary(thread_id)
+        lines = summary.splitlines() if summary else []
+        aged_out = [turn for turn in older if turn.timestamp > summarized_until]
+        if aged_out:
+            lines.extend(turn.condensed() for turn in aged_out)
+            while lines and estimate_tokens("\n".join(lines)) > self.summary_max_tokens:
+                lines.pop(0)
+            self.store.save_summary(thread_id, "\n".join(lines), aged_out[-1].timestamp)
+        return lines
+
+    @staticmethod
+    def _render(username: Optional[str], summary: List[str], recent: List[Turn], pending: List[Turn]) -> str:
+        sender = f"@{username}" if username else "a customer"
+        parts = [f"Instagram conversation with {sender}."]
+        if summary:
+            parts.append("Earlier in the conversation:\n" + "\n".join(summary))
+        if recent:
+            parts.append("Recent messages:\n" + "\n".join(turn.render() for turn in recent))
+        if pending:
+            parts.append("New messages from the customer (reply to these):\n" + "\n".join(
+                line for turn in pending for line in turn.lines
+            ))
+        return "\n\n".join(parts)
+
+    def build(self, thread_id: str, username: Optional[str] = None) -> ConversationContext:
+        """Context for replying to a thread, synced with Instagram first"""
+        thread_id = str(thread_id)
+        messages = self.store.messages(thread_id, self.history_messages, force_sync=True)
+        turns = _turns(messages)
+
+        last_reply = max((i for i, t in enumerate(turns) if t.speaker == "Bakery"), default=-1)
+        pending = turns[last_reply + 1:]
+        answered = turns[: last_reply + 1]
+        split = max(len(answered) - self.recent_turns, 0)
+        older, recent = answered[:split], answered[split:]
+        summary = self._summary_lines(thread_id, older)
+
+        text = self._render(username, summary, recent, pending)
+        while estimate_tokens(text) > self.token_budget and (recent or summary):
+            if recent:
+                recent = recent[1:]
+            else:
+                summary = summary[1:]
+            text = self._render(username, summary, recent, pending)
+
+        full_history = self._render(username, [], turns[: last_reply + 1], pending)
+        context = ConversationContext(
+            thread_id=thread_id,
+            text=text,
+            tokens=estimate_tokens(text),
+            full_history_tokens=estimate_tokens(full_history),
+            summarized_turns=len(older),
+            recent_turns=len(recent),
+            new_messages=sum(len(turn.lines) for turn in pending),
+        )
+        with self._lock:
+            self.stats["builds"] += 1
+            self.stats["tokens"] += context.tokens
+            self.stats["full_history_tokens"] += context.full_history_tokens
+            self.saved_by_thread[thread_id] = self.saved_by_thread.get(thread_id, 0) + context.tokens_saved
+        return context
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            saved = dict(self.saved_by_thread)
+        stats["tokens_saved"] = stats["full_history_tokens"] - stats["tokens"]
+        stats["avg_tokens"] = round(stats["tokens"] / stats["builds"], 1) if stats["builds"] else 0.0
+        stats["tokens_saved_by_thread"] = saved
+        return stats
@@ -0,0 +1,432 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from instagrapi import Client
+
+from context_builder import ContextBuilder
+from tracing import call_mcp_tool, payload_size, span
+from user_cache import UserIdCache
+
+logger = logging.getLogger(__name__)
+
+# Poll interval bounds: the interval resets to the minimum after activity and
+# doubles on every quiet poll up to the maximum
+LISTENER_MIN_INTERVAL = float(os.environ.get("LISTENER_MIN_INTERVAL", "2"))
+LISTENER_MAX_INTERVAL = float(os.environ.get("LISTENER_MAX_INTERVAL", "30"))
+# Upper bound of the backoff after failed polls (rate limits, network errors)
+LISTENER_ERROR_MAX_INTERVAL = float(os.environ.get("LISTENER_ERROR_MAX_INTERVAL", "300"))
+# Messages included per thread in each inbox poll
+LISTENER_THREAD_MESSAGE_LIMIT = int(os.environ.get("LISTENER_THREAD_MESSAGE_LIMIT", "5"))
+# Where per-thread high-water marks are kept across restarts
+LISTENER_STATE_PATH = os.environ.get("LISTENER_STATE_PATH", "dm_listener_state.json")
+AGENT_BAKERY_ASSISTANT_URL = os.environ.get("AGENT_BAKERY_ASSISTANT_URL", "http://localhost:4400/sse")
+AGENT_BAKERY_ASSISTANT_TOOL = os.environ.get("AGENT_BAKERY_ASSISTANT_TOOL", "agent_bakery_assistant_send")
+# bakery_mcp answers greetings, thanks and simple FAQs without the assistant chain
+BAKERY_MCP_URL = os.environ.get("BAKERY_MCP_URL", "http://localhost:4300/bakery-mcp")
+QUICK_REPLY_ENABLED = os.environ.get("QUICK_REPLY_ENABLED", "true").lower() in ("1", "true", "yes")
+# Photos customers send are matched against the bakery's posts by bakery_mcp instead of being described by an LLM
+PHOTO_MATCH_ENABLED = os.environ.get("PHOTO_MATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class NewMessagesEvent:
+    """Customer messages received in one thread since its last high-water mark"""
+
+    thread_id: str
+    username: Optional[str]
+    user_id: Optional[str]
+    messages: List[Dict[str, Any]]
+    detected_at: float = field(default_factory=time.time)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(m["text"] for m in self.messages if m.get("text"))
+
+
+def _message_summary(message) -> Dict[str, Any]:
+    return {
+        "id": str(message.id),
+        "user_id": str(message.user_id) if message.user_id else None,
+        "timestamp": message.timestamp.timestamp(),
+        "item_type": message.item_type,
+        "text": message.text,
+    }
+
+
+class DMListener:
+    """
+    Polls the Instagram inbox and queues new customer messages.
+
+    Each poll fetches the first inbox page, which lists threads by latest
+    activity with their newest messages inlined. Threads whose last_activity_at
+    has not moved past their high-water mark are skipped, and older pages are
+    only requested while every thread on the current page has new activity.
+    A thread's full history is only fetched when more messages arrived than the
+    inbox page inlines.
+
+    Marks are seeded from the inbox on first start, so existing conversations
+    are not answered again, and saved to `state_path` for restarts.
+
+    `events` is anything with a queue.Queue-like `put`, e.g. a ThreadScheduler.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        events: Optional[Any] = None,
+        state_path: Optional[str] = LISTENER_STATE_PATH,
+        min_interval: float = LISTENER_MIN_INTERVAL,
+        max_interval: float = LISTENER_MAX_INTERVAL,
+        thread_message_limit: int = LISTENER_THREAD_MESSAGE_LIMIT,
+        user_cache: Optional[UserIdCache] = None,
+    ):
+        self.client = client
+        self.user_cache = user_cache
+        self.events = events if events is not None else queue.Queue()
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.thread_message_limit = thread_message_limit
+        self.interval = min_interval
+        # thread_id -> {"last_activity_at": float, "last_message_id": str}
+        self.marks: Dict[str, Dict[str, Any]] = {}
+        # Threads first seen after this time are new conversations
+        self.seeded_at: Optional[float] = None
+        self._seeded = False
+        self._errors_in_row = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "polls": 0,
+            "pages_fetched": 0,
+            "threads_skipped": 0,
+            "threads_changed": 0,
+            "history_fetches": 0,
+            "events": 0,
+            "messages": 0,
+            "errors": 0,
+        }
+        self._load_state()
+
+    def _load_state(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            self.marks, self.seeded_at = state["threads"], state["seeded_at"]
+            # Marks saved by queue_unread before the first poll: that poll still has to seed
+            self._seeded = self.seeded_at is not None
+            logger.info(f"Loaded high-water marks for {len(self.marks)} threads")
+        except Exception as e:
+            logger.warning(f"Could not load listener state from {self.state_path}: {e}")
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"seeded_at": self.seeded_at, "threads": self.marks}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"Could not save listener state to {self.state_path}: {e}")
+
+    def _event(self, thread, messages: List[Any]) -> Optional[NewMessagesEvent]:
+        """Event for the customer messages among `messages`, if any"""
+        customer_messages = [m for m in messages if not m.is_sent_by_viewer]
+        if not customer_messages:
+            return None
+        user = thread.users[0] if len(thread.users) == 1 else None
+        self.stats["messages"] += len(customer_messages)
+        return NewMessagesEvent(
+            thread_id=str(thread.id),
+            username=user.username if user else None,
+            user_id=str(user.pk) if user else None,
+            messages=[_message_summary(m) for m in customer_messages],
+        )
+
+    def _mark(self, thread) -> None:
+        newest = max(thread.messages, key=lambda m: m.timestamp, default=None)
+        self.marks[str(thread.id)] = {
+            "last_activity_at": thread.last_activity_at.timestamp(),
+            "last_message_id": str(newest.id) if newest else None,
+        }
+
+    def queue_unread(self, amount: int = 20) -> int:
+        """
+        Queue the unanswered messages of unread threads, e.g. those that arrived while
+        the listener was down. Returns the number of events queued.
+        """
+        threads = self.client.direct_threads(
+            amount, selected_filter="unread", thread_message_limit=self.thread_message_limit
+        )
+        queued = 0
+        for thread in threads:
+            messages = sorted(thread.messages, key=lambda m: m.timestamp)
+            last_reply = max((i for i, m in enumerate(messages) if m.is_sent_by_viewer), default=-1)
+            event = self._event(thread, messages[last_reply + 1:])
+            if event:
+                self.events.put(event)
+                queued += 1
+            self._mark(thread)
+        self.stats["events"] += queued
+        if threads:
+            self._save_state()
+        logger.info(f"Queued {queued} unread threads")
+        return queued
+
+    def _is_new(self, thread) -> bool:
+        mark = self.marks.get(str(thread.id))
+        return mark is None or thread.last_activity_at.timestamp() > mark["last_activity_at"]
+
+    def _new_messages(self, thread) -> List[Any]:
+        """Messages of a changed thread after its mark, oldest first"""
+        mark = self.marks.get(str(thread.id))
+        last_id = mark["last_message_id"] if mark else None
+        messages = sorted(thread.messages, key=lambda m: m.timestamp)
+        ids = [str(m.id) for m in messages]
+        if last_id and last_id not in ids and len(messages) >= self.thread_message_limit:
+            # More messages arrived than the inbox page inlines: fetch until the mark
+            self.stats["history_fetches"] += 1
+            messages = sorted(
+                self.client.direct_messages(int(thread.id), amount=50), key=lambda m: m.timestamp
+            )
+            ids = [str(m.id) for m in messages]
+        if last_id in ids:
+            return messages[ids.index(last_id) + 1:]
+        since = mark["last_activity_at"] if mark else self.seeded_at
+        return [m for m in messages if m.timestamp.timestamp() > since]
+
+    def _changed_threads(self) -> List[Any]:
+        changed = []
+        cursor = None
+        while True:
+            threads, cursor = self.client.direct_threads_chunk(
+                thread_message_limit=self.thread_message_limit, cursor=cursor
+            )
+            self.stats["pages_fetched"] += 1
+            new = [t for t in threads if self._is_new(t)]
+            self.stats["threads_skipped"] += len(threads) - len(new)
+            changed.extend(new)
+            if self.user_cache:
+                self.user_cache.remember_users(user for thread in new for user in thread.users)
+            # Threads are ordered by activity, so an unchanged thread ends the scan
+            if not cursor or len(new) < len(threads) or not self._seeded:
+                return changed
+
+    def poll(self) -> int:
+        """Check the inbox once and queue new customer messages. Returns the number of events queued"""
+        self.stats["polls"] += 1
+        queued = 0
+        seeding = not self._seeded
+        changed = self._changed_threads()
+        for thread in changed:
+            self.stats["threads_changed"] += 1
+            event = self._event(thread, self._new_messages(thread)) if self._seeded else None
+            if event:
+                self.events.put(event)
+                queued += 1
+            self._mark(thread)
+        if not self._seeded:
+            self.seeded_at = time.time()
+            logger.info(f"Seeded high-water marks for {len(self.marks)} threads")
+            self._seeded = True
+        self.stats["events"] += queued
+        if changed or seeding:
+            self._save_state()
+        return queued
+
+    def _next_interval(self, activity: bool) -> float:
+        if activity:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        return self.interval
+
+    def _error_interval(self) -> float:
+        self._errors_in_row += 1
+        backoff = min(self.max_interval * 2 ** (self._errors_in_row - 1), LISTENER_ERROR_MAX_INTERVAL)
+        return backoff * random.uniform(0.8, 1.2)
+
+    def run(self) -> None:
+        """Poll until stop() is called"""
+        logger.info("DM listener started")
+        while not self._stop.is_set():
+            try:
+                queued = self.poll()
+                self._errors_in_row = 0
+                delay = self._next_interval(queued > 0)
+            except Exception as e:
+                self.stats["errors"] += 1
+                delay = self._error_interval()
+                logger.warning(f"Inbox poll failed, retrying in {delay:.0f}s: {e}")
+            self._stop.wait(delay)
+        logger.info("DM listener stopped")
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="dm-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "interval_seconds": self.interval, "tracked_threads": len(self.marks)}
+
+
+async def ask_bakery_assistant(message: str) -> str:
+    """Send a customer message to the agent_bakery_assistant MCP server and return its reply"""
+    reply = await call_mcp_tool(AGENT_BAKERY_ASSISTANT_URL, AGENT_BAKERY_ASSISTANT_TOOL, {"message": message})
+    return reply.strip()
+
+
+async def ask_quick_reply(message: str) -> Optional[str]:
+    """Canned reply from bakery_mcp's intent classifier, or None when the message needs the assistant"""
+    data = json.loads(await call_mcp_tool(BAKERY_MCP_URL, "quick_reply", {"message": message}))
+    return data.get("reply") if data.get("handled") else None
+
+
+async def ask_photo_product(image_path: str) -> Optional[str]:
+    """Name of the catalog product on a photo, from bakery_mcp's image index, or None"""
+    data = json.loads(await call_mcp_tool(BAKERY_MCP_URL, "match_product_image", {"image_path": image_path}))
+    return data["product"]["name"] if data.get("matched") else None
+
+
+def assistant_prompt(event: NewMessagesEvent) -> str:
+    """Message passed to the bakery assistant for an event"""
+    sender = f"@{event.username}" if event.username else "a customer"
+    return f"New Instagram message from {sender}:\n{event.text}"
+
+
+class AssistantDispatcher:
+    """
+    Asks the bakery assistant for a reply to an event and sends it to the thread.
+
+    New messages are first offered to `quick_reply_fn` (bakery_mcp's intent
+    classifier); greetings, thanks and simple FAQs are answered from there and
+    skip the assistant chain. With a `context_builder`, the assistant gets the
+    compact conversation context instead of just the new messages.
+
+    Photos in the new messages are offered to `photo_product_fn` (thread id,
+    message id -> product name); a recognized product is added to the prompt
+    as text, so the assistant needs no image input. Events without text or a
+    recognized photo are skipped. `reply_fn`, `quick_reply_fn` and
+    `photo_product_fn` can replace the MCP calls, e.g. for local runs.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        reply_fn: Optional[Callable[[str], str]] = None,
+        context_builder: Optional[ContextBuilder] = None,
+        quick_reply_fn: Optional[Callable[[str], Optional[str]]] = None,
+        photo_product_fn: Optional[Callable[[str, str], Optional[str]]] = None,
+    ):
+        self.client = client
+        self.context_builder = context_builder
+        self.reply_fn = reply_fn or (lambda message: asyncio.run(ask_bakery_assistant(message)))
+        if quick_reply_fn is None and QUICK_REPLY_ENABLED:
+            quick_reply_fn = lambda message: asyncio.run(ask_quick_reply(message))
+        self.quick_reply_fn = quick_reply_fn
+        self.photo_product_fn = photo_product_fn if PHOTO_MATCH_ENABLED else None
+        self._lock = threading.Lock()
+        self.stats = {
+            "dispatched": 0,
+            "replied": 0,
+            "skipped": 0,
+            "quick_replies": 0,
+            "sent_to_chain": 0,
+            "photos": 0,
+            "photos_matched": 0,
+            "reply_latency_sum": 0.0,
+        }
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _quick_reply(self, event: NewMessagesEvent) -> Optional[str]:
+        if not self.quick_reply_fn:
+            return None
+        try:
+            return self.quick_reply_fn(event.text)
+        except Exception as e:
+            # The assistant chain can always answer; a failed pre-check only costs latency
+            logger.warning(f"Quick reply failed for thread {event.thread_id}: {e}")
+            return None
+
+    def _photo_products(self, event: NewMessagesEvent) -> List[str]:
+        if not self.photo_product_fn:
+            return []
+        products = []
+        for message in event.messages:
+            if message.get("item_type") != "media":
+                continue
+            self._count("photos")
+            try:
+                product = self.photo_product_fn(event.thread_id, message["id"])
+            except Exception as e:
+                logger.warning(f"Photo matching failed for message {message['id']}: {e}")
+                product = None
+            if product:
+                self._count("photos_matched")
+                products.append(product)
+        return products
+
+    def handle(self, event: NewMessagesEvent) -> Optional[str]:
+        photo_products = self._photo_products(event)
+        if not event.text and not photo_products:
+            self._count("skipped")
+            return None
+        self._count("dispatched")
+        with span(
+            "dm reply",
+            **{
+                "dm.thread_id": event.thread_id,
+                "dm.messages": len(event.messages),
+                "dm.wait_seconds": round(time.time() - event.detected_at, 3),
+                "dm.request.bytes": payload_size(event.text),
+            },
+        ) as current:
+            current.set_attribute("dm.photo_products", len(photo_products))
+            reply = None if photo_products or not event.text else self._quick_reply(event)
+            current.set_attribute("dm.quick_reply", bool(reply))
+            if reply:
+                self._count("quick_replies")
+            else:
+                prompt = assistant_prompt(event)
+                if self.context_builder:
+                    with span("build context"):
+                        context = self.context_builder.build(event.thread_id, event.username)
+                    if context.new_messages:
+                        prompt = context.text
+                for product in photo_products:
+                    prompt += f"\n[The customer sent a photo of our {product}]"
+                self._count("sent_to_chain")
+                reply = self.reply_fn(prompt)
+            if not reply:
+                return None
+            with span("instagram direct_answer", **{"dm.response.bytes": payload_size(reply)}):
+                self.client.direct_answer(int(event.thread_id), reply)
+        self._count("replied")
+        self._count("reply_latency_sum", time.time() - event.detected_at)
+        return reply
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        latency_sum = stats.pop("reply_latency_sum")
+        stats["avg_reply_latency_seconds"] = round(latency_sum / stats["replied"], 2) if stats["replied"] else None
+        answered = stats["quick_replies"] + stats["sent_to_chain"]
+        stats["chain_skip_rate"] = round(stats["quick_replies"] / answered, 3) if answered else 0.0
+        stats["photo_match_rate"] = round(stats["photos_matched"] / stats["photos"], 3) if stats["photos"] else 0.0
+        return stats
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Downscaled copies of customer images, the ones passed to the LLM
+IMAGE_DERIVATIVE_DIR = os.environ.get("IMAGE_DERIVATIVE_DIR", "derivatives")
+# Longest side of a derivative in pixels
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "1024"))
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "jpeg").lower()  # jpeg or webp
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "80"))
+IMAGE_MAX_WORKERS = int(os.environ.get("IMAGE_MAX_WORKERS", "4"))
+# Tokens per image patch of the agents' model (gpt-4.1-nano), used to report the token reduction
+IMAGE_TOKEN_MULTIPLIER = float(os.environ.get("IMAGE_TOKEN_MULTIPLIER", "2.46"))
+IMAGE_MAX_PATCHES = 1536
+PATCH_SIDE = 32
+
+EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+ORIENTATION_TAG = 0x0112
+
+
+def estimate_image_tokens(width: int, height: int, multiplier: float = IMAGE_TOKEN_MULTIPLIER) -> int:
+    """
+    Input tokens of an image for the agents' GPT-4.1 models.
+
+    The image is cut into 32x32 pixel patches, at most IMAGE_MAX_PATCHES
+    (larger images are scaled down first), and each patch costs `multiplier`
+    tokens (2.46 for gpt-4.1-nano, 1.62 for gpt-4.1-mini).
+    """
+    patches = math.ceil(width / PATCH_SIDE) * math.ceil(height / PATCH_SIDE)
+    if patches > IMAGE_MAX_PATCHES:
+        scale = math.sqrt(PATCH_SIDE * PATCH_SIDE * IMAGE_MAX_PATCHES / (width * height))
+        # Shrink a bit more so a whole number of patches fits the width or the height
+        scale *= min(
+            math.floor(width * scale / PATCH_SIDE) / (width * scale / PATCH_SIDE),
+            math.floor(height * scale / PATCH_SIDE) / (height * scale / PATCH_SIDE),
+        )
+        patches = math.ceil(width * scale / PATCH_SIDE) * math.ceil(height * scale / PATCH_SIDE)
+    return math.ceil(patches * multiplier)
+
+
+@dataclass
+class Derivative:
+    """A preprocessed image and how it compares to its original"""
+
+    path: str
+    width: int
+    height: int
+    bytes: int
+    tokens: int
+    original_path: str
+    original_width: int
+    original_height: int
+    original_bytes: int
+    original_tokens: int
+    cached: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ImagePreprocessor:
+    """
+    Size-capped JPEG/WebP copies of images, made before they reach the LLM.
+
+    A derivative has its EXIF orientation applied and no metadata (EXIF,
+    GPS, ICC, comments), and its longest side is at most `max_side`. It is
+    keyed by the original's path, size and mtime and the settings, so each
+    image is processed once. Batches are processed on a thread pool.
+    """
+
+    def __init__(
+        self,
+        root: str = IMAGE_DERIVATIVE_DIR,
+        max_side: int = IMAGE_MAX_SIDE,
+        image_format: str = IMAGE_FORMAT,
+        quality: int = IMAGE_QUALITY,
+        max_workers: int = IMAGE_MAX_WORKERS,
+    ):
+        if image_format not in EXTENSIONS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.root = Path(root)
+        self.max_side = max_side
+        self.image_format = image_format
+        self.quality = quality
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-preprocess")
+        self._lock = threading.Lock()
+        self.stats = {
+            "images": 0,
+            "cached": 0,
+            "seconds": 0.0,
+            "original_bytes": 0,
+            "bytes": 0,
+            "original_tokens": 0,
+            "tokens": 0,
+        }
+
+    def _derivative_path(self, original: Path) -> Path:
+        stat = original.stat()
+        key = f"{original.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{self.max_side}:{self.image_format}:{self.quality}"
+        name = hashlib.sha1(key.encode()).hexdigest()[:20]
+        return self.root / f"{original.stem}_{name}{EXTENSIONS[self.image_format]}"
+
+    def _write(self, original: Path, target: Path) -> None:
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+            # A fresh image carries none of the original's metadata
+            clean = Image.new("RGB", image.size)
+            clean.paste(image)
+            tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                clean.save(tmp_path, format=self.image_format.upper(), quality=self.quality, optimize=True)
+                os.replace(tmp_path, target)
+            except Exception:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+    def prepare(self, path: str) -> Derivative:
+        """The derivative of an image, made on first use"""
+        started = time.perf_counter()
+        original = Path(path)
+        target = self._derivative_path(original)
+        cached = target.exists()
+        if not cached:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._write(original, target)
+
+        with Image.open(original) as image:
+            original_size = image.size
+            # Orientations 5-8 are rotated by 90 degrees
+            if image.getexif().get(ORIENTATION_TAG, 1) in (5, 6, 7, 8):
+                original_size = original_size[::-1]
+        with Image.open(target) as image:
+            size = image.size
+        derivative = Derivative(
+            path=str(target),
+            width=size[0],
+            height=size[1],
+            bytes=target.stat().st_size,
+            tokens=estimate_image_tokens(*size),
+            original_path=str(original),
+            original_width=original_size[0],
+            original_height=original_size[1],
+            original_bytes=original.stat().st_size,
+            original_tokens=estimate_image_tokens(*original_size),
+            cached=cached,
+        )
+        with self._lock:
+            self.stats["images"] += 1
+            self.stats["cached"] += cached
+            self.stats["seconds"] += time.perf_counter() - started
+            self.stats["original_bytes"] += derivative.original_bytes
+            self.stats["bytes"] += derivative.bytes
+            self.stats["original_tokens"] += derivative.original_tokens
+            self.stats["tokens"] += derivative.tokens
+        return derivative
+
+    def prepare_many(self, paths: List[str]) -> List[Derivative]:
+        """Derivatives of several images, processed in parallel, in order"""
+        return list(self._pool.map(self.prepare, paths))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["seconds"] = round(stats["seconds"], 3)
+        for unit in ("bytes", "tokens"):
+            original = stats[f"original_{unit}"]
+            stats[f"{unit}_reduction"] = round(1 - stats[unit] / original, 3) if original else 0.0
+        return stats
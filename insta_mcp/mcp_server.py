@@ -1,12 +1,27 @@
 from fastmcp import FastMCP
+from fastmcp.utilities.types import Image
 from instagrapi import Client
 import argparse
-from typing import Optional, List, Dict, Any
+import asyncio
+from typing import Optional, List, Dict, Any, Tuple
 from dotenv import load_dotenv
 from pathlib import Path
 
 import logging
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from context_builder import ContextBuilder
+from dm_listener import AssistantDispatcher, DMListener, ask_photo_product
+from image_preprocessor import ImagePreprocessor
+from media_cache import MediaCache
+from media_downloader import MediaDownloader, items_of
+from message_store import MessageStore
+from presence_cache import PresenceCache
+from scheduler import ThreadScheduler
+from tracing import TracingMiddleware, setup_tracing
+from user_cache import UserIdCache
 
 load_dotenv()
 
@@ -23,7 +38,27 @@ client = Client()
 # Load consistent device settings to bypass suspicious activity detection
 client.load_settings("/tmp/dump.json")
 
+# Username <-> user id pairs, so tools skip a lookup round trip per call
+user_cache = UserIdCache(client)
+presence_cache = PresenceCache(client)
+# Local copy of DM threads, synced incrementally instead of re-downloaded per call
+message_store = MessageStore(client)
+context_builder = ContextBuilder(message_store)
+# Downloaded media by pk / shortcode, so media shared many times is downloaded once
+media_cache = MediaCache()
+# Album children and attachments of several messages are downloaded in parallel
+media_downloader = MediaDownloader()
+# Downscaled, metadata-free copies of customer photos, the only version the LLM sees
+image_preprocessor = ImagePreprocessor()
+
+setup_tracing("insta_mcp")
 mcp = FastMCP(name="Instagram DMs", instructions=INSTRUCTIONS)
+mcp.add_middleware(TracingMiddleware())
+
+# Set when the server runs with --listen
+listener: Optional[DMListener] = None
+dispatcher: Optional[AssistantDispatcher] = None
+scheduler: Optional[ThreadScheduler] = None
 
 
 @mcp.tool()
@@ -39,7 +74,7 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
     if not username or not message:
         return {"success": False, "message": "Username and message must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         dm = client.direct_send(message, [user_id])
@@ -55,6 +90,33 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+@mcp.tool()
+def send_thread_message(thread_id: str, message: str) -> Dict[str, Any]:
+    """Send an Instagram direct message to an existing thread by thread ID.
+    Preferred over send_message when replying, as no username lookup is needed.
+
+    Args:
+        thread_id: The thread ID to reply in.
+        message: The message text to send.
+    Returns:
+        A dictionary with success status and a status message.
+    """
+    if not thread_id or not message:
+        return {"success": False, "message": "Thread ID and message must be provided."}
+    try:
+        dm = client.direct_answer(int(thread_id), message)
+        if dm:
+            return {
+                "success": True,
+                "message": "Message sent to thread.",
+                "direct_message_id": getattr(dm, "id", None),
+            }
+        else:
+            return {"success": False, "message": "Failed to send message."}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
 @mcp.tool()
 def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
     """Send a photo via Instagram direct message to a user by username.
@@ -76,7 +138,7 @@ def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Photo file not found: {photo_path}"}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
@@ -113,7 +175,7 @@ def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Video file not found: {video_path}"}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
@@ -175,6 +237,7 @@ def list_chats(
 
     try:
         threads = client.direct_threads(amount, selected_filter, thread_message_limit)
+        user_cache.remember_users(user for thread in threads for user in thread.users)
         if full:
             return {
                 "success": True,
@@ -206,7 +269,7 @@ def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        messages = client.direct_messages(thread_id, amount)
+        messages = message_store.messages(thread_id, amount)
         result_msgs = []
         for m in messages:
             msg = m.dict() if hasattr(m, "dict") else (m if isinstance(m, dict) else {})
@@ -248,6 +311,27 @@ def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+@mcp.tool()
+def get_conversation_context(thread_id: str, username: str = "") -> Dict[str, Any]:
+    """Get a compact conversation context to answer a thread: a summary of older messages,
+    the last few turns and the customer's messages since the last reply, within a token budget.
+    Use this instead of passing the full message history to the bakery assistant.
+
+    Args:
+        thread_id: The thread ID to build the context for.
+        username: Optional username of the customer, used in the context header.
+    Returns:
+        A dictionary with success status, the context text and token counts (including tokens saved).
+    """
+    if not thread_id:
+        return {"success": False, "message": "Thread ID must be provided."}
+    try:
+        context = context_builder.build(thread_id, username or None)
+        return {"success": True, **context.to_dict()}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
 @mcp.tool()
 def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
     """Mark a message as seen in a direct message thread.
@@ -351,11 +435,7 @@ def get_thread_details(thread_id: str, amount: int = 20) -> Dict[str, Any]:
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        thread = client.direct_thread(thread_id, amount)
-        return {
-            "success": True,
-            "thread": thread.dict() if hasattr(thread, "dict") else str(thread),
-        }
+        return {"success": True, "thread": message_store.thread(thread_id, amount)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -372,7 +452,7 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
     if not username:
         return {"success": False, "message": "Username must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if user_id:
             return {"success": True, "user_id": user_id}
         else:
@@ -393,7 +473,7 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
     if not user_id:
         return {"success": False, "message": "User ID must be provided."}
     try:
-        username = client.username_from_user_id(user_id)
+        username = user_cache.username(user_id)
         if username:
             return {"success": True, "username": username}
         else:
@@ -417,6 +497,7 @@ def get_user_info(username: str) -> Dict[str, Any]:
     try:
         user = client.user_info_by_username(username)
         if user:
+            user_cache.remember(user.username, user.pk)
             user_data = {
                 "user_id": str(user.pk),
                 "username": user.username,
@@ -447,37 +528,25 @@ def check_user_online_status(usernames: List[str]) -> Dict[str, Any]:
     Args:
         usernames: List of Instagram usernames to check status for.
     Returns:
-        A dictionary with success status and users' presence information.
+        A dictionary with success status, users' presence information and
+        the usernames that could not be resolved with the reason.
     """
     if not usernames or not isinstance(usernames, list):
         return {"success": False, "message": "A list of usernames must be provided."}
 
     try:
-        user_ids = []
-        username_to_id = {}
-
-        # Get user IDs for the usernames
-        for username in usernames:
-            try:
-                user_id = client.user_id_from_username(username)
-                if user_id:
-                    user_ids.append(int(user_id))
-                    username_to_id[user_id] = username
-            except:
-                continue
-
+        user_ids, errors = user_cache.user_ids(usernames)
         if not user_ids:
-            return {"success": False, "message": "No valid users found."}
-
-        presence_data = client.direct_users_presence(user_ids)
-
-        # Convert back to usernames
-        result = {}
-        for user_id_str, presence in presence_data.items():
-            username = username_to_id.get(user_id_str, f"user_{user_id_str}")
-            result[username] = presence
+            return {"success": False, "message": "No valid users found.", "errors": errors}
 
-        return {"success": True, "presence_data": result}
+        presences = presence_cache.get(list(user_ids.values()))
+        return {
+            "success": True,
+            "presence_data": {
+                username: presences.get(user_id) for username, user_id in user_ids.items()
+            },
+            "errors": errors,
+        }
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -497,6 +566,7 @@ def search_users(query: str) -> Dict[str, Any]:
 
     try:
         users = client.search_users(query)
+        user_cache.remember_users(users)
 
         user_results = []
         for user in users:
@@ -530,7 +600,7 @@ def get_user_stories(username: str) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
@@ -611,11 +681,12 @@ def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
         followers = client.user_followers(user_id, amount=count)
+        user_cache.remember_users(followers.values())
 
         follower_results = []
         for follower_id, follower in followers.items():
@@ -653,11 +724,12 @@ def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
         following = client.user_following(user_id, amount=count)
+        user_cache.remember_users(following.values())
 
         following_results = []
         for following_id, followed_user in following.items():
@@ -695,7 +767,7 @@ def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
 
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = user_cache.user_id(username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
@@ -705,6 +777,8 @@ def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
         for media in medias:
             media_data = {
                 "media_id": str(media.pk),
+                "code": media.code,
+                "post_url": f"https://www.instagram.com/p/{media.code}/",
                 "media_type": media.media_type,  # 1=photo, 2=video, 8=album
                 "caption": media.caption_text if media.caption_text else "",
                 "like_count": media.like_count,
@@ -729,21 +803,52 @@ def _ensure_download_directory(download_path: str) -> None:
     Path(download_path).mkdir(parents=True, exist_ok=True)
 
 
-def _download_single_media(media, download_path: str) -> str:
-    """Download a single media item and return the file path."""
-    media_type = media.media_type
-    if media_type == 1:  # Photo
-        return str(client.photo_download(media.pk, download_path))
-    elif media_type == 2:  # Video
-        return str(client.video_download(media.pk, download_path))
-    else:
-        raise ValueError(f"Unsupported media type: {media_type}")
+def _media_type_name(media_type: int) -> str:
+    return {1: "photo", 2: "video", 8: "album"}.get(media_type, str(media_type))
+
+
+def _download_media(media, download_path: str) -> List[str]:
+    """Download a photo, video or every item of an album and return the file paths."""
+    return media_downloader.download(items_of(media), download_path)
+
+
+def _fetch_message_media(media) -> Tuple[str, List[str], bool]:
+    """(media type, file paths, cached) of a DM attachment, downloaded through the media cache."""
+    return media_cache.fetch(
+        str(media.id),
+        lambda tmp_dir: (_media_type_name(media.media_type), _download_media(media, tmp_dir)),
+    )
+
+
+def _deliver(paths: List[str], download_path: Optional[str]) -> List[str]:
+    """Cached files as they are, or linked (copied across filesystems) into download_path."""
+    if not download_path or Path(download_path).resolve() == media_cache.root.resolve():
+        return paths
+    _ensure_download_directory(download_path)
+    delivered = []
+    for path in paths:
+        target = Path(download_path) / Path(path).name
+        if not target.exists():
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+        delivered.append(str(target))
+    return delivered
 
 
 def _find_message_in_thread(thread_id: str, message_id: str):
     """Find a specific message in a thread."""
-    messages = client.direct_messages(thread_id, 100)
-    return next((m for m in messages if str(m.id) == message_id), None)
+    return message_store.find(thread_id, message_id)
+
+
+def _photo_product(thread_id: str, message_id: str) -> Optional[str]:
+    """Catalog product on the photo of a message, matched by the bakery MCP's image index."""
+    target_message = _find_message_in_thread(thread_id, message_id)
+    if not target_message or not target_message.media or target_message.media.media_type != 1:
+        return None
+    path = _fetch_message_media(target_message.media)[1][0]
+    return asyncio.run(ask_photo_product(path))
 
 
 @mcp.tool()
@@ -757,7 +862,7 @@ def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
     """
     try:
         limit = min(limit, 200)
-        messages = client.direct_messages(thread_id, limit)
+        messages = message_store.messages(thread_id, limit)
         media_messages = []
         for message in messages:
             if message.media:
@@ -787,18 +892,18 @@ def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
 
 @mcp.tool()
 def download_media_from_message(
-    message_id: str, thread_id: str, download_path: str = "./downloads"
+    message_id: str, thread_id: str, download_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """Download media from a specific Instagram direct message and get the local file path.
+    Media already downloaded is served from the local media cache.
     Args:
         message_id: The ID of the message containing the media
         thread_id: The ID of the thread containing the message
-        download_path: Directory to save the downloaded file (default: ./downloads)
+        download_path: Directory to put the file in (default: the media cache directory)
     Returns:
         A dictionary containing success status, a status message, and the file path if successful
     """
     try:
-        _ensure_download_directory(download_path)
         target_message = _find_message_in_thread(thread_id, message_id)
         if not target_message:
             return {
@@ -807,12 +912,14 @@ def download_media_from_message(
             }
         if not target_message.media:
             return {"success": False, "message": "This message does not contain media"}
-        file_path = _download_single_media(target_message.media, download_path)
+        media_type, paths, cached = _fetch_message_media(target_message.media)
+        file_path = _deliver(paths, download_path)[0]
         return {
             "success": True,
             "message": "Media downloaded successfully",
             "file_path": file_path,
-            "media_type": "photo" if target_message.media.media_type == 1 else "video",
+            "media_type": media_type,
+            "cached": cached,
             "message_id": message_id,
             "thread_id": thread_id,
         }
@@ -820,20 +927,109 @@ def download_media_from_message(
         return {"success": False, "message": f"Failed to download media: {str(e)}"}
 
 
+@mcp.tool()
+def view_media_from_messages(message_ids: List[str], thread_id: str) -> List[Any]:
+    """Look at the photos customers sent in direct messages, e.g. a reference cake.
+    Returns the images, downscaled for viewing, and a summary.
+    Args:
+        message_ids: The IDs of the messages containing the photos
+        thread_id: The ID of the thread containing the messages
+    Returns:
+        One image per photo and a dictionary with success status, the image size per message ID and an error per failed message
+    """
+    if not message_ids or not thread_id:
+        return [{"success": False, "message": "Message IDs and thread ID must be provided."}]
+    paths: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    for message_id in dict.fromkeys(message_ids):
+        try:
+            target_message = _find_message_in_thread(thread_id, message_id)
+            if not target_message or not target_message.media:
+                errors[message_id] = "Message not found or without media"
+            elif target_message.media.media_type != 1:
+                errors[message_id] = "Only photos can be viewed"
+            else:
+                paths[message_id] = _fetch_message_media(target_message.media)[1][0]
+        except Exception as e:
+            errors[message_id] = f"Failed to download media: {str(e)}"
+    try:
+        derivatives = image_preprocessor.prepare_many(list(paths.values()))
+    except Exception as e:
+        return [{"success": False, "message": f"Failed to process images: {str(e)}", "errors": errors}]
+    images = {
+        message_id: {"width": d.width, "height": d.height, "bytes": d.bytes, "original_bytes": d.original_bytes}
+        for message_id, d in zip(paths, derivatives)
+    }
+    summary = {
+        "success": bool(derivatives),
+        "message": f"{len(derivatives)} of {len(dict.fromkeys(message_ids))} photos",
+        "images": images,
+        "errors": errors,
+    }
+    return [Image(path=d.path) for d in derivatives] + [summary]
+
+
+@mcp.tool()
+def download_media_from_messages(
+    message_ids: List[str], thread_id: str, download_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Download the media of several messages of a thread at once and get the local file paths.
+    Preferred over calling download_media_from_message per message, as the files are downloaded in parallel.
+    Args:
+        message_ids: The IDs of the messages containing the media
+        thread_id: The ID of the thread containing the messages
+        download_path: Directory to put the files in (default: the media cache directory)
+    Returns:
+        A dictionary containing success status, the downloaded files by message ID, and an error per failed message
+    """
+    if not message_ids or not thread_id:
+        return {"success": False, "message": "Message IDs and thread ID must be provided."}
+
+    def fetch(message_id: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            target_message = _find_message_in_thread(thread_id, message_id)
+            if not target_message:
+                return message_id, None, f"Message {message_id} not found in thread {thread_id}"
+            if not target_message.media:
+                return message_id, None, "This message does not contain media"
+            media_type, paths, cached = _fetch_message_media(target_message.media)
+            media = {
+                "file_path": _deliver(paths, download_path)[0],
+                "media_type": media_type,
+                "cached": cached,
+            }
+            return message_id, media, None
+        except Exception as e:
+            return message_id, None, f"Failed to download media: {str(e)}"
+
+    unique_ids = list(dict.fromkeys(message_ids))
+    with ThreadPoolExecutor(max_workers=min(media_downloader.max_workers, len(unique_ids))) as pool:
+        results = list(pool.map(fetch, unique_ids))
+    downloaded = {message_id: media for message_id, media, _ in results if media}
+    errors = {message_id: error for message_id, _, error in results if error}
+    return {
+        "success": bool(downloaded),
+        "message": f"Downloaded media of {len(downloaded)} of {len(unique_ids)} messages",
+        "media": downloaded,
+        "errors": errors,
+        "thread_id": thread_id,
+    }
+
+
 @mcp.tool()
 def download_shared_post_from_message(
-    message_id: str, thread_id: str, download_path: str = "./downloads"
+    message_id: str, thread_id: str, download_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """Download media from a shared post/reel/clip in a DM message and get the local file path.
+    A post shared before (by anyone) is served from the local media cache.
     Args:
         message_id: The ID of the message containing the shared post/reel/clip
         thread_id: The ID of the thread containing the message
-        download_path: Directory to save the downloaded file (default: ./downloads)
+        download_path: Directory to put the files in (default: the media cache directory)
     Returns:
         A dictionary containing success status, a status message, and the file path if successful
     """
     try:
-        _ensure_download_directory(download_path)
         target_message = _find_message_in_thread(thread_id, message_id)
         if not target_message:
             return {
@@ -844,7 +1040,6 @@ def download_shared_post_from_message(
         # Extract shared post/reel/clip URL
         shared_url = None
         shared_code = None
-        shared_obj = None
         if item_type in [
             "clip",
             "media_share",
@@ -861,38 +1056,28 @@ def download_shared_post_from_message(
                         if shared_code
                         else None
                     )
-                    shared_obj = obj
                     break
         if not shared_url:
             return {
                 "success": False,
                 "message": "This message does not contain a supported shared post/reel/clip",
             }
-        # Download using Instagrapi
-        try:
+
+        def download(tmp_dir: str):
             media_pk = client.media_pk_from_url(shared_url)
             media = client.media_info(media_pk)
-            if media.media_type == 1:
-                file_path = str(client.photo_download(media_pk, download_path))
-                media_type = "photo"
-            elif media.media_type == 2:
-                file_path = str(client.video_download(media_pk, download_path))
-                media_type = "video"
-            elif media.media_type == 8:  # album
-                # Download all items in album
-                album_paths = client.album_download(media_pk, download_path)
-                file_path = str(album_paths)
-                media_type = "album"
-            else:
-                return {
-                    "success": False,
-                    "message": f"Unsupported media type: {media.media_type}",
-                }
+            return _media_type_name(media.media_type), _download_media(media, tmp_dir)
+
+        # Download using Instagrapi, once per shared post
+        try:
+            media_type, paths, cached = media_cache.fetch(str(shared_code or shared_url), download)
+            paths = _deliver(paths, download_path)
             return {
                 "success": True,
                 "message": "Shared post/reel/clip downloaded successfully",
-                "file_path": file_path,
+                "file_path": str(paths) if media_type == "album" else paths[0],
                 "media_type": media_type,
+                "cached": cached,
                 "shared_post_url": shared_url,
                 "message_id": message_id,
                 "thread_id": thread_id,
@@ -925,6 +1110,7 @@ def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
     try:
         result = client.direct_message_delete(int(thread_id), int(message_id))
         if result:
+            message_store.delete(thread_id, message_id)
             return {"success": True, "message": "Message deleted successfully."}
         else:
             return {"success": False, "message": "Failed to delete message."}
@@ -964,6 +1150,69 @@ def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+@mcp.tool()
+def get_user_cache_stats() -> Dict[str, Any]:
+    """Get hit-rate statistics of the username / user ID and presence caches.
+
+    Returns:
+        A dictionary with success status and cache statistics.
+    """
+    return {
+        "success": True,
+        "user_cache": user_cache.get_stats(),
+        "presence_cache": presence_cache.get_stats(),
+    }
+
+
+@mcp.tool()
+def get_media_cache_stats() -> Dict[str, Any]:
+    """Get hit-rate and size statistics of the downloaded media cache,
+    throughput (bytes/sec, per-file latency) of media downloads, and the byte and
+    token reduction of the downscaled images passed to the LLM.
+
+    Returns:
+        A dictionary with success status and media cache statistics.
+    """
+    return {
+        "success": True,
+        "media_cache": media_cache.get_stats(),
+        "downloads": media_downloader.get_stats(),
+        "images": image_preprocessor.get_stats(),
+    }
+
+
+@mcp.tool()
+def get_message_store_stats() -> Dict[str, Any]:
+    """Get statistics of the local message store (reads served locally, pages fetched)
+    and of the conversation context builder (tokens saved per conversation).
+
+    Returns:
+        A dictionary with success status and message store and context statistics.
+    """
+    return {
+        "success": True,
+        "message_store": message_store.get_stats(),
+        "context_builder": context_builder.get_stats(),
+    }
+
+
+@mcp.tool()
+def get_dm_listener_stats() -> Dict[str, Any]:
+    """Get polling and reply statistics of the real-time DM listener.
+
+    Returns:
+        A dictionary with success status and listener and dispatcher statistics.
+    """
+    if listener is None:
+        return {"success": False, "message": "DM listener is not running. Start the server with --listen."}
+    return {
+        "success": True,
+        "listener": listener.get_stats(),
+        "scheduler": scheduler.get_stats(),
+        "dispatcher": dispatcher.get_stats(),
+    }
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -976,6 +1225,11 @@ if __name__ == "__main__":
         type=str,
         help="Instagram password (can also be set via INSTAGRAM_PASSWORD env var)",
     )
+    parser.add_argument(
+        "--listen",
+        action="store_true",
+        help="Poll for new DMs and answer them through the bakery assistant",
+    )
     args = parser.parse_args()
 
     # Get credentials from environment variables or command line arguments
@@ -996,6 +1250,15 @@ if __name__ == "__main__":
         logger.info("Attempting to login to Instagram...")
         client.login(username, password)
         logger.info("Successfully logged in to Instagram")
+        if args.listen:
+            dispatcher = AssistantDispatcher(
+                client, context_builder=context_builder, photo_product_fn=_photo_product
+            )
+            scheduler = ThreadScheduler(dispatcher.handle)
+            listener = DMListener(client, events=scheduler, user_cache=user_cache)
+            scheduler.start()
+            listener.queue_unread()
+            listener.start()
         mcp.run(
             transport="streamable-http",
             host="127.0.0.1",
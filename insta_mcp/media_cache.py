@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Downloaded photos, videos and albums, one directory per media pk / shortcode
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", "downloads")
+# Least recently used media are deleted above this size
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+INDEX_FILE = "index.json"
+TMP_PREFIX = ".tmp-"
+
+# Downloads media into the given directory, returns (media type, downloaded file paths)
+Downloader = Callable[[str], Tuple[str, List[str]]]
+
+
+def _dir_name(key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", key)
+
+
+class MediaCache:
+    """
+    On-disk cache of Instagram media keyed by media pk or shortcode.
+
+    A miss downloads into a temporary directory that is renamed into place
+    once complete, so a crash never leaves a half-written entry. Concurrent
+    requests for the same key wait for the one download in flight. The
+    cache is bounded by `max_bytes`, evicting least recently used entries.
+    """
+
+    def __init__(self, root: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        # Absolute, so the paths handed out are valid for other processes (bakery_mcp)
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # key -> {"dir", "media_type", "files", "bytes", "last_used"}, least recently used first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "deduplicated": 0, "evictions": 0, "bytes_downloaded": 0}
+        self._load()
+
+    def _load(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        for leftover in self.root.glob(f"{TMP_PREFIX}*"):
+            shutil.rmtree(leftover, ignore_errors=True)
+        index_path = self.root / INDEX_FILE
+        if not index_path.exists():
+            return
+        try:
+            with open(index_path) as f:
+                entries = json.load(f)
+            for key, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+                if all(os.path.exists(self.root / entry["dir"] / name) for name in entry["files"]):
+                    self._entries[key] = entry
+            logger.info(f"Loaded {len(self._entries)} cached media from {self.root}")
+        except Exception as e:
+            logger.warning(f"Could not load media cache index from {index_path}: {e}")
+
+    def _save(self) -> None:
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._entries.items()}
+        index_path = self.root / INDEX_FILE
+        tmp_path = f"{index_path}.tmp"
+        try:
+            with self._save_lock:
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, index_path)
+        except Exception as e:
+            logger.warning(f"Could not save media cache index to {index_path}: {e}")
+
+    def _paths(self, entry: Dict[str, Any]) -> List[str]:
+        return [str(self.root / entry["dir"] / name) for name in entry["files"]]
+
+    def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """(media type, file paths) of a cached media, without downloading"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            return entry["media_type"], self._paths(entry)
+
+    def fetch(self, key: str, download: Downloader) -> Tuple[str, List[str], bool]:
+        """
+        (media type, file paths, cached) of a media, downloading it on a miss.
+
+        `download` is only called if no other thread is already downloading
+        the same key; otherwise this waits for that download's result.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry["last_used"] = time.time()
+                self.stats["hits"] += 1
+                result = (entry["media_type"], self._paths(entry), True)
+            else:
+                result = None
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._in_flight[key] = Future()
+                    self.stats["misses"] += 1
+                else:
+                    self.stats["deduplicated"] += 1
+        if result is not None:
+            self._save()
+            return result
+        if not owner:
+            media_type, paths = future.result()
+            return media_type, paths, True
+
+        try:
+            media_type, paths = self._download(key, download)
+            future.set_result((media_type, paths))
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return media_type, paths, False
+
+    def _download(self, key: str, download: Downloader) -> Tuple[str, List[str]]:
+        tmp_dir = self.root / f"{TMP_PREFIX}{uuid.uuid4().hex}"
+        tmp_dir.mkdir(parents=True)
+        final_dir = self.root / _dir_name(key)
+        try:
+            media_type, downloaded = download(str(tmp_dir))
+            files = [os.path.relpath(path, tmp_dir) for path in downloaded]
+            size = sum(os.path.getsize(path) for path in downloaded)
+            # An entry evicted from the index may still be on disk
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(tmp_dir, final_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        entry = {"dir": final_dir.name, "media_type": media_type, "files": files, "bytes": size, "last_used": time.time()}
+        with self._lock:
+            self._entries[key] = entry
+            self.stats["bytes_downloaded"] += size
+            evicted = self._evict(keep=key)
+        for evicted_entry in evicted:
+            shutil.rmtree(self.root / evicted_entry["dir"], ignore_errors=True)
+        self._save()
+        return media_type, self._paths(entry)
+
+    def _evict(self, keep: str) -> List[Dict[str, Any]]:
+        """Drop least recently used entries above max_bytes; caller holds the lock"""
+        evicted = []
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            total -= entry["bytes"]
+            evicted.append(entry)
+        self.stats["evictions"] += len(evicted)
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = sum(entry["bytes"] for entry in self._entries.values())
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"] + stats["deduplicated"]
+        stats["hit_rate"] = round((stats["hits"] + stats["deduplicated"]) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Media files downloaded at the same time, across all tool calls
+MEDIA_DOWNLOAD_MAX_WORKERS = int(os.environ.get("MEDIA_DOWNLOAD_MAX_WORKERS", "6"))
+# Bytes read from the response and written to disk at a time
+MEDIA_DOWNLOAD_CHUNK_BYTES = int(os.environ.get("MEDIA_DOWNLOAD_CHUNK_BYTES", str(256 * 1024)))
+MEDIA_DOWNLOAD_TIMEOUT = int(os.environ.get("MEDIA_DOWNLOAD_TIMEOUT", "30"))
+
+PHOTO, VIDEO, ALBUM = 1, 2, 8
+
+
+@dataclass
+class DownloadItem:
+    """One file to download: its CDN URL and the file name (without extension) to save it as"""
+
+    url: str
+    filename: str
+
+
+def items_of(media: Any, username: Optional[str] = None) -> List[DownloadItem]:
+    """
+    Files of a media: the photo, the video or every child of an album.
+
+    Works for instagrapi Media (feed posts, reels) and DirectMedia (DM
+    attachments); file names follow instagrapi's `{username}_{pk}`.
+    """
+    owner = username or getattr(getattr(media, "user", None), "username", None) or "media"
+    if media.media_type == ALBUM:
+        resources = media.resources
+    else:
+        resources = [media]
+    items = []
+    for resource in resources:
+        pk = getattr(resource, "pk", None)
+        if pk is None:
+            pk = getattr(resource, "id", None)
+        if resource.media_type == PHOTO:
+            url = resource.thumbnail_url
+        elif resource.media_type == VIDEO:
+            url = resource.video_url
+        else:
+            raise ValueError(f"Unsupported media type: {resource.media_type}")
+        if not url:
+            raise ValueError(f"Media {pk} has no download URL")
+        items.append(DownloadItem(url=str(url), filename=f"{owner}_{pk}"))
+    return items
+
+
+class MediaDownloader:
+    """
+    Downloads media files on a bounded thread pool.
+
+    Album children and attachments of several messages are fetched in
+    parallel. Response bodies are streamed to a `.part` file in chunks, so a
+    video is never held in memory, and renamed once complete.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MEDIA_DOWNLOAD_MAX_WORKERS,
+        chunk_bytes: int = MEDIA_DOWNLOAD_CHUNK_BYTES,
+        timeout: int = MEDIA_DOWNLOAD_TIMEOUT,
+    ):
+        self.chunk_bytes = chunk_bytes
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media-download")
+        self.max_workers = max_workers
+        # One HTTP session per worker thread, to reuse connections to the CDN
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "files": 0, "failures": 0, "bytes": 0, "item_seconds": 0.0, "wall_seconds": 0.0}
+        self._latencies: List[float] = []
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _download_one(self, item: DownloadItem, folder: str) -> Tuple[str, int, float]:
+        started = time.perf_counter()
+        extension = os.path.splitext(urlparse(item.url).path)[1] or ".bin"
+        path = Path(folder) / f"{item.filename}{extension}"
+        part_path = path.with_name(path.name + ".part")
+        size = 0
+        try:
+            with self._session().get(item.url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                expected = response.headers.get("Content-Length")
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_bytes):
+                        f.write(chunk)
+                        size += len(chunk)
+            # Content-Length is the encoded size, only comparable without compression
+            if expected and not response.headers.get("Content-Encoding") and int(expected) != size:
+                raise IOError(f"Broken file {path.name} (Content-Length={expected}, but got {size} bytes)")
+            os.replace(part_path, path)
+        except Exception:
+            part_path.unlink(missing_ok=True)
+            raise
+        return str(path.resolve()), size, time.perf_counter() - started
+
+    def download(self, items: List[DownloadItem], folder: str) -> List[str]:
+        """Download all items into folder in parallel and return their paths, in order"""
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        futures = [self._pool.submit(self._download_one, item, folder) for item in items]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        wall_seconds = time.perf_counter() - started
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["files"] += len(results)
+            self.stats["failures"] += len(errors)
+            self.stats["bytes"] += sum(size for _, size, _ in results)
+            self.stats["item_seconds"] += sum(seconds for _, _, seconds in results)
+            self.stats["wall_seconds"] += wall_seconds
+            self._latencies = (self._latencies + [seconds for _, _, seconds in results])[-1000:]
+        if errors:
+            for path, _, _ in results:
+                Path(path).unlink(missing_ok=True)
+            raise errors[0]
+        total = sum(size for _, size, _ in results)
+        logger.debug(f"Downloaded {len(results)} files, {total} bytes in {wall_seconds:.2f}s")
+        return [path for path, _, _ in results]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._latencies)
+        stats["max_workers"] = self.max_workers
+        stats["bytes_per_second"] = round(stats["bytes"] / stats["wall_seconds"]) if stats["wall_seconds"] else 0
+        stats["avg_item_seconds"] = round(stats["item_seconds"] / stats["files"], 3) if stats["files"] else 0.0
+        stats["p95_item_seconds"] = (
+            round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0
+        )
+        stats["item_seconds"] = round(stats["item_seconds"], 3)
+        stats["wall_seconds"] = round(stats["wall_seconds"], 3)
+        return stats
@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from instagrapi import Client
+from instagrapi.extractors import extract_direct_thread
+from instagrapi.types import DirectMessage
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_STORE_PATH = os.environ.get("MESSAGE_STORE_PATH", "messages.db")
+# A thread synced this recently is served from the store without asking Instagram
+MESSAGE_STORE_SYNC_TTL = float(os.environ.get("MESSAGE_STORE_SYNC_TTL", "5"))
+# Newer pages fetched before giving up on reaching the stored history
+MESSAGE_STORE_MAX_NEW_PAGES = int(os.environ.get("MESSAGE_STORE_MAX_NEW_PAGES", "10"))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    oldest_cursor TEXT,
+    has_older INTEGER NOT NULL DEFAULT 1,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    thread_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    has_media INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (thread_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_thread_time ON messages (thread_id, timestamp DESC);
+CREATE TABLE IF NOT EXISTS thread_summaries (
+    thread_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    summarized_until REAL NOT NULL
+);
+"""
+
+
+class MessageStore:
+    """
+    Local copy of Direct threads in a WAL-mode SQLite database.
+
+    Messages are keyed by (thread_id, message_id). Syncing a thread only pages
+    through newer messages until it reaches one already stored, and older
+    history is fetched from the saved oldest cursor when a caller asks for
+    more messages than are stored. Reads are index lookups.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        path: str = MESSAGE_STORE_PATH,
+        sync_ttl: float = MESSAGE_STORE_SYNC_TTL,
+    ):
+        self.client = client
+        self.path = path
+        self.sync_ttl = sync_ttl
+        self._lock = threading.RLock()
+        # One sync per thread at a time, so concurrent tool calls share a fetch
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.stats = {"reads": 0, "fresh_reads": 0, "pages_fetched": 0, "messages_stored": 0, "lookups_hit": 0}
+
+    def _thread_lock(self, thread_id: str) -> threading.Lock:
+        with self._lock:
+            return self._thread_locks.setdefault(thread_id, threading.Lock())
+
+    def _fetch_page(self, thread_id: str, cursor: Optional[str] = None):
+        """One page of a thread, newest messages first, as (DirectThread, older cursor)"""
+        params = {
+            "visual_message_return_type": "unseen",
+            "direction": "older",
+            "seq_id": "40065",
+            "limit": "20",
+        }
+        if cursor:
+            params["cursor"] = cursor
+        result = self.client.private_request(f"direct_v2/threads/{thread_id}/", params=params)
+        thread = result["thread"]
+        older_cursor = thread.get("oldest_cursor") if thread.get("has_older", True) else None
+        self.stats["pages_fetched"] += 1
+        return extract_direct_thread(thread), older_cursor
+
+    def _thread_row(self, thread_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute("SELECT * FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+
+    def _known_ids(self, thread_id: str, message_ids: List[str]) -> set:
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT message_id FROM messages WHERE thread_id = ? "
+                f"AND message_id IN ({', '.join('?' for _ in message_ids)})",
+                [thread_id, *message_ids],
+            ).fetchall()
+        return {row["message_id"] for row in rows}
+
+    def _save(
+        self,
+        thread,
+        messages: List[DirectMessage],
+        update_cursor: bool = False,
+        oldest_cursor: Optional[str] = None,
+    ) -> None:
+        thread_id = str(thread.id)
+        meta = thread.model_dump_json(exclude={"messages"})
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO threads (thread_id, data, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET data = excluded.data, synced_at = excluded.synced_at",
+                (thread_id, meta, time.time()),
+            )
+            if update_cursor:
+                self.conn.execute(
+                    "UPDATE threads SET oldest_cursor = ?, has_older = ? WHERE thread_id = ?",
+                    (oldest_cursor, 1 if oldest_cursor else 0, thread_id),
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO messages (thread_id, message_id, timestamp, has_media, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (thread_id, str(m.id), m.timestamp.timestamp(), 1 if m.media else 0, m.model_dump_json())
+                    for m in messages
+                ],
+            )
+        self.stats["messages_stored"] += len(messages)
+
+    def _sync_newer(self, thread_id: str) -> None:
+        """Fetch messages newer than the newest stored one"""
+        row = self._thread_row(thread_id)
+        cursor = None
+        for _ in range(MESSAGE_STORE_MAX_NEW_PAGES):
+            thread, older_cursor = self._fetch_page(thread_id, cursor)
+            messages = thread.messages
+            known = self._known_ids(thread_id, [str(m.id) for m in messages]) if row and messages else set()
+            new = [m for m in messages if str(m.id) not in known]
+            if row is None:
+                # First sync: the page becomes the stored history
+                self._save(thread, new, update_cursor=True, oldest_cursor=older_cursor)
+                return
+            self._save(thread, new)
+            if known or not messages or not older_cursor:
+                return
+            cursor = older_cursor
+        # Too many new messages to bridge the gap: restart the history from here
+        logger.info(f"Thread {thread_id} moved on too far, dropping its older stored messages")
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM messages WHERE thread_id = ? AND timestamp < ?",
+                (thread_id, min(m.timestamp.timestamp() for m in messages)),
+            )
+        self._save(thread, [], update_cursor=True, oldest_cursor=older_cursor)
+
+    def _sync_older(self, thread_id: str, amount: int) -> None:
+        """Fetch older pages from the saved cursor until `amount` messages are stored"""
+        while self._count(thread_id) < amount:
+            row = self._thread_row(thread_id)
+            if not row or not row["has_older"] or not row["oldest_cursor"]:
+                return
+            thread, older_cursor = self._fetch_page(thread_id, row["oldest_cursor"])
+            self._save(thread, thread.messages, update_cursor=True, oldest_cursor=older_cursor)
+
+    def _count(self, thread_id: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE thread_id = ?", (thread_id,)
+            ).fetchone()[0]
+
+    def sync(self, thread_id: str, amount: int = 20, force: bool = False) -> None:
+        """Bring a thread up to date and make sure its newest `amount` messages are stored"""
+        thread_id = str(thread_id)
+        with self._thread_lock(thread_id):
+            row = self._thread_row(thread_id)
+            if force or row is None or time.time() - row["synced_at"] >= self.sync_ttl:
+                self._sync_newer(thread_id)
+            else:
+                self.stats["fresh_reads"] += 1
+            self._sync_older(thread_id, amount)
+
+    def messages(self, thread_id: str, amount: int = 20, force_sync: bool = False) -> List[DirectMessage]:
+        """Newest `amount` messages of a thread, newest first (like client.direct_messages)"""
+        self.sync(thread_id, amount, force=force_sync)
+        self.stats["reads"] += 1
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data FROM messages WHERE thread_id = ? ORDER BY timestamp DESC, message_id DESC LIMIT ?",
+                (str(thread_id), amount),
+            ).fetchall()
+        return [DirectMessage.model_validate_json(row["data"]) for row in rows]
+
+    def thread(self, thread_id: str, amount: int = 20) -> Dict[str, Any]:
+        """Thread details with its newest `amount` messages, like client.direct_thread(...).dict()"""
+        messages = self.messages(thread_id, amount)
+        row = self._thread_row(str(thread_id))
+        details = json.loads(row["data"])
+        details["messages"] = [m.model_dump(mode="json") for m in messages]
+        return details
+
+    def find(self, thread_id: str, message_id: str, search_limit: int = 100) -> Optional[DirectMessage]:
+        """
+        A message by id.
+
+        Stored messages are an index hit; otherwise the thread is synced and
+        older history is fetched up to `search_limit` messages.
+        """
+        thread_id, message_id = str(thread_id), str(message_id)
+        query = "SELECT data FROM messages WHERE thread_id = ? AND message_id = ?"
+        with self._lock:
+            row = self.conn.execute(query, (thread_id, message_id)).fetchone()
+        if row is None:
+            self.sync(thread_id, force=True)
+            with self._thread_lock(thread_id):
+                while True:
+                    with self._lock:
+                        row = self.conn.execute(query, (thread_id, message_id)).fetchone()
+                    if row is not None or self._count(thread_id) >= search_limit:
+                        break
+                    stored = self._count(thread_id)
+                    self._sync_older(thread_id, stored + 1)
+                    if self._count(thread_id) == stored:
+                        break
+        else:
+            self.stats["lookups_hit"] += 1
+        return DirectMessage.model_validate_json(row["data"]) if row else None
+
+    def summary(self, thread_id: str) -> Tuple[str, float]:
+        """Saved conversation summary of a thread and the timestamp it covers up to"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT summary, summarized_until FROM thread_summaries WHERE thread_id = ?", (str(thread_id),)
+            ).fetchone()
+        return (row["summary"], row["summarized_until"]) if row else ("", 0.0)
+
+    def save_summary(self, thread_id: str, summary: str, summarized_until: float) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO thread_summaries (thread_id, summary, summarized_until) VALUES (?, ?, ?)",
+                (str(thread_id), summary, summarized_until),
+            )
+
+    def delete(self, thread_id: str, message_id: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM messages WHERE thread_id = ? AND message_id = ?", (str(thread_id), str(message_id))
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            threads = self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            messages = self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {**self.stats, "threads": threads, "messages": messages}
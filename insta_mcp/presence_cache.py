@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from instagrapi import Client
+
+logger = logging.getLogger(__name__)
+
+# Presence changes quickly, so it is only reused for a short while
+PRESENCE_CACHE_TTL = float(os.environ.get("PRESENCE_CACHE_TTL", "30"))
+
+
+class PresenceCache:
+    """
+    Short-lived cache of Direct presence (online status, last activity) by user id.
+
+    Only users without a fresh entry are requested, all in a single
+    direct_users_presence call, so agents can poll presence cheaply.
+    """
+
+    def __init__(self, client: Client, ttl_seconds: float = PRESENCE_CACHE_TTL):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # user id -> (presence or None if Instagram returned none, fetched at)
+        self._entries: Dict[str, tuple] = {}
+        self.stats = {"hits": 0, "misses": 0, "requests": 0}
+
+    def get(self, user_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Presence of each user id (None when Instagram has no presence for it)"""
+        now = time.time()
+        result: Dict[str, Optional[Dict[str, Any]]] = {}
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry and now - entry[1] < self.ttl_seconds:
+                    result[user_id] = entry[0]
+            self.stats["hits"] += len(result)
+            stale = [user_id for user_id in user_ids if user_id not in result]
+            self.stats["misses"] += len(stale)
+
+        if stale:
+            response = self.client.direct_users_presence([int(user_id) for user_id in stale])
+            presences = response.get("user_presence", {})
+            fetched_at = time.time()
+            with self._lock:
+                self.stats["requests"] += 1
+                for user_id in stale:
+                    presence = presences.get(user_id)
+                    self._entries[user_id] = (presence, fetched_at)
+                    result[user_id] = presence
+                # Drop expired entries so the cache only holds recently polled users
+                self._entries = {
+                    user_id: entry for user_id, entry in self._entries.items()
+                    if fetched_at - entry[1] < self.ttl_seconds
+                }
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
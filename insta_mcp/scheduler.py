@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from dm_listener import NewMessagesEvent
+
+logger = logging.getLogger(__name__)
+
+# Conversations answered at the same time (bakery assistant chains in flight)
+SCHEDULER_MAX_CONCURRENCY = int(os.environ.get("SCHEDULER_MAX_CONCURRENCY", "4"))
+
+
+def merge_events(events: List[NewMessagesEvent]) -> NewMessagesEvent:
+    """One event for several queued events of the same thread, oldest first"""
+    first = events[0]
+    return NewMessagesEvent(
+        thread_id=first.thread_id,
+        username=next((e.username for e in events if e.username), None),
+        user_id=next((e.user_id for e in events if e.user_id), None),
+        messages=[m for e in events for m in e.messages],
+        detected_at=first.detected_at,
+    )
+
+
+class ThreadScheduler:
+    """
+    Answers different DM threads in parallel, each thread strictly in order.
+
+    Events are queued per thread. Up to `max_concurrency` workers each take the
+    next thread in round-robin order that is not already being answered, so a
+    thread never has two replies in flight and messages are answered in the
+    order they arrived. Everything a thread queued while waiting is merged into
+    one turn, and the thread then goes to the back of the line: a customer
+    sending many messages gets one reply per round like everybody else.
+
+    `put` has the queue.Queue signature, so the scheduler can be handed to
+    DMListener as its event queue.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[NewMessagesEvent], Any],
+        max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+    ):
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        # thread_id -> queued events; insertion order is the round-robin order
+        self._pending: "OrderedDict[str, Deque[NewMessagesEvent]]" = OrderedDict()
+        self._busy: set = set()
+        self._stop = False
+        self._workers: List[threading.Thread] = []
+        self.stats = {
+            "events": 0,
+            "turns": 0,
+            "merged_events": 0,
+            "errors": 0,
+            "max_in_flight": 0,
+            "wait_seconds_sum": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def put(self, event: NewMessagesEvent, block: bool = True, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._pending.setdefault(event.thread_id, deque()).append(event)
+            self.stats["events"] += 1
+            self._cond.notify()
+
+    def _next_turn(self) -> Optional[NewMessagesEvent]:
+        """Oldest waiting thread that is not being answered, with its events merged"""
+        with self._cond:
+            while not self._stop:
+                for thread_id in self._pending:
+                    if thread_id not in self._busy:
+                        events = list(self._pending.pop(thread_id))
+                        self._busy.add(thread_id)
+                        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], len(self._busy))
+                        self.stats["merged_events"] += len(events) - 1
+                        return merge_events(events)
+                self._cond.wait()
+            return None
+
+    def _finish(self, event: NewMessagesEvent, started_at: float) -> None:
+        wait = started_at - event.detected_at
+        with self._cond:
+            self._busy.discard(event.thread_id)
+            self.stats["turns"] += 1
+            self.stats["wait_seconds_sum"] += wait
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait)
+            # The thread may have queued more messages meanwhile
+            self._cond.notify_all()
+
+    def _work(self) -> None:
+        while True:
+            event = self._next_turn()
+            if event is None:
+                return
+            started_at = time.time()
+            try:
+                self.handler(event)
+            except Exception as e:
+                with self._cond:
+                    self.stats["errors"] += 1
+                logger.error(f"Failed to answer thread {event.thread_id}: {e}")
+            finally:
+                self._finish(event, started_at)
+
+    def start(self) -> None:
+        for i in range(self.max_concurrency):
+            worker = threading.Thread(target=self._work, name=f"dm-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return sum(len(events) for events in self._pending.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._busy)
+            stats["waiting_threads"] = len(self._pending)
+        wait_sum = stats.pop("wait_seconds_sum")
+        stats["avg_wait_seconds"] = round(wait_sum / stats["turns"], 2) if stats["turns"] else None
+        stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 2)
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from dm_listener import DMListener
+
+START = 1_750_000_000
+
+
+def _message(message_id, seconds, from_customer=True):
+    return SimpleNamespace(
+        id=message_id,
+        user_id=42 if from_customer else 1,
+        timestamp=datetime.fromtimestamp(START + seconds),
+        item_type="text",
+        text=f"message {message_id}",
+        is_sent_by_viewer=not from_customer,
+    )
+
+
+class FakeInbox:
+    """Inbox threads, newest activity first, served in one page"""
+
+    def __init__(self):
+        self.threads = {}
+
+    def say(self, thread_id, message_id, seconds, unread=True):
+        thread = self.threads.setdefault(
+            thread_id,
+            SimpleNamespace(id=thread_id, users=[SimpleNamespace(username=f"user_{thread_id}", pk=42)], messages=[]),
+        )
+        thread.messages = (thread.messages + [_message(message_id, seconds)])[-5:]
+        thread.last_activity_at = datetime.fromtimestamp(START + seconds)
+        thread.unread = unread
+
+    def _by_activity(self):
+        return sorted(self.threads.values(), key=lambda t: t.last_activity_at, reverse=True)
+
+    def direct_threads(self, amount, selected_filter=None, thread_message_limit=None):
+        return [t for t in self._by_activity() if t.unread][:amount]
+
+    def direct_threads_chunk(self, thread_message_limit=None, cursor=None):
+        return self._by_activity(), None
+
+
+def test_restart_after_queue_unread_without_a_poll(tmp_path, monkeypatch):
+    state_path = str(tmp_path / "dm_listener_state.json")
+    inbox = FakeInbox()
+    inbox.say("a", "a1", 10)
+    monkeypatch.setattr("dm_listener.time.time", lambda: START + 20)
+
+    first = DMListener(inbox, state_path=state_path)
+    assert first.queue_unread() == 1
+    # Stopped before the first poll: the marks are saved, but nothing was seeded
+    with open(state_path) as f:
+        assert json.load(f)["seeded_at"] is None
+
+    inbox.say("b", "b1", 30)
+    restarted = DMListener(inbox, state_path=state_path)
+    # The first poll after the restart seeds instead of failing on the missing seed time
+    assert restarted.poll() == 0
+    with open(state_path) as f:
+        assert json.load(f)["seeded_at"] == START + 20
+
+    inbox.say("b", "b2", 40)
+    inbox.say("c", "c1", 50)
+    assert restarted.poll() == 2
+    events = [restarted.events.get_nowait() for _ in range(2)]
+    assert {event.thread_id: [m["id"] for m in event.messages] for event in events} == {"b": ["b2"], "c": ["c1"]}
+
+
+def test_restart_after_a_poll_with_nothing_new(tmp_path, monkeypatch):
+    state_path = str(tmp_path / "dm_listener_state.json")
+    inbox = FakeInbox()
+    inbox.say("a", "a1", 10)
+    monkeypatch.setattr("dm_listener.time.time", lambda: START + 20)
+
+    first = DMListener(inbox, state_path=state_path)
+    first.queue_unread()
+    # Every thread was just marked by queue_unread, so the poll sees no change
+    assert first.poll() == 0
+    with open(state_path) as f:
+        assert json.load(f)["seeded_at"] == START + 20
+
+    inbox.say("c", "c1", 50)
+    restarted = DMListener(inbox, state_path=state_path)
+    assert restarted.poll() == 1
+    assert [m["id"] for m in restarted.events.get_nowait().messages] == ["c1"]
@@ -0,0 +1,142 @@
+import pytest
+
+import message_store
+from message_store import MessageStore
+
+THREAD_ID = "340282366841710300949128"
+PAGE_SIZE = 20
+START = 1_750_000_000
+
+
+class FakeInstagram:
+    """Serves one Direct thread page by page, newest first, like direct_v2/threads/{id}/"""
+
+    def __init__(self, count):
+        self.newest = 0
+        self.requests = []
+        self.add(count)
+
+    def add(self, count):
+        self.newest += count
+
+    def _item(self, number):
+        return {
+            "item_id": str(number),
+            "user_id": 42,
+            "timestamp": str((START + number) * 1_000_000),
+            "item_type": "text",
+            "text": f"message {number}",
+        }
+
+    def private_request(self, endpoint, params):
+        assert endpoint == f"direct_v2/threads/{THREAD_ID}/"
+        cursor = params.get("cursor")
+        self.requests.append(cursor)
+        # The cursor is the oldest message of the previous page
+        top = int(cursor) - 1 if cursor else self.newest
+        numbers = list(range(top, max(top - PAGE_SIZE, 0), -1))
+        thread = {
+            "thread_v2_id": "1",
+            "thread_id": THREAD_ID,
+            "items": [self._item(number) for number in numbers],
+            "users": [],
+            "admin_user_ids": [],
+            "last_activity_at": (START + self.newest) * 1_000_000,
+            "muted": False,
+            "named": False,
+            "canonical": True,
+            "pending": False,
+            "archived": False,
+            "thread_type": "private",
+            "thread_title": "customer",
+            "folder": 0,
+            "vc_muted": False,
+            "is_group": False,
+            "mentions_muted": False,
+            "approval_required_for_new_members": False,
+            "input_mode": 0,
+            "business_thread_folder": 0,
+            "read_state": 0,
+            "is_close_friend_thread": False,
+            "assigned_admin_id": 0,
+            "shh_mode_enabled": False,
+            "last_seen_at": {},
+            "has_older": numbers[-1] > 1,
+            "oldest_cursor": str(numbers[-1]),
+        }
+        return {"thread": thread}
+
+
+def _numbers(messages):
+    return [int(m.id) for m in messages]
+
+
+def _cursor(store):
+    row = store._thread_row(THREAD_ID)
+    return row["oldest_cursor"], row["has_older"]
+
+
+@pytest.fixture
+def instagram():
+    return FakeInstagram(50)
+
+
+@pytest.fixture
+def store(instagram, tmp_path):
+    return MessageStore(instagram, str(tmp_path / "messages.db"), sync_ttl=60)
+
+
+def test_first_sync_stores_one_page_and_its_cursor(store, instagram):
+    assert _numbers(store.messages(THREAD_ID, 20)) == list(range(50, 30, -1))
+    assert instagram.requests == [None]
+    assert _cursor(store) == ("31", 1)
+
+
+def test_fresh_thread_is_read_without_a_request(store, instagram):
+    store.messages(THREAD_ID, 20)
+    store.messages(THREAD_ID, 10)
+    assert instagram.requests == [None]
+    assert store.get_stats()["fresh_reads"] == 1
+
+
+def test_sync_only_fetches_newer_messages_and_keeps_the_cursor(store, instagram):
+    store.messages(THREAD_ID, 20)
+    instagram.add(3)
+
+    assert _numbers(store.messages(THREAD_ID, 5, force_sync=True)) == [53, 52, 51, 50, 49]
+    # The newest page reached stored messages: no further pages, older cursor unchanged
+    assert instagram.requests == [None, None]
+    assert _cursor(store) == ("31", 1)
+    assert store.get_stats()["messages_stored"] == 23
+
+
+def test_older_history_is_fetched_from_the_saved_cursor(store, instagram):
+    store.messages(THREAD_ID, 20)
+
+    assert _numbers(store.messages(THREAD_ID, 45)) == list(range(50, 5, -1))
+    assert instagram.requests == [None, "31", "11"]
+    assert _cursor(store) == (None, 0)
+
+    # The whole history is stored, asking for more does not request anything
+    assert len(store.messages(THREAD_ID, 100)) == 50
+    assert instagram.requests == [None, "31", "11"]
+
+
+def test_new_messages_spanning_pages_are_bridged(store, instagram):
+    store.messages(THREAD_ID, 20)
+    instagram.add(30)
+
+    assert _numbers(store.messages(THREAD_ID, 40, force_sync=True)) == list(range(80, 40, -1))
+    assert instagram.requests == [None, None, "61"]
+    assert _cursor(store) == ("31", 1)
+
+
+def test_thread_too_far_ahead_restarts_the_history(store, instagram, monkeypatch):
+    store.messages(THREAD_ID, 20)
+    monkeypatch.setattr(message_store, "MESSAGE_STORE_MAX_NEW_PAGES", 1)
+    instagram.add(30)
+
+    assert _numbers(store.messages(THREAD_ID, 20, force_sync=True)) == list(range(80, 60, -1))
+    # Messages before the gap are dropped and older history continues below the new page
+    assert _cursor(store) == ("61", 1)
+    assert store._count(THREAD_ID) == 20
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from dm_listener import NewMessagesEvent
+from scheduler import ThreadScheduler
+
+
+def _event(thread_id, text):
+    return NewMessagesEvent(thread_id=thread_id, username=f"user_{thread_id}", user_id=None, messages=[{"text": text}])
+
+
+class RecordingHandler:
+    """Handler that takes a while per turn and records overlapping turns"""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.running = {}
+        self.overlaps = []
+        self.turns = []
+        self.max_parallel_threads = 0
+
+    def __call__(self, event):
+        with self.lock:
+            if self.running.get(event.thread_id):
+                self.overlaps.append(event.thread_id)
+            self.running[event.thread_id] = True
+            self.max_parallel_threads = max(self.max_parallel_threads, sum(self.running.values()))
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running[event.thread_id] = False
+            self.turns.append((event.thread_id, [m["text"] for m in event.messages]))
+
+
+def _wait_until_idle(scheduler, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        stats = scheduler.get_stats()
+        if stats["in_flight"] == 0 and stats["waiting_threads"] == 0:
+            return
+        time.sleep(0.01)
+    raise AssertionError("scheduler did not drain")
+
+
+def test_one_turn_per_thread_at_a_time_in_order():
+    handler = RecordingHandler()
+    scheduler = ThreadScheduler(handler, max_concurrency=4)
+    scheduler.start()
+    try:
+        for i in range(6):
+            for thread_id in ("a", "b", "c"):
+                scheduler.put(_event(thread_id, f"{thread_id}{i}"))
+            time.sleep(0.01)
+        _wait_until_idle(scheduler)
+    finally:
+        scheduler.stop()
+
+    assert handler.overlaps == []
+    assert handler.max_parallel_threads > 1
+    for thread_id in ("a", "b", "c"):
+        texts = [text for turn_thread, texts in handler.turns if turn_thread == thread_id for text in texts]
+        assert texts == [f"{thread_id}{i}" for i in range(6)]
+
+
+def test_messages_queued_during_a_turn_are_merged():
+    started = threading.Event()
+    release = threading.Event()
+    turns = []
+
+    def handler(event):
+        turns.append([m["text"] for m in event.messages])
+        started.set()
+        release.wait(5)
+
+    scheduler = ThreadScheduler(handler, max_concurrency=2)
+    scheduler.start()
+    try:
+        scheduler.put(_event("a", "first"))
+        assert started.wait(5)
+        for text in ("second", "third", "fourth"):
+            scheduler.put(_event("a", text))
+        release.set()
+        _wait_until_idle(scheduler)
+    finally:
+        scheduler.stop()
+
+    assert turns == [["first"], ["second", "third", "fourth"]]
+    stats = scheduler.get_stats()
+    assert stats["turns"] == 2
+    assert stats["merged_events"] == 2
+    assert stats["max_in_flight"] == 1
+
+
+def test_handler_errors_do_not_block_the_thread():
+    turns = []
+
+    def handler(event):
+        turns.append(event.messages[0]["text"])
+        if event.messages[0]["text"] == "boom":
+            raise RuntimeError("reply failed")
+
+    scheduler = ThreadScheduler(handler, max_concurrency=1)
+    scheduler.start()
+    try:
+        scheduler.put(_event("a", "boom"))
+        _wait_until_idle(scheduler)
+        scheduler.put(_event("a", "next"))
+        _wait_until_idle(scheduler)
+    finally:
+        scheduler.stop()
+
+    assert turns == ["boom", "next"]
+    assert scheduler.get_stats()["errors"] == 1
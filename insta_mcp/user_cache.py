@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from instagrapi import Client
+
+logger = logging.getLogger(__name__)
+
+# How long a username <-> user id pair is trusted (usernames can be changed)
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", str(7 * 24 * 3600)))
+USER_CACHE_PATH = os.environ.get("USER_CACHE_PATH", "user_cache.json")
+# Concurrent API lookups when resolving many usernames at once
+USER_LOOKUP_MAX_WORKERS = int(os.environ.get("USER_LOOKUP_MAX_WORKERS", "8"))
+
+
+class UserIdCache:
+    """
+    Bidirectional username <-> user id cache in front of the Instagram API.
+
+    Pairs are learned for free from thread and user payloads the tools already
+    receive (`remember`), or fetched on a miss. Entries expire after
+    `ttl_seconds` and are saved to `path` so a restarted server starts warm.
+    """
+
+    def __init__(self, client: Client, path: Optional[str] = USER_CACHE_PATH, ttl_seconds: int = USER_CACHE_TTL):
+        self.client = client
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # lowercase username -> (user id, username, stored at)
+        self._by_username: Dict[str, Tuple[str, str, float]] = {}
+        # user id -> lowercase username
+        self._by_user_id: Dict[str, str] = {}
+        self.stats = {"hits": 0, "misses": 0, "learned": 0, "expired": 0}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            now = time.time()
+            for user_id, username, stored_at in entries:
+                if now - stored_at < self.ttl_seconds:
+                    self._store(username, user_id, stored_at)
+            logger.info(f"Loaded {len(self._by_username)} cached Instagram users")
+        except Exception as e:
+            logger.warning(f"Could not load user cache from {self.path}: {e}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._by_username.values())
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with self._save_lock:
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save user cache to {self.path}: {e}")
+
+    def _store(self, username: str, user_id: str, stored_at: float) -> bool:
+        """Store a pair, returns True if it was not cached already"""
+        key = username.lower()
+        previous = self._by_username.get(key)
+        if previous and previous[0] == user_id and time.time() - previous[2] < self.ttl_seconds / 2:
+            return False
+        if previous:
+            self._by_user_id.pop(previous[0], None)
+        # A user who changed their name leaves a stale entry under the old name
+        old_key = self._by_user_id.get(user_id)
+        if old_key and old_key != key:
+            self._by_username.pop(old_key, None)
+        self._by_username[key] = (user_id, username, stored_at)
+        self._by_user_id[user_id] = key
+        return True
+
+    def _fresh(self, key: str) -> Optional[Tuple[str, str, float]]:
+        entry = self._by_username.get(key)
+        if entry and time.time() - entry[2] >= self.ttl_seconds:
+            self._by_username.pop(key, None)
+            self._by_user_id.pop(entry[0], None)
+            self.stats["expired"] += 1
+            return None
+        return entry
+
+    def remember(self, username: Optional[str], user_id: Any) -> None:
+        """Learn a username / user id pair"""
+        self.remember_many([(username, user_id)])
+
+    def remember_many(self, pairs: Iterable[Tuple[Optional[str], Any]]) -> None:
+        """Learn several pairs and save the cache once"""
+        learned = 0
+        now = time.time()
+        with self._lock:
+            for username, user_id in pairs:
+                if username and user_id:
+                    learned += self._store(username, str(user_id), now)
+            self.stats["learned"] += learned
+        if learned:
+            self._save()
+
+    def remember_users(self, users: Iterable[Any]) -> None:
+        """Learn pairs from instagrapi user objects or their dicts (UserShort, User)"""
+        pairs = []
+        for user in users:
+            if isinstance(user, dict):
+                pairs.append((user.get("username"), user.get("pk")))
+            else:
+                pairs.append((getattr(user, "username", None), getattr(user, "pk", None)))
+        self.remember_many(pairs)
+
+    def cached_user_id(self, username: str) -> Optional[str]:
+        """User id of a username if cached, without calling the API"""
+        with self._lock:
+            entry = self._fresh(username.lower())
+            self.stats["hits" if entry else "misses"] += 1
+            return entry[0] if entry else None
+
+    def cached_username(self, user_id: Any) -> Optional[str]:
+        """Username of a user id if cached, without calling the API"""
+        with self._lock:
+            key = self._by_user_id.get(str(user_id))
+            entry = self._fresh(key) if key else None
+            self.stats["hits" if entry else "misses"] += 1
+            return entry[1] if entry else None
+
+    def user_id(self, username: str) -> Optional[str]:
+        """User id of a username, from the cache or the API"""
+        user_id = self.cached_user_id(username)
+        if user_id is None:
+            user_id = self.client.user_id_from_username(username)
+            self.remember(username, user_id)
+        return str(user_id) if user_id else None
+
+    def user_ids(
+        self, usernames: List[str], max_workers: int = USER_LOOKUP_MAX_WORKERS
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Resolve many usernames at once.
+
+        Cached names are answered directly; the rest are looked up in parallel
+        on at most `max_workers` threads. Returns (username -> user id,
+        username -> error message) so one bad name does not fail the batch.
+        """
+        resolved: Dict[str, str] = {}
+        missing = []
+        for username in dict.fromkeys(usernames):
+            user_id = self.cached_user_id(username)
+            if user_id:
+                resolved[username] = user_id
+            else:
+                missing.append(username)
+
+        def lookup(username: str) -> Tuple[str, Optional[str], Optional[str]]:
+            try:
+                user_id = self.client.user_id_from_username(username)
+                return username, str(user_id) if user_id else None, None if user_id else "User not found."
+            except Exception as e:
+                return username, None, str(e) or type(e).__name__
+
+        errors: Dict[str, str] = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                results = list(pool.map(lookup, missing))
+            for username, user_id, error in results:
+                if user_id:
+                    resolved[username] = user_id
+                else:
+                    errors[username] = error
+            self.remember_many((username, user_id) for username, user_id, _ in results)
+        return resolved, errors
+
+    def username(self, user_id: Any) -> Optional[str]:
+        """Username of a user id, from the cache or the API"""
+        username = self.cached_username(user_id)
+        if username is None:
+            username = self.client.username_from_user_id(str(user_id))
+            self.remember(username, user_id)
+        return username
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._by_username)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats